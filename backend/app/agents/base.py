@@ -1,12 +1,59 @@
+import threading
 from abc import ABC, abstractmethod
+from contextvars import ContextVar
+from typing import AsyncIterator, Iterator, List, Optional
+
+# Kite MCP session of the chat request being answered (set by llm_router from the request body),
+# for agents that answer from the user's own account.
+current_mcp_session: ContextVar[Optional[str]] = ContextVar("current_mcp_session", default=None)
+
+# Set by AgentRunner when the caller gave up on the agent (timeout or client disconnect).
+current_cancel: ContextVar[Optional[threading.Event]] = ContextVar("current_cancel", default=None)
+
+
+def cancelled() -> bool:
+    """True once the answer being produced is no longer wanted.
+
+    Synchronous agents run in a worker thread where they cannot be interrupted; long-running
+    ones should check this between steps and return early. Async agents are cancelled by the
+    event loop (asyncio.CancelledError) and do not need it.
+    """
+    event = current_cancel.get()
+    return event is not None and event.is_set()
+
 
 class Agent(ABC):
-    @abstractmethod
+    # Lower-case phrases that indicate a query belongs to this agent. Used by can_handle, the
+    # registry's keyword matcher and as training data for the local router.
+    KEYWORDS: List[str] = []
+
     def can_handle(self, query: str) -> bool:
-        """Return True if this agent can handle the query."""
-        pass
+        """Return True if this agent can handle the query (any of KEYWORDS occurs in it)."""
+        q = query.lower()
+        return any(k in q for k in self.KEYWORDS)
 
     @abstractmethod
     def handle(self, query: str) -> str:
         """Process the query and return a response."""
-        pass
\ No newline at end of file
+        pass
+
+    async def ahandle(self, query: str) -> str:
+        """Async entry point used by the chat endpoints (through agents.runner.AgentRunner).
+
+        Agents that await I/O (e.g. MCP tools) override it. The runner runs agents that only
+        implement handle() in its thread pool instead of calling this default, which would
+        block the event loop.
+        """
+        return self.handle(query)
+
+    def stream(self, query: str) -> Iterator[str]:
+        """Yield the response in chunks as it is produced.
+
+        The default yields handle()'s result as a single chunk; agents that generate text
+        incrementally should override it. The runner iterates it in a worker thread.
+        """
+        yield self.handle(query)
+
+    async def astream(self, query: str) -> AsyncIterator[str]:
+        """Async variant of stream(); preferred by the runner when overridden."""
+        yield await self.ahandle(query)
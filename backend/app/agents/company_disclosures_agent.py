@@ -1,18 +1,14 @@
 from .base import Agent
+from app_logging import get_logger
+
+log = get_logger(__name__)
 
 class CompanyDisclosuresAgent(Agent):
     NAME = "company_disclosures"
-
-    def can_handle(self, query: str) -> bool:
-        print(f"[CompanyDisclosuresAgent] Checking if can handle query: {query}")
-        keywords = ["disclosure", "filing", "sec", "regulatory", "prospectus", "company disclosure"]
-        q = query.lower()
-        result = any(k in q for k in keywords)
-        print(f"[CompanyDisclosuresAgent] can_handle result: {result}")
-        return result
+    KEYWORDS = ["disclosure", "filing", "sec", "regulatory", "prospectus", "company disclosure"]
 
     def handle(self, query: str) -> str:
-        print(f"[CompanyDisclosuresAgent] Handling query: {query}")
+        log.debug("Handling query: %s", query)
         response = "CompanyDisclosuresAgent response to: " + query
-        print(f"[CompanyDisclosuresAgent] Response: {response}")
+        log.debug("Response: %s", response)
         return response
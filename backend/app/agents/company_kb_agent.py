@@ -1,18 +1,14 @@
 from .base import Agent
+from app_logging import get_logger
+
+log = get_logger(__name__)
 
 class CompanyKBAgent(Agent):
     NAME = "company_kb"
-
-    def can_handle(self, query: str) -> bool:
-        print(f"[CompanyKBAgent] Checking if can handle query: {query}")
-        keywords = ["company profile", "about the company", "headquarters", "sector", "industry", "founder", "employees"]
-        q = query.lower()
-        result = any(k in q for k in keywords)
-        print(f"[CompanyKBAgent] can_handle result: {result}")
-        return result
+    KEYWORDS = ["company profile", "about the company", "headquarters", "sector", "industry", "founder", "employees"]
 
     def handle(self, query: str) -> str:
-        print(f"[CompanyKBAgent] Handling query: {query}")
+        log.debug("Handling query: %s", query)
         response = "CompanyKBAgent response to: " + query
-        print(f"[CompanyKBAgent] Response: {response}")
+        log.debug("Response: %s", response)
         return response
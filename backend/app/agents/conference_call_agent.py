@@ -1,15 +1,15 @@
 from .base import Agent
+from app_logging import get_logger
+
+log = get_logger(__name__)
 
 class ConferenceCallAgent(Agent):
-    def can_handle(self, query: str) -> bool:
-        print(f"[ConferenceCallAgent] Checking if can handle query: {query}")
-        result = "conference call" in query.lower()
-        print(f"[ConferenceCallAgent] can_handle result: {result}")
-        return result
+    NAME = "conference_call"
+    KEYWORDS = ["conference call", "concall", "earnings call"]
 
     def handle(self, query: str) -> str:
-        print(f"[ConferenceCallAgent] Handling query: {query}")
+        log.debug("Handling query: %s", query)
         # Your conference call logic here
         response = "ConferenceCallAgent response to: " + query
-        print(f"[ConferenceCallAgent] Response: {response}")
+        log.debug("Response: %s", response)
         return response
\ No newline at end of file
@@ -0,0 +1,72 @@
+"""
+Multi-pattern keyword matcher (Aho-Corasick automaton).
+
+All keywords of all agents are compiled into one automaton, so a query is scanned once,
+in time proportional to its length plus the number of matches, however many agents and
+keywords are registered.
+"""
+from collections import deque
+from typing import Dict, Iterable, List, Tuple
+
+
+class KeywordMatcher:
+    def __init__(self, patterns: Dict[str, Iterable[str]]) -> None:
+        """Compile `patterns`, a mapping of label -> keywords. Matching is case-insensitive."""
+        self.labels: List[str] = list(patterns)
+        # Trie as parallel lists indexed by node id; node 0 is the root.
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[int, str]]] = [[]]  # (label index, keyword) per node
+        for label_idx, label in enumerate(self.labels):
+            for kw in patterns[label]:
+                kw = kw.lower()
+                if kw:
+                    self._add(kw, label_idx)
+        self._build_failure_links()
+
+    def _add(self, keyword: str, label_idx: int) -> None:
+        node = 0
+        for ch in keyword:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node].append((label_idx, keyword))
+
+    def _build_failure_links(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                target = self._goto[f].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                # Inherit matches that end at the failure node (suffix keywords).
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def find(self, text: str) -> List[Tuple[str, str]]:
+        """Return every (label, keyword) occurrence in text, in order of where it ends."""
+        goto, fail, out, labels = self._goto, self._fail, self._out, self.labels
+        found = []
+        node = 0
+        for ch in text.lower():
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                found.extend((labels[i], kw) for i, kw in out[node])
+        return found
+
+    def scores(self, text: str) -> Dict[str, int]:
+        """Number of keyword occurrences per label, for labels with at least one match."""
+        counts: Dict[str, int] = {}
+        for label, _ in self.find(text):
+            counts[label] = counts.get(label, 0) + 1
+        return counts
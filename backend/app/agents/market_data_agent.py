@@ -1,18 +1,77 @@
-from .base import Agent
+import asyncio
+import re
+from typing import Dict, List, Optional
+
+from .base import Agent, current_mcp_session
+from core.quote_service import QuoteService, quote_service
+from app_logging import get_logger
+
+log = get_logger(__name__)
+
+# "INFY", "NSE:TCS", "bse:reliance". Bare symbols must be upper case to be told apart from words.
+_PREFIXED = re.compile(r"\b(NSE|BSE|NFO|MCX|BFO|CDS):([A-Za-z0-9&_-]+)", re.IGNORECASE)
+_BARE = re.compile(r"\b[A-Z][A-Z0-9&-]{1,19}\b")
+_NOT_SYMBOLS = {
+    "NSE", "BSE", "LTP", "OHLC", "PE", "EPS", "IPO", "ETF", "USD", "INR", "AND", "OR", "THE",
+    "FOR", "OF", "IS", "WHAT", "PRICE", "QUOTE", "VOLUME", "TODAY", "NOW", "MY",
+}
+_PERIOD = re.compile(r"^(Q[1-4]|FY\d{2,4}|H[12])$")  # Q2, FY24, H1: reporting periods, not tickers
+
+
+def extract_symbols(query: str) -> List[str]:
+    """Pull instrument symbols from a question, in order of appearance."""
+    symbols = [f"{ex.upper()}:{sym.upper()}" for ex, sym in _PREFIXED.findall(query)]
+    rest = _PREFIXED.sub(" ", query)
+    symbols += [s for s in _BARE.findall(rest) if s not in _NOT_SYMBOLS and not _PERIOD.match(s)]
+    return list(dict.fromkeys(symbols))
+
+
+def _format_quote(symbol: str, quote: Optional[Dict]) -> str:
+    if not quote:
+        return f"- {symbol}: no quote available"
+    price = quote.get("last_price")
+    line = f"- {symbol}: ₹{price:,.2f}" if isinstance(price, (int, float)) else f"- {symbol}: {price}"
+    close = (quote.get("ohlc") or {}).get("close")
+    if isinstance(price, (int, float)) and isinstance(close, (int, float)) and close:
+        change = price - close
+        line += f" ({change:+,.2f}, {change / close * 100:+.2f}%)"
+    volume = quote.get("volume")
+    if isinstance(volume, int):
+        line += f", volume {volume:,}"
+    return line
+
 
 class MarketDataAgent(Agent):
     NAME = "market_data"
+    KEYWORDS = ["price", "market", "quote", "ticker", "volume", "market data"]
 
-    def can_handle(self, query: str) -> bool:
-        print(f"[MarketDataAgent] Checking if can handle query: {query}")
-        keywords = ["price", "market", "quote", "ticker", "volume", "market data"]
-        q = query.lower()
-        result = any(k in q for k in keywords)
-        print(f"[MarketDataAgent] can_handle result: {result}")
-        return result
+    def __init__(self, quotes: QuoteService = quote_service):
+        self.quotes = quotes
 
-    def handle(self, query: str) -> str:
-        print(f"[MarketDataAgent] Handling query: {query}")
-        response = "MarketDataAgent response to: " + query
-        print(f"[MarketDataAgent] Response: {response}")
+    async def ahandle(self, query: str) -> str:
+        log.debug("Handling query: %s", query)
+        symbols = extract_symbols(query)
+        if not symbols:
+            return "Which instrument? Mention its trading symbol, e.g. INFY or NSE:RELIANCE."
+        # Quotes are fetched with the asking user's own Kite session, never someone else's.
+        session_id = current_mcp_session.get()
+        if session_id is None:
+            return "Live quotes need a Zerodha session: log in via 'Interact with your Zerodha Portfolio'."
+        try:
+            quotes = await self.quotes.get_quotes(symbols, session_id)
+        except LookupError as e:
+            return f"Live quotes need a Zerodha session: {e}"
+        except Exception as e:
+            log.warning("Quote lookup failed: %s", e)
+            return f"Could not fetch quotes right now: {e}"
+        response = "Latest quotes:\n" + "\n".join(_format_quote(s, q) for s, q in quotes.items())
+        log.debug("Response: %s", response)
         return response
+
+    def handle(self, query: str) -> str:
+        # Quotes come from the user's MCP session, so the work has to run on an event loop.
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.ahandle(query))
+        raise RuntimeError("MarketDataAgent.handle() cannot block a running event loop; await ahandle()")
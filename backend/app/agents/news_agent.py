@@ -1,18 +1,14 @@
 from .base import Agent
+from app_logging import get_logger
+
+log = get_logger(__name__)
 
 class NewsAgent(Agent):
     NAME = "news"
-
-    def can_handle(self, query: str) -> bool:
-        print(f"[NewsAgent] Checking if can handle query: {query}")
-        keywords = ["news", "press", "announcement", "reported", "article"]
-        q = query.lower()
-        result = any(k in q for k in keywords)
-        print(f"[NewsAgent] can_handle result: {result}")
-        return result
+    KEYWORDS = ["news", "press", "announcement", "reported", "article"]
 
     def handle(self, query: str) -> str:
-        print(f"[NewsAgent] Handling query: {query}")
+        log.debug("Handling query: %s", query)
         response = "NewsAgent response to: " + query
-        print(f"[NewsAgent] Response: {response}")
+        log.debug("Response: %s", response)
         return response
@@ -0,0 +1,47 @@
+import asyncio
+from typing import Any, Awaitable, Callable, List, Optional
+
+from .base import Agent, current_mcp_session
+from core.portfolio_analytics import analyze, summarize
+from app_logging import get_logger
+
+log = get_logger(__name__)
+
+# holdings_source(mcp_session_id) -> get_holdings rows; installed by main.py
+HoldingsSource = Callable[[str], Awaitable[List[Any]]]
+_holdings_source: Optional[HoldingsSource] = None
+
+
+def set_holdings_source(source: HoldingsSource) -> None:
+    global _holdings_source
+    _holdings_source = source
+
+
+class PortfolioAgent(Agent):
+    NAME = "portfolio"
+    KEYWORDS = ["my portfolio", "my holdings", "my stocks", "portfolio", "holdings", "p&l", "pnl", "concentration"]
+
+    async def ahandle(self, query: str) -> str:
+        log.debug("Handling query: %s", query)
+        session_id = current_mcp_session.get()
+        if not session_id or _holdings_source is None:
+            return "Connect your Zerodha account first (Interact with your Zerodha Portfolio), then ask again."
+        try:
+            holdings = await _holdings_source(session_id)
+        except LookupError:
+            return "Your Zerodha session has expired. Please log in again."
+        except Exception as e:
+            log.warning("Could not load holdings: %s", e)
+            return f"Could not load your holdings right now: {e}"
+        if not isinstance(holdings, list):
+            return f"Zerodha did not return holdings: {holdings}"
+        response = summarize(analyze(holdings))
+        log.debug("Response: %s", response)
+        return response
+
+    def handle(self, query: str) -> str:
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.ahandle(query))
+        raise RuntimeError("PortfolioAgent.handle() cannot block a running event loop; await ahandle()")
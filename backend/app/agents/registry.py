@@ -1,17 +1,25 @@
 """
 Agent registry to manage and route queries to specialized agents.
 """
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from .base import Agent
+from .keyword_matcher import KeywordMatcher
+from .runner import agent_runner
+from app_logging import get_logger
+
+log = get_logger(__name__)
 
 
 class AgentRegistry:
     def __init__(self) -> None:
         self._agents: Dict[str, Agent] = {}
+        self._matcher: Optional[KeywordMatcher] = None
+        self._matcher_names: Tuple[str, ...] = ()
 
     def register(self, name: str, agent: Agent) -> None:
-        print(f"[AgentRegistry] Registering agent '{name}': {agent.__class__.__name__}")
+        log.debug("Registering agent '%s': %s", name, agent.__class__.__name__)
         self._agents[name] = agent
+        self._rebuild_matcher()
 
     def get(self, name: str) -> Optional[Agent]:
         return self._agents.get(name)
@@ -19,21 +27,69 @@ class AgentRegistry:
     def all(self) -> List[Agent]:
         return list(self._agents.values())
 
+    def agents(self) -> Dict[str, Agent]:
+        """Return a copy of the registry name -> agent mapping."""
+        return dict(self._agents)
+
     def list_agents(self) -> Dict[str, str]:
         """Return a mapping of registry name -> agent class name for available agents."""
         return {name: agent.__class__.__name__ for name, agent in self._agents.items()}
 
-    def route_query(self, query: str):
-        print(f"[AgentRegistry] Routing query: {query}")
+    def _rebuild_matcher(self) -> None:
+        """Compile every agent's KEYWORDS into one automaton."""
+        self._matcher = KeywordMatcher(
+            {name: getattr(agent, "KEYWORDS", None) or [] for name, agent in self._agents.items()}
+        )
+        self._matcher_names = tuple(self._agents)
+
+    def match_agents(self, query: str) -> List[Tuple[str, int]]:
+        """Return every agent that matches the query with its score, best first.
+
+        Keyword agents are scored in one pass over the query (score = keyword occurrences).
+        Agents without KEYWORDS are asked via can_handle and score 1 when they accept.
+        Ties keep registration order.
+        """
+        if self._matcher is None or self._matcher_names != tuple(self._agents):
+            self._rebuild_matcher()
+        scores = self._matcher.scores(query)
+        matches = []
         for name, agent in self._agents.items():
+            if getattr(agent, "KEYWORDS", None):
+                if name in scores:
+                    matches.append((name, scores[name]))
+                continue
+            try:
+                if agent.can_handle(query):
+                    matches.append((name, 1))
+            except Exception as e:
+                log.warning("Error while checking '%s': %s", name, e)
+        matches.sort(key=lambda m: -m[1])
+        return matches
+
+    def route_query(self, query: str):
+        log.debug("Routing query: %s", query)
+        matches = self.match_agents(query)
+        log.debug("Matching agents: %s", matches)
+        for name, _ in matches:
+            try:
+                log.debug("Routed to agent '%s'", name)
+                return self._agents[name].handle(query)
+            except Exception as e:
+                log.warning("Error while handling with '%s': %s", name, e)
+        return "No suitable agent found."
+
+    async def aroute_query(self, query: str):
+        """route_query for async callers: runs the chosen agent through agent_runner."""
+        log.debug("Routing query: %s", query)
+        matches = self.match_agents(query)
+        log.debug("Matching agents: %s", matches)
+        for name, _ in matches:
+            agent = self._agents[name]
             try:
-                can = agent.can_handle(query)
-                print(f"[AgentRegistry] Agent '{name}' can_handle={can}")
-                if can:
-                    print(f"[AgentRegistry] Routed to agent '{name}'")
-                    return agent.handle(query)
+                log.debug("Routed to agent '%s'", name)
+                return await agent_runner.run(name, agent, query)
             except Exception as e:
-                print(f"[AgentRegistry] Error while checking/handling with '{name}': {e}")
+                log.warning("Error while handling with '%s': %s", name, e)
         return "No suitable agent found."
 
 
@@ -0,0 +1,221 @@
+"""
+Runs agents for the chat endpoints under the async agent contract.
+
+An agent is async when it overrides ahandle() (or astream()); it is awaited on the event loop
+and cancelled by it. Legacy agents that only implement the synchronous handle() / stream() run
+in a bounded thread pool so they never block the event loop. Every call gets a per-agent
+timeout and takes a slot from a per-agent concurrency limit (the wait for a slot counts against
+the timeout). When the caller stops waiting (timeout or client disconnect) async agents are
+cancelled and sync agents see agents.base.cancelled() turn True, so they can stop early.
+
+Defaults come from AGENT_TIMEOUT_SECONDS / AGENT_MAX_CONCURRENCY; AGENT_TIMEOUTS and
+AGENT_CONCURRENCY override them per agent, e.g. AGENT_TIMEOUTS="news=8,conference_call=45".
+"""
+import asyncio
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+from .base import Agent, current_cancel
+from telemetry import span
+from app_logging import get_logger
+
+log = get_logger(__name__)
+
+
+def parse_agent_settings(text: str) -> Dict[str, float]:
+    """"news=8,conference_call=45" -> {"news": 8.0, "conference_call": 45.0}"""
+    settings = {}
+    for item in text.split(","):
+        name, _, value = item.partition("=")
+        try:
+            settings[name.strip()] = float(value)
+        except ValueError:
+            continue
+    return settings
+
+
+TIMEOUT_SECONDS = float(os.getenv("AGENT_TIMEOUT_SECONDS", "30"))
+MAX_CONCURRENCY = int(os.getenv("AGENT_MAX_CONCURRENCY", "16"))
+THREAD_POOL_SIZE = int(os.getenv("AGENT_THREAD_POOL_SIZE", "8"))
+TIMEOUTS = parse_agent_settings(os.getenv("AGENT_TIMEOUTS", ""))
+CONCURRENCY = {name: int(n) for name, n in parse_agent_settings(os.getenv("AGENT_CONCURRENCY", "")).items()}
+
+_DONE = object()
+
+
+class AgentTimeout(TimeoutError):
+    """The agent did not answer within its timeout."""
+
+
+def is_async(agent: Any) -> bool:
+    ahandle = getattr(type(agent), "ahandle", None)
+    return ahandle is not None and ahandle is not Agent.ahandle
+
+
+def stream_kind(agent: Any) -> Optional[str]:
+    """"async" if the agent overrides astream(), "sync" if it overrides stream(), else None."""
+    astream = getattr(type(agent), "astream", None)
+    if astream is not None and astream is not Agent.astream:
+        return "async"
+    stream = getattr(type(agent), "stream", None)
+    if callable(stream) and stream is not Agent.stream:
+        return "sync"
+    return None
+
+
+class AgentRunner:
+    def __init__(self, timeout: float = TIMEOUT_SECONDS, max_concurrency: int = MAX_CONCURRENCY,
+                 timeouts: Optional[Dict[str, float]] = None, concurrency: Optional[Dict[str, int]] = None,
+                 threads: int = THREAD_POOL_SIZE):
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.timeouts = dict(TIMEOUTS if timeouts is None else timeouts)
+        self.concurrency = dict(CONCURRENCY if concurrency is None else concurrency)
+        self._pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="agent")
+        # Semaphores belong to an event loop, so they are kept per (loop, agent).
+        self._slots: Dict[Tuple[int, str], asyncio.Semaphore] = {}
+        self._lock = threading.Lock()
+        self._running: Dict[str, int] = {}
+        self.completed = 0
+        self.timed_out = 0
+        self.failed = 0
+        self.cancelled = 0
+
+    def timeout_for(self, name: str) -> float:
+        return self.timeouts.get(name, self.timeout)
+
+    def limit_for(self, name: str) -> int:
+        return max(int(self.concurrency.get(name, self.max_concurrency)), 1)
+
+    def _slot(self, name: str) -> asyncio.Semaphore:
+        key = (id(asyncio.get_running_loop()), name)
+        with self._lock:
+            sem = self._slots.get(key)
+            if sem is None:
+                sem = self._slots[key] = asyncio.Semaphore(self.limit_for(name))
+            return sem
+
+    def _count(self, name: str, delta: int) -> None:
+        with self._lock:
+            self._running[name] = self._running.get(name, 0) + delta
+
+    def _in_thread(self, ctx: contextvars.Context, fn: Any, *args: Any) -> "asyncio.Future":
+        return asyncio.get_running_loop().run_in_executor(self._pool, ctx.run, fn, *args)
+
+    def _context(self, cancel: threading.Event) -> contextvars.Context:
+        ctx = contextvars.copy_context()
+        ctx.run(current_cancel.set, cancel)
+        return ctx
+
+    def _finish(self, name: str, outcome: Optional[BaseException]) -> None:
+        with self._lock:
+            if outcome is None:
+                self.completed += 1
+            elif isinstance(outcome, (AgentTimeout, asyncio.TimeoutError)):
+                self.timed_out += 1
+            elif isinstance(outcome, asyncio.CancelledError):
+                self.cancelled += 1
+            else:
+                self.failed += 1
+
+    async def _call(self, name: str, agent: Any, query: str, cancel: threading.Event) -> str:
+        async with self._slot(name):
+            self._count(name, 1)
+            try:
+                if is_async(agent):
+                    return await agent.ahandle(query)
+                return await self._in_thread(self._context(cancel), agent.handle, query)
+            finally:
+                self._count(name, -1)
+
+    async def run(self, name: str, agent: Any, query: str) -> str:
+        """The agent's answer; raises AgentTimeout after timeout_for(name) seconds."""
+        timeout = self.timeout_for(name)
+        cancel = threading.Event()
+        outcome: Optional[BaseException] = None
+        try:
+            with span("agent", name):
+                return await asyncio.wait_for(self._call(name, agent, query, cancel), timeout)
+        except asyncio.TimeoutError:
+            outcome = AgentTimeout(f"agent '{name}' did not answer within {timeout:g}s")
+            log.warning("%s", outcome)
+            raise outcome from None
+        except BaseException as e:
+            outcome = e
+            raise
+        finally:
+            cancel.set()
+            self._finish(name, outcome)
+
+    async def stream(self, name: str, agent: Any, query: str) -> AsyncIterator[str]:
+        """Yield the answer in chunks; the whole stream must finish within timeout_for(name)."""
+        kind = stream_kind(agent)
+        if kind is None:
+            yield await self.run(name, agent, query)
+            return
+        loop = asyncio.get_running_loop()
+        timeout = self.timeout_for(name)
+        deadline = loop.time() + timeout
+        cancel = threading.Event()
+        ctx = self._context(cancel)
+        outcome: Optional[BaseException] = None
+        remaining = timeout
+        try:
+            with span("agent_queue", name):
+                await asyncio.wait_for(self._slot(name).acquire(), remaining)
+        except asyncio.TimeoutError:
+            self._finish(name, AgentTimeout())
+            raise AgentTimeout(f"agent '{name}' did not answer within {timeout:g}s") from None
+        self._count(name, 1)
+        chunks = None
+        try:
+            # Created inside the try: an agent whose stream() raises must still give its slot back.
+            if kind == "async":
+                chunks = ctx.run(agent.astream, query)
+            else:
+                chunks = ctx.run(agent.stream, query)
+            while True:
+                remaining = deadline - loop.time()
+                if kind == "async":
+                    step = chunks.__anext__()
+                else:
+                    step = self._in_thread(ctx, next, chunks, _DONE)
+                try:
+                    with span("agent_chunk", name):
+                        chunk = await asyncio.wait_for(step, max(remaining, 0))
+                except StopAsyncIteration:
+                    break
+                except asyncio.TimeoutError:
+                    raise AgentTimeout(f"agent '{name}' did not answer within {timeout:g}s") from None
+                if chunk is _DONE:
+                    break
+                yield chunk
+        except BaseException as e:
+            outcome = e
+            raise
+        finally:
+            cancel.set()
+            self._slot(name).release()
+            self._count(name, -1)
+            self._finish(name, outcome)
+            if kind == "async" and chunks is not None:
+                await chunks.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "running": {name: n for name, n in self._running.items() if n},
+                "completed": self.completed,
+                "timed_out": self.timed_out,
+                "failed": self.failed,
+                "cancelled": self.cancelled,
+                "timeout_seconds": self.timeout,
+                "max_concurrency": self.max_concurrency,
+            }
+
+
+# Shared runner used by the chat endpoints, the registry fallback and fan-out
+agent_runner = AgentRunner()
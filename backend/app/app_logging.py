@@ -0,0 +1,197 @@
+"""
+app_logging.py
+Leveled, non-blocking logging for the backend.
+
+Modules log through get_logger(__name__) with %-style arguments, e.g.
+log.debug("Response from agent: %s", response). Nothing is formatted for records below
+LOG_LEVEL, and Lazy(fn) defers an expensive value (a JSON dump, a table) until the record is
+actually emitted.
+
+Enabled records are formatted on the calling thread (so later mutation of the arguments cannot
+change them), redacted, truncated to LOG_MAX_CHARS and put on a bounded in-memory queue. A
+QueueListener thread writes them to stdout, so a slow stdout (e.g. the Azure App Service log
+pipe) never blocks a request; when the queue is full records are dropped and counted rather
+than waited for. Records carry the telemetry request ID, and LOG_FORMAT=json emits one JSON
+object per line.
+
+Redaction masks Authorization / API key / token / cookie / password values, bearer tokens and
+OpenAI-style secret keys wherever they appear in a message; redact_headers() masks a header
+mapping before it is logged.
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import re
+import sys
+import threading
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Callable, Dict, Mapping, Optional
+
+from telemetry import current_request_id
+
+
+LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+FORMAT = os.getenv("LOG_FORMAT", "text").lower()  # "text" or "json"
+MAX_CHARS = int(os.getenv("LOG_MAX_CHARS", "2000"))
+QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+ROOT = "saras"
+MASK = "***"
+
+SENSITIVE_HEADERS = frozenset({
+    "authorization", "proxy-authorization", "cookie", "set-cookie", "x-api-key", "api-key",
+    "x-auth-token", "x-access-token",
+})
+_SECRET_FIELD = re.compile(
+    r"""(?ix)
+    \b(authorization|proxy-authorization|cookie|set-cookie|x-api-key|api[-_]?key|access[-_]?token|
+       refresh[-_]?token|request[-_]?token|auth[-_]?token|token|secret|client[-_]?secret|password|passwd)
+    (["']?\s*[:=]\s*["']?)
+    (?:(bearer|basic|token)\s+)?
+    [^\s"',;}&]+
+    """
+)
+_BEARER = re.compile(r"(?i)\b(bearer)\s+[A-Za-z0-9._~+/=-]{8,}")
+_SECRET_KEY = re.compile(r"\bsk-[A-Za-z0-9_-]{8,}")
+
+
+def redact(text: str) -> str:
+    """Mask secrets (auth headers, tokens, keys, passwords) in free text."""
+    text = _SECRET_FIELD.sub(lambda m: f"{m.group(1)}{m.group(2)}{m.group(3) + ' ' if m.group(3) else ''}{MASK}", text)
+    text = _BEARER.sub(lambda m: f"{m.group(1)} {MASK}", text)
+    return _SECRET_KEY.sub(f"sk-{MASK}", text)
+
+
+def redact_headers(headers: Optional[Mapping[str, Any]]) -> Dict[str, Any]:
+    """Copy of a header mapping with the values of credential headers masked."""
+    return {k: (MASK if k.lower() in SENSITIVE_HEADERS else v) for k, v in (headers or {}).items()}
+
+
+def truncate(text: str, limit: int = MAX_CHARS) -> str:
+    if limit <= 0 or len(text) <= limit:
+        return text
+    return f"{text[:limit]}... [{len(text) - limit} chars truncated]"
+
+
+class Lazy:
+    """Log argument computed only if the record is emitted: log.debug("rows=%s", Lazy(lambda: dump(rows)))."""
+
+    __slots__ = ("fn",)
+
+    def __init__(self, fn: Callable[[], Any]):
+        self.fn = fn
+
+    def __str__(self) -> str:
+        return str(self.fn())
+
+    __repr__ = __str__
+
+
+class _RequestIdFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = current_request_id.get() or "-"
+        return True
+
+
+class _BoundedQueueHandler(QueueHandler):
+    """Formats, redacts and truncates on the caller's thread; drops instead of blocking when full."""
+
+    def __init__(self, q: "queue.Queue", max_chars: int):
+        super().__init__(q)
+        self.max_chars = max_chars
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = super().prepare(record)
+        record.msg = record.message = truncate(redact(str(record.msg)), self.max_chars)
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+
+
+class _StdoutHandler(logging.StreamHandler):
+    """Writes to whatever sys.stdout is at emit time (it is replaced by test runners)."""
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.stream = sys.stdout
+        super().emit(record)
+
+
+class _JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        return json.dumps({
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name[len(ROOT) + 1:] or record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "msg": record.getMessage(),
+        }, ensure_ascii=False)
+
+
+class _TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        record.short_name = record.name[len(ROOT) + 1:] or record.name
+        return super().format(record)
+
+
+_lock = threading.Lock()
+_handler: Optional[_BoundedQueueHandler] = None
+_listener: Optional[QueueListener] = None
+
+
+def configure(level: str = LEVEL, fmt: str = FORMAT, max_chars: int = MAX_CHARS, queue_size: int = QUEUE_SIZE) -> None:
+    """Install the queue handler and start the writer thread (idempotent; called on import)."""
+    global _handler, _listener
+    with _lock:
+        if _listener is not None:
+            return
+        q: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        handler = _BoundedQueueHandler(q, max_chars)
+        handler.addFilter(_RequestIdFilter())
+        out = _StdoutHandler()
+        if fmt == "json":
+            out.setFormatter(_JsonFormatter())
+        else:
+            out.setFormatter(_TextFormatter("%(asctime)s %(levelname)s [%(short_name)s] %(request_id)s %(message)s"))
+        root = logging.getLogger(ROOT)
+        root.setLevel(getattr(logging, level, logging.INFO))
+        root.handlers = [handler]
+        root.propagate = False
+        _listener = QueueListener(q, out, respect_handler_level=False)
+        _listener.start()
+        _handler = handler
+    atexit.register(shutdown)
+
+
+def shutdown() -> None:
+    """Flush queued records and stop the writer thread."""
+    global _listener
+    with _lock:
+        listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
+
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(f"{ROOT}.{name}")
+
+
+def stats() -> Dict[str, Any]:
+    handler = _handler
+    return {
+        "level": logging.getLevelName(logging.getLogger(ROOT).level),
+        "queued": handler.queue.qsize() if handler else 0,
+        "dropped": handler.dropped if handler else 0,
+    }
+
+
+configure()
@@ -0,0 +1,140 @@
+"""
+context_builder.py
+Token-budgeted conversation context for LLM prompts.
+
+The most recent messages are included verbatim (each capped at a per-message token limit) for
+as long as they fit the budget. Older messages are folded into a rolling summary: one short line
+per message, appended once when the message first falls out of the recent window, cached per
+session, and trimmed from the oldest end to its own token budget. The prompt therefore stays
+bounded however long the conversation gets, and each call only pays for the newly folded turns.
+
+Token counts use tiktoken when it is installed, else a ~4 characters/token estimate.
+"""
+
+import hashlib
+import math
+import os
+import threading
+from collections import OrderedDict, deque
+from functools import lru_cache
+from typing import Deque, Dict, List, Optional, Set
+
+try:
+    import tiktoken  # type: ignore
+    _ENCODING = tiktoken.get_encoding("o200k_base")
+except Exception:
+    _ENCODING = None
+
+
+TOKEN_BUDGET = int(os.getenv("ROUTING_CONTEXT_TOKEN_BUDGET", "1500"))
+MESSAGE_TOKEN_CAP = int(os.getenv("ROUTING_CONTEXT_MESSAGE_TOKENS", "300"))
+SUMMARY_TOKEN_BUDGET = int(os.getenv("ROUTING_CONTEXT_SUMMARY_TOKENS", "300"))
+SUMMARY_LINE_TOKENS = 40
+MAX_CACHED_SUMMARIES = 10000
+CHARS_PER_TOKEN = 4
+
+
+@lru_cache(maxsize=4096)
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text))
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Return text cut to at most max_tokens tokens, marking the cut with an ellipsis."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    if _ENCODING is not None:
+        return _ENCODING.decode(_ENCODING.encode(text)[:max_tokens]) + " …"
+    return text[: max_tokens * CHARS_PER_TOKEN] + " …"
+
+
+def _message_key(message: Dict) -> str:
+    h = hashlib.sha1(str(message.get("role", "")).encode("utf-8"))
+    h.update(b"\x00")
+    h.update(str(message.get("content", "")).encode("utf-8"))
+    return h.hexdigest()
+
+
+class _Summary:
+    __slots__ = ("folded", "lines", "tokens")
+
+    def __init__(self) -> None:
+        self.folded: Set[str] = set()
+        self.lines: Deque[str] = deque()
+        self.tokens = 0
+
+
+class ContextBuilder:
+    def __init__(
+        self,
+        budget: int = TOKEN_BUDGET,
+        message_cap: int = MESSAGE_TOKEN_CAP,
+        summary_budget: int = SUMMARY_TOKEN_BUDGET,
+        max_sessions: int = MAX_CACHED_SUMMARIES,
+    ):
+        self.budget = budget
+        self.message_cap = message_cap
+        self.summary_budget = summary_budget
+        self.max_sessions = max_sessions
+        self._summaries: "OrderedDict[str, _Summary]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def build(self, session_id: Optional[str], history: List[Dict]) -> List[Dict]:
+        """Return prompt messages for history: [summary system message] + recent messages."""
+        recent: List[Dict] = []
+        used = 0
+        split = len(history)
+        for msg in reversed(history):
+            content = truncate_to_tokens(str(msg.get("content", "")), self.message_cap)
+            cost = count_tokens(content)
+            if used + cost > self.budget - self.summary_budget:
+                break
+            recent.append({"role": msg["role"], "content": content})
+            used += cost
+            split -= 1
+        recent.reverse()
+
+        older = history[:split]
+        if not older or not session_id:
+            return recent
+        summary = self._fold(session_id, older)
+        if not summary:
+            return recent
+        return [{"role": "system", "content": "Summary of earlier conversation:\n" + summary}] + recent
+
+    def _fold(self, session_id: str, older: List[Dict]) -> str:
+        with self._lock:
+            state = self._summaries.get(session_id)
+            if state is None:
+                state = self._summaries[session_id] = _Summary()
+                while len(self._summaries) > self.max_sessions:
+                    self._summaries.popitem(last=False)
+            else:
+                self._summaries.move_to_end(session_id)
+
+            keys = [_message_key(msg) for msg in older]
+            for msg, key in zip(older, keys):
+                if key in state.folded:
+                    continue
+                text = " ".join(str(msg.get("content", "")).split())
+                line = f"- {msg.get('role', 'user')}: {truncate_to_tokens(text, SUMMARY_LINE_TOKENS)}"
+                state.lines.append(line)
+                state.tokens += count_tokens(line)
+            # Only messages still in the history can show up again.
+            state.folded = set(keys)
+            while state.lines and state.tokens > self.summary_budget:
+                state.tokens -= count_tokens(state.lines.popleft())
+            return "\n".join(state.lines)
+
+    def forget(self, session_id: str) -> None:
+        """Drop the cached summary for a session (e.g. on reset)."""
+        with self._lock:
+            self._summaries.pop(session_id, None)
+
+
+# Process-wide builder used for the routing prompt in llm_router
+context_builder = ContextBuilder()
@@ -0,0 +1,273 @@
+"""
+candle_store.py
+Local columnar store for historical candles, one series per instrument and interval.
+
+Each series is a directory of flat binary column files (ts as int64 epoch seconds; open, high,
+low, close, volume as float64) that grow by appending and are read through np.memmap. Range
+queries binary-search ts and return slices of the maps, so a year of daily or minute candles is
+answered without copying or parsing once the pages are warm.
+
+sync() asks upstream only for the missing tail: from the last stored candle (which is re-fetched
+because it may have been incomplete) to now. Column files never shrink, so maps held by readers
+stay valid while another request appends; the only rewrite is a rare backfill before the first
+stored candle (or a correction inside the stored range), which replaces the files atomically.
+
+The gunicorn workers share the store: writes to a series hold an fcntl lock on the series'
+lock file, so two workers never interleave appends or rewrites, and rewrites go through
+uniquely named temporary files (core.file_lock). sync() runs those writes in a thread, so
+waiting for another worker's lock never stalls the event loop. Instruments and intervals are
+validated before they are turned into paths.
+"""
+
+import asyncio
+import os
+import re
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from core.file_lock import atomic_write, locked
+
+
+STORE_DIR = os.getenv("CANDLE_STORE_DIR", os.path.join(tempfile.gettempdir(), "saras_candles"))
+# Do not ask upstream for a series' tail more often than this (e.g. while the market is closed).
+REFRESH_SECONDS = float(os.getenv("CANDLE_REFRESH_SECONDS", "60"))
+
+COLUMNS: Dict[str, np.dtype] = {
+    "ts": np.dtype("<i8"),
+    "open": np.dtype("<f8"),
+    "high": np.dtype("<f8"),
+    "low": np.dtype("<f8"),
+    "close": np.dtype("<f8"),
+    "volume": np.dtype("<f8"),
+}
+INTERVAL_SECONDS = {
+    "minute": 60, "3minute": 180, "5minute": 300, "10minute": 600, "15minute": 900,
+    "30minute": 1800, "60minute": 3600, "day": 86400,
+}
+
+# Instrument names become directory names: "NSE:INFY", "408065", "NFO:NIFTY24JANFUT".
+_INSTRUMENT = re.compile(r"[A-Za-z0-9][A-Za-z0-9:_&-]{0,63}")
+
+# Kite timestamps are exchange time; naive datetimes and dates are read as IST.
+IST = timezone(timedelta(hours=5, minutes=30))
+
+# fetcher(instrument, interval, start, end, session_id) -> candles as [ts, o, h, l, c, v] lists or dicts
+Fetcher = Callable[[str, str, datetime, datetime, Optional[str]], Awaitable[List[Any]]]
+
+
+def _to_epoch(value: Any) -> int:
+    if isinstance(value, (int, float)):
+        return int(value)
+    dt = value if isinstance(value, datetime) else datetime.fromisoformat(str(value))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=IST)
+    return int(dt.timestamp())
+
+
+def candles_to_columns(candles: Iterable[Any]) -> Dict[str, np.ndarray]:
+    """Convert Kite-style candles ([date, o, h, l, c, v] or {"date": ..., "open": ...}) to columns."""
+    rows = []
+    for c in candles:
+        if isinstance(c, dict):
+            c = [c.get("date"), c.get("open"), c.get("high"), c.get("low"), c.get("close"), c.get("volume", 0)]
+        rows.append((_to_epoch(c[0]), *(float(x or 0) for x in c[1:6])))
+    rows.sort(key=lambda r: r[0])
+    return {name: np.array([r[i] for r in rows], dtype=dtype) for i, (name, dtype) in enumerate(COLUMNS.items())}
+
+
+class _Series:
+    __slots__ = ("path", "length", "version", "maps", "lock", "checked_at")
+
+    def __init__(self, path: str):
+        self.path = path
+        self.length = -1
+        self.version: Optional[Tuple[int, int]] = None  # (rows, ts file inode) the maps were built for
+        self.maps: Dict[str, np.ndarray] = {}
+        self.lock = asyncio.Lock()
+        self.checked_at = 0.0
+
+
+class CandleStore:
+    def __init__(self, root: str = STORE_DIR, fetcher: Optional[Fetcher] = None,
+                 refresh_seconds: float = REFRESH_SECONDS, clock: Callable[[], float] = time.time):
+        self.root = root
+        self._fetcher = fetcher
+        self.refresh_seconds = refresh_seconds
+        self._clock = clock
+        self._series: Dict[Tuple[str, str], _Series] = {}
+        self.upstream_calls = 0
+        self.appended_rows = 0
+
+    def set_fetcher(self, fetcher: Fetcher) -> None:
+        self._fetcher = fetcher
+
+    def _get_series(self, instrument: str, interval: str) -> _Series:
+        key = (instrument, interval)
+        series = self._series.get(key)
+        if series is None:
+            if interval not in INTERVAL_SECONDS:
+                raise ValueError(f"unknown interval {interval!r}; expected one of {', '.join(INTERVAL_SECONDS)}")
+            if not _INSTRUMENT.fullmatch(instrument):
+                raise ValueError(f"invalid instrument {instrument!r}")
+            safe = instrument.replace(":", "_").replace("/", "_")
+            path = os.path.join(self.root, safe, interval)
+            os.makedirs(path, exist_ok=True)
+            series = self._series[key] = _Series(path)
+        return series
+
+    def _col_path(self, series: _Series, name: str) -> str:
+        return os.path.join(series.path, f"{name}.bin")
+
+    def _lock_path(self, series: _Series) -> str:
+        return os.path.join(series.path, ".lock")
+
+    def _length(self, series: _Series) -> int:
+        """Rows present in every column; ts is written last, so a crashed append is not counted."""
+        sizes = []
+        for name, dtype in COLUMNS.items():
+            try:
+                sizes.append(os.path.getsize(self._col_path(series, name)) // dtype.itemsize)
+            except OSError:
+                return 0
+        return min(sizes)
+
+    def _maps(self, series: _Series) -> Tuple[int, Dict[str, np.ndarray]]:
+        length = self._length(series)
+        try:
+            inode = os.stat(self._col_path(series, "ts")).st_ino
+        except OSError:
+            inode = 0
+        # The inode changes when another worker rewrites the series.
+        if (length, inode) != series.version:
+            series.maps = {
+                name: np.memmap(self._col_path(series, name), dtype=dtype, mode="r", shape=(length,))
+                for name, dtype in COLUMNS.items()
+            } if length else {name: np.empty(0, dtype=dtype) for name, dtype in COLUMNS.items()}
+            series.length = length
+            series.version = (length, inode)
+        return length, series.maps
+
+    # --- Reads ---
+
+    def read(self, instrument: str, interval: str, start: Any = None, end: Any = None) -> Dict[str, np.ndarray]:
+        """Columns for candles with start <= ts <= end, as views into the memory maps (no copy)."""
+        series = self._get_series(instrument, interval)
+        length, maps = self._maps(series)
+        ts = maps["ts"]
+        lo = int(np.searchsorted(ts, _to_epoch(start), side="left")) if start is not None else 0
+        hi = int(np.searchsorted(ts, _to_epoch(end), side="right")) if end is not None else length
+        return {name: col[lo:hi] for name, col in maps.items()}
+
+    def bounds(self, instrument: str, interval: str) -> Optional[Tuple[int, int]]:
+        _, maps = self._maps(self._get_series(instrument, interval))
+        ts = maps["ts"]
+        return (int(ts[0]), int(ts[-1])) if len(ts) else None
+
+    # --- Writes ---
+
+    def append(self, instrument: str, interval: str, columns: Dict[str, np.ndarray]) -> int:
+        """Merge sorted new candles into the series; stored rows in the new range are replaced.
+
+        The common case, candles at or after the last stored one, is written in place at the end.
+        Holds the series' file lock, so it is safe against other workers writing the same series.
+        """
+        new_ts = columns["ts"]
+        if not len(new_ts):
+            return 0
+        series = self._get_series(instrument, interval)
+        with locked(self._lock_path(series)):
+            return self._append_locked(series, columns)
+
+    def _append_locked(self, series: _Series, columns: Dict[str, np.ndarray]) -> int:
+        new_ts = columns["ts"]
+        # Re-read the length under the lock: another worker may have just written.
+        length, maps = self._maps(series)
+        start = int(np.searchsorted(maps["ts"], new_ts[0], side="left")) if length else 0
+        if length and (new_ts[0] < maps["ts"][0] or new_ts[-1] < maps["ts"][-1] or start + len(new_ts) < length):
+            return self._rewrite(series, columns, maps)
+        # ts last, so a partially written append is ignored by _length.
+        for name in [n for n in COLUMNS if n != "ts"] + ["ts"]:
+            path = self._col_path(series, name)
+            mode = "r+b" if os.path.exists(path) else "wb"
+            with open(path, mode) as f:
+                f.seek(start * COLUMNS[name].itemsize)
+                f.write(np.ascontiguousarray(columns[name], dtype=COLUMNS[name]).tobytes())
+        added = start + len(new_ts) - length
+        self.appended_rows += max(added, 0)
+        return max(added, 0)
+
+    def _rewrite(self, series: _Series, columns: Dict[str, np.ndarray], maps: Dict[str, np.ndarray]) -> int:
+        old_ts = maps["ts"]
+        head = old_ts < columns["ts"][0]
+        tail = old_ts > columns["ts"][-1]
+        before = len(old_ts)
+        for name in [n for n in COLUMNS if n != "ts"] + ["ts"]:
+            dtype = COLUMNS[name]
+            old = np.asarray(maps[name])
+            merged = np.concatenate([old[head], columns[name].astype(dtype), old[tail]])
+            # Readers holding the old map keep the old inode; new reads see the merged file.
+            atomic_write(self._col_path(series, name), merged.tofile)
+        series.version = None
+        added = int(head.sum()) + len(columns["ts"]) + int(tail.sum()) - before
+        self.appended_rows += max(added, 0)
+        return max(added, 0)
+
+    # --- Upstream ---
+
+    async def sync(self, instrument: str, interval: str, start: Any, end: Any = None,
+                   session_id: Optional[str] = None) -> int:
+        """Fetch whatever part of [start, end] is not stored yet, with `session_id`'s Kite
+        session; return rows added."""
+        if self._fetcher is None:
+            raise RuntimeError("candle store has no fetcher configured")
+        series = self._get_series(instrument, interval)
+        start_ts = _to_epoch(start)
+        end_ts = _to_epoch(end) if end is not None else int(self._clock())
+        step = INTERVAL_SECONDS[interval]
+        async with series.lock:
+            added = 0
+            bounds = self.bounds(instrument, interval)
+            if bounds is not None and start_ts < bounds[0] - step:
+                added += await self._fetch(instrument, interval, start_ts, bounds[0] - 1, session_id)
+                bounds = self.bounds(instrument, interval)
+            if bounds is None:
+                added += await self._fetch(instrument, interval, start_ts, end_ts, session_id)
+            elif end_ts >= bounds[1] + step and self._clock() - series.checked_at >= self.refresh_seconds:
+                # Re-fetch from the last stored candle: it may have been a bar still in progress.
+                added += await self._fetch(instrument, interval, bounds[1], end_ts, session_id)
+            else:
+                return added
+            series.checked_at = self._clock()
+            return added
+
+    async def _fetch(self, instrument: str, interval: str, start_ts: int, end_ts: int, session_id: Optional[str]) -> int:
+        self.upstream_calls += 1
+        candles = await self._fetcher(
+            instrument, interval, datetime.fromtimestamp(start_ts, IST), datetime.fromtimestamp(end_ts, IST), session_id
+        )
+        columns = candles_to_columns(candles or [])
+        # append() may wait on another worker's series lock and does file I/O: keep it off the loop.
+        return await asyncio.to_thread(self.append, instrument, interval, columns)
+
+    async def get_range(self, instrument: str, interval: str, start: Any, end: Any = None,
+                        session_id: Optional[str] = None) -> Dict[str, np.ndarray]:
+        """sync() the missing tail, then read the range."""
+        await self.sync(instrument, interval, start, end, session_id)
+        return self.read(instrument, interval, start, end)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "series": len(self._series),
+            "rows": sum(max(s.length, 0) for s in self._series.values()),
+            "upstream_calls": self.upstream_calls,
+            "appended_rows": self.appended_rows,
+            "root": self.root,
+        }
+
+
+# Process-wide store; main.py installs the MCP-backed fetcher
+candle_store = CandleStore()
@@ -0,0 +1,205 @@
+"""
+data_client.py
+Pooled HTTP client for the upstream financial data API.
+
+Every request goes through one httpx.AsyncClient that lives on a dedicated background event
+loop. That keeps a single keep-alive connection pool per process which can be shared by async
+request handlers (whatever loop they run on) and by synchronous callers such as the CLI.
+GET responses for cacheable endpoints are served from core.response_cache when fresh and
+revalidated with conditional requests when stale, and identical concurrent requests share one
+upstream fetch via core.singleflight.
+"""
+
+import asyncio
+import json
+import os
+import threading
+from typing import Any, Dict, Optional
+
+import httpx
+
+from core.response_cache import ResponseCache
+from core.singleflight import SingleFlight
+from telemetry import current_request_id, span
+
+
+BASE_URL = os.getenv(
+    "FINANCIAL_API_BASE_URL",
+    "https://api-indian-financial-markets-485071544262.asia-south1.run.app/",
+)
+
+# Connection pool sizing; the limit is shared by every endpoint.
+MAX_CONNECTIONS = int(os.getenv("FINANCIAL_API_MAX_CONNECTIONS", "20"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("FINANCIAL_API_MAX_KEEPALIVE", "10"))
+
+CONNECT_TIMEOUT = float(os.getenv("FINANCIAL_API_CONNECT_TIMEOUT", "3"))
+READ_TIMEOUT = float(os.getenv("FINANCIAL_API_READ_TIMEOUT", "15"))
+
+# Per-endpoint timeouts. Endpoints not listed here use DEFAULT_TIMEOUT.
+DEFAULT_TIMEOUT = httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT)
+ENDPOINT_TIMEOUTS: Dict[str, httpx.Timeout] = {
+    "financials_in_sector": httpx.Timeout(30.0, connect=CONNECT_TIMEOUT),
+    "all_company_conference_calls": httpx.Timeout(30.0, connect=CONNECT_TIMEOUT),
+    "company_conference_call_period": httpx.Timeout(30.0, connect=CONNECT_TIMEOUT),
+    "search_chunks": httpx.Timeout(20.0, connect=CONNECT_TIMEOUT),
+    "conference_call_summary": httpx.Timeout(20.0, connect=CONNECT_TIMEOUT),
+    "conference_call_qa": httpx.Timeout(30.0, connect=CONNECT_TIMEOUT),
+}
+
+
+class DataClient:
+    """Async HTTP client on a private event loop, with a sync facade.
+
+    `request` may be awaited from any event loop; `run_sync` blocks the calling thread and
+    must not be used from inside a running event loop.
+    """
+
+    def __init__(
+        self,
+        base_url: str = BASE_URL,
+        max_connections: int = MAX_CONNECTIONS,
+        max_keepalive_connections: int = MAX_KEEPALIVE_CONNECTIONS,
+        timeouts: Optional[Dict[str, httpx.Timeout]] = None,
+        default_timeout: httpx.Timeout = DEFAULT_TIMEOUT,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        cache: Optional[ResponseCache] = None,
+    ):
+        self.base_url = base_url
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+        )
+        self.timeouts = dict(ENDPOINT_TIMEOUTS if timeouts is None else timeouts)
+        self.default_timeout = default_timeout
+        self._transport = transport
+        self.cache = cache if cache is not None else ResponseCache()
+        self.singleflight = SingleFlight()  # used only on the background loop
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._lock = threading.Lock()
+
+    # --- Event loop / session management ---
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(
+                    target=loop.run_forever, name="financial-data-client", daemon=True
+                )
+                thread.start()
+                self._loop, self._thread = loop, thread
+            return self._loop
+
+    def _get_client(self) -> httpx.AsyncClient:
+        # Only called on the background loop, so no locking is needed here.
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                limits=self.limits,
+                timeout=self.default_timeout,
+                transport=self._transport,
+            )
+        return self._client
+
+    def timeout_for(self, endpoint: str) -> httpx.Timeout:
+        return self.timeouts.get(endpoint, self.default_timeout)
+
+    async def _fetch(self, endpoint: str, method: str, path: str, payload: Any = None) -> bytes:
+        """Return the raw response body, from the cache or the upstream API."""
+        client = self._get_client()
+        timeout = self.timeout_for(endpoint)
+        if method != "GET" or not self.cache.is_cacheable(endpoint):
+            response = await client.request(method, path, json=payload, timeout=timeout)
+            response.raise_for_status()
+            return response.content
+
+        key = (method, path)
+        entry = self.cache.lookup(key)
+        if entry is not None and self.cache.is_fresh(entry):
+            self.cache.record_hit()
+            return entry.body
+
+        headers = entry.validators() if entry is not None else None
+        response = await client.request(method, path, headers=headers, timeout=timeout)
+        if response.status_code == 304 and entry is not None:
+            self.cache.refresh(key, endpoint)
+            return entry.body
+        response.raise_for_status()
+        self.cache.record_miss()
+        if "no-store" not in response.headers.get("Cache-Control", ""):
+            self.cache.store(
+                key,
+                endpoint,
+                response.content,
+                etag=response.headers.get("ETag"),
+                last_modified=response.headers.get("Last-Modified"),
+            )
+        return response.content
+
+    async def _send(self, endpoint: str, method: str, path: str, payload: Any = None,
+                    request_id: Optional[str] = None) -> Any:
+        # Runs on the background loop. Identical concurrent requests share one fetch; each
+        # caller decodes its own copy of the body so results are never shared objects.
+        # Every call is timed here, whichever way it arrived; the caller's request ID is set
+        # on this task so the span is linked to the request being served.
+        if request_id is not None:
+            current_request_id.set(request_id)
+        with span("upstream_http", endpoint):
+            key = (method, path, json.dumps(payload, sort_keys=True) if payload is not None else None)
+            body = await self.singleflight.do(key, lambda: self._fetch(endpoint, method, path, payload))
+            return json.loads(body)
+
+    # --- Public API ---
+
+    def _on_own_loop(self) -> bool:
+        try:
+            return asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
+
+    async def request(self, endpoint: str, method: str, path: str, payload: Any = None) -> Any:
+        """Perform a request on the shared session and return the decoded JSON body.
+
+        `endpoint` is a logical name used to look up the timeout. Raises httpx.HTTPError on
+        transport errors, timeouts and non-2xx responses.
+        """
+        request_id = current_request_id.get()
+        if self._on_own_loop():
+            return await self._send(endpoint, method, path, payload, request_id)
+        loop = self._ensure_loop()
+        future = asyncio.run_coroutine_threadsafe(self._send(endpoint, method, path, payload, request_id), loop)
+        return await asyncio.wrap_future(future)
+
+    def run_sync(self, coro) -> Any:
+        """Run a coroutine on the client's loop and block until it finishes (sync facade)."""
+        loop = self._ensure_loop()
+        return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+    async def get(self, endpoint: str, path: str) -> Any:
+        return await self.request(endpoint, "GET", path)
+
+    async def post(self, endpoint: str, path: str, payload: Any) -> Any:
+        return await self.request(endpoint, "POST", path, payload)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"cache": self.cache.stats(), "singleflight": self.singleflight.stats()}
+
+    def close(self) -> None:
+        """Close the pooled session and stop the background loop."""
+        with self._lock:
+            loop, thread, client = self._loop, self._thread, self._client
+            self._loop, self._thread, self._client = None, None, None
+        if loop is None:
+            return
+        if client is not None:
+            asyncio.run_coroutine_threadsafe(client.aclose(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        if thread is not None:
+            thread.join(timeout=5)
+        loop.close()
+
+
+# Process-wide client used by core.financial_data
+data_client = DataClient()
@@ -0,0 +1,67 @@
+"""
+file_lock.py
+Advisory locks and atomic replacement for files shared by the gunicorn workers.
+
+The workers of one instance share the local stores (candles, transcript segments, company
+aliases). Writers serialize on an fcntl lock file next to the data with locked(), and replace
+whole files through atomic_write(), which writes a uniquely named temporary file in the same
+directory and renames it over the target, so concurrent writers never share a temporary file
+and readers see either the old or the new content.
+"""
+
+import fcntl
+import os
+import tempfile
+from contextlib import contextmanager
+from typing import BinaryIO, Callable, Iterator, Optional
+
+
+def _open(path: str) -> int:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    return os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+
+
+@contextmanager
+def locked(path: str) -> Iterator[None]:
+    """Hold an exclusive lock on `path` (created if missing) for the duration of the block."""
+    fd = _open(path)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)  # closing the descriptor releases the lock
+
+
+def try_lock(path: str) -> Optional[int]:
+    """Take an exclusive lock without waiting; the descriptor holding it, or None if it is taken.
+
+    The lock is held until release(fd) (or until the process exits).
+    """
+    fd = _open(path)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        os.close(fd)
+        return None
+    return fd
+
+
+def release(fd: int) -> None:
+    os.close(fd)
+
+
+def atomic_write(path: str, write: Callable[[BinaryIO], None]) -> None:
+    """Replace `path` with what write(f) writes to a fresh temporary file beside it."""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
@@ -1,59 +1,105 @@
-import requests
+"""
+financial_data.py
+Wrappers for the upstream Indian financial markets API.
 
-BASE_URL = "https://api-indian-financial-markets-485071544262.asia-south1.run.app/"
+Each endpoint has an async function (`*_async`) for use inside request handlers and a
+synchronous function of the original name for scripts and the CLI. Both go through the pooled
+client in core.data_client, which applies the per-endpoint timeouts and response cache.
+
+Conference-call retrieval (conference_call_qa, search_chunks) is answered from the local
+transcript index in core.transcript_index when the call has been indexed. Otherwise the remote
+search is used, and the company's transcripts are fetched and indexed in the background so
+later questions are answered locally (and still answered if the remote search is down).
+"""
+
+import asyncio
+import os
+import time
+
+from core.data_client import BASE_URL, data_client  # noqa: F401  (BASE_URL kept for callers)
+from core.transcript_index import period_key, transcript_index
+from app_logging import get_logger
+
+log = get_logger(__name__)
+
+AUTO_INDEX_TRANSCRIPTS = os.getenv("TRANSCRIPT_INDEX_AUTO_INGEST", "1") == "1"
+# Do not try to index the same company's transcripts more often than this.
+INDEX_RETRY_SECONDS = 15 * 60
+_index_attempts = {}
+_index_tasks = set()  # keeps background indexing tasks referenced until they finish
+
+
+def get_data_client_stats():
+    """Counters of the shared data client (response cache, coalesced calls) and the transcript index."""
+    return {**data_client.stats(), "transcript_index": transcript_index.stats()}
 
 # 1. Get all historical financial data for a company
+async def get_company_data_async(company_id: str):
+    return await data_client.get("company_data", f"/companies/{company_id}")
+
 def get_company_data(company_id: str):
-    url = f"{BASE_URL}/companies/{company_id}"
-    response = requests.get(url)
-    response.raise_for_status()
-    return response.json()
+    return data_client.run_sync(get_company_data_async(company_id))
 
 # 2. Get all historical financial data for a company based on statement
+async def get_company_data_from_financials_async(company_id: str, statement_name: str):
+    return await data_client.get(
+        "company_financials", f"/companies/{company_id}/financials/{statement_name}"
+    )
+
 def get_company_data_from_financials(company_id: str, statement_name: str):
-    url = f"{BASE_URL}/companies/{company_id}/financials/{statement_name}"
-    response = requests.get(url)
-    response.raise_for_status()
-    return response.json()
+    return data_client.run_sync(get_company_data_from_financials_async(company_id, statement_name))
 
 # 3. Get a specific financial parameter from a company's statement
+async def get_company_data_from_financial_parameter_async(company_id: str, statement_name: str, parameter: str):
+    return await data_client.get(
+        "company_financial_parameter",
+        f"/companies/{company_id}/financials/{statement_name}/{parameter}",
+    )
+
 def get_company_data_from_financial_parameter(company_id: str, statement_name: str, parameter: str):
-    url = f"{BASE_URL}/companies/{company_id}/financials/{statement_name}/{parameter}"
-    response = requests.get(url)
-    response.raise_for_status()
-    return response.json()
+    return data_client.run_sync(
+        get_company_data_from_financial_parameter_async(company_id, statement_name, parameter)
+    )
 
 # 4. Get all companies in a sector
+async def get_companies_in_sector_async(sector: str):
+    return await data_client.get("companies_in_sector", f"/sectors/{sector}/companies/")
+
 def get_companies_in_sector(sector: str):
-    url = f"{BASE_URL}/sectors/{sector}/companies/"
-    response = requests.get(url)
-    response.raise_for_status()
-    return response.json()
+    return data_client.run_sync(get_companies_in_sector_async(sector))
 
 # 5. Get financial data for all companies in a sector
+async def get_financials_in_sector_async(sector: str):
+    return await data_client.get("financials_in_sector", f"/sectors/{sector}/financials/")
+
 def get_financials_in_sector(sector: str):
-    url = f"{BASE_URL}/sectors/{sector}/financials/"
-    response = requests.get(url)
-    response.raise_for_status()
-    return response.json()
+    return data_client.run_sync(get_financials_in_sector_async(sector))
 
 # 6. Get all conference call transcripts for a company
+async def get_all_company_conference_calls_async(company_id: str):
+    return await data_client.get(
+        "all_company_conference_calls", f"/companies/{company_id}/conferencecall/"
+    )
+
 def get_all_company_conference_calls(company_id: str):
-    url = f"{BASE_URL}/companies/{company_id}/conferencecall/"
-    response = requests.get(url)
-    response.raise_for_status()
-    return response.json()
+    return data_client.run_sync(get_all_company_conference_calls_async(company_id))
 
 # 7. Get conference call transcripts for a time period
+async def get_company_conference_call_period_async(company_id: str, time_period: str):
+    return await data_client.get(
+        "company_conference_call_period", f"/companies/{company_id}/conferencecall/{time_period}"
+    )
+
 def get_company_conference_call_period(company_id: str, time_period: str):
-    url = f"{BASE_URL}/companies/{company_id}/conferencecall/{time_period}"
-    response = requests.get(url)
-    response.raise_for_status()
-    return response.json()
+    return data_client.run_sync(get_company_conference_call_period_async(company_id, time_period))
 
 # 8. Search for top-k similar text chunks
-def search_chunks(query: str, k: int, company_name: str, statement_type: str, time_period: str):
-    url = f"{BASE_URL}/chunks/search"
+async def search_chunks_async(query: str, k: int, company_name: str, statement_type: str, time_period: str):
+    company = transcript_index.resolve(company_name)
+    if company is not None:
+        local = await asyncio.to_thread(transcript_index.search, company, period_key(time_period=time_period), query, k)
+        if local is not None:
+            return {"query": query, "k": k, "chunks": local, "source": "local"}
     payload = {
         "query": query,
         "k": k,
@@ -61,37 +107,97 @@ def search_chunks(query: str, k: int, company_name: str, statement_type: str, ti
         "statement_type": statement_type,
         "time_period": time_period
     }
-    response = requests.post(url, json=payload)
-    response.raise_for_status()
-    return response.json()
+    return await data_client.post("search_chunks", "/chunks/search", payload)
+
+def search_chunks(query: str, k: int, company_name: str, statement_type: str, time_period: str):
+    return data_client.run_sync(search_chunks_async(query, k, company_name, statement_type, time_period))
 
 # ---------------- New Conference Call Endpoints (Latest API) ---------------- #
 
-def get_companies_with_conference_calls():
+async def get_companies_with_conference_calls_async():
     """GET /companies/conference-calls/"""
-    url = f"{BASE_URL}/companies/conference-calls/"
-    response = requests.get(url)
-    response.raise_for_status()
-    return response.json()
+    return await data_client.get("companies_with_conference_calls", "/companies/conference-calls/")
 
-def get_conference_call_details(company_id: int):
+def get_companies_with_conference_calls():
+    return data_client.run_sync(get_companies_with_conference_calls_async())
+
+async def get_conference_call_details_async(company_id: int):
     """GET /companies/{company_id}/conference-calls/details/"""
-    url = f"{BASE_URL}/companies/{company_id}/conference-calls/details/"
-    response = requests.get(url)
-    response.raise_for_status()
-    return response.json()
+    return await data_client.get(
+        "conference_call_details", f"/companies/{company_id}/conference-calls/details/"
+    )
 
-def get_conference_call_summary(company_id: int, fiscal_year: int, fiscal_quarter: int):
+def get_conference_call_details(company_id: int):
+    return data_client.run_sync(get_conference_call_details_async(company_id))
+
+async def get_conference_call_summary_async(company_id: int, fiscal_year: int, fiscal_quarter: int):
     """GET /companies/{company_id}/conference-calls/{fiscal_year}/{fiscal_quarter}/summary/"""
-    url = f"{BASE_URL}/companies/{company_id}/conference-calls/{fiscal_year}/{fiscal_quarter}/summary/"
-    response = requests.get(url)
-    response.raise_for_status()
-    return response.json()
+    return await data_client.get(
+        "conference_call_summary",
+        f"/companies/{company_id}/conference-calls/{fiscal_year}/{fiscal_quarter}/summary/",
+    )
 
-def conference_call_qa(company_id: int, fiscal_year: int, fiscal_quarter: int, question: str, k: int = 3):
-    """POST /companies/{company_id}/conference-calls/{fiscal_year}/{fiscal_quarter}/qa/"""
-    url = f"{BASE_URL}/companies/{company_id}/conference-calls/{fiscal_year}/{fiscal_quarter}/qa/"
+def get_conference_call_summary(company_id: int, fiscal_year: int, fiscal_quarter: int):
+    return data_client.run_sync(get_conference_call_summary_async(company_id, fiscal_year, fiscal_quarter))
+
+async def conference_call_qa_async(company_id: int, fiscal_year: int, fiscal_quarter: int, question: str, k: int = 3):
+    """POST /companies/{company_id}/conference-calls/{fiscal_year}/{fiscal_quarter}/qa/
+
+    Answered locally as {"question", "k", "chunks": [{chunk_id, score, text}], "source": "local"}
+    when the call is in the transcript index.
+    """
+    period = period_key(fiscal_year, fiscal_quarter)
+
+    async def local():
+        chunks = await asyncio.to_thread(transcript_index.search, company_id, period, question, k)
+        return None if chunks is None else {"question": question, "k": k, "chunks": chunks, "source": "local"}
+
+    answer = await local()
+    if answer is not None:
+        return answer
     payload = {"question": question, "k": k}
-    response = requests.post(url, json=payload)
-    response.raise_for_status()
-    return response.json()
\ No newline at end of file
+    try:
+        result = await data_client.post(
+            "conference_call_qa",
+            f"/companies/{company_id}/conference-calls/{fiscal_year}/{fiscal_quarter}/qa/",
+            payload,
+        )
+    except Exception:
+        # Remote search failed: index the transcripts now if they can be fetched and answer locally.
+        if await index_company_transcripts_async(company_id):
+            answer = await local()
+            if answer is not None:
+                return answer
+        raise
+    schedule_transcript_indexing(company_id)
+    return result
+
+def conference_call_qa(company_id: int, fiscal_year: int, fiscal_quarter: int, question: str, k: int = 3):
+    return data_client.run_sync(conference_call_qa_async(company_id, fiscal_year, fiscal_quarter, question, k))
+
+# ---------------- Local transcript index ---------------- #
+
+async def index_company_transcripts_async(company_id):
+    """Fetch all of a company's conference-call transcripts and index them locally.
+
+    Returns the period keys indexed ([] if nothing usable was found or the fetch failed).
+    """
+    _index_attempts[str(company_id)] = time.monotonic()
+    try:
+        payload = await get_all_company_conference_calls_async(company_id)
+    except Exception as e:
+        log.warning("Could not fetch transcripts for company %s: %s", company_id, e)
+        return []
+    return await asyncio.to_thread(transcript_index.ingest, company_id, payload)
+
+def schedule_transcript_indexing(company_id):
+    """Index a company's transcripts in the background, at most once per INDEX_RETRY_SECONDS."""
+    if not AUTO_INDEX_TRANSCRIPTS:
+        return
+    last = _index_attempts.get(str(company_id))
+    if last is not None and time.monotonic() - last < INDEX_RETRY_SECONDS:
+        return
+    _index_attempts[str(company_id)] = time.monotonic()
+    task = asyncio.ensure_future(index_company_transcripts_async(company_id))
+    _index_tasks.add(task)
+    task.add_done_callback(_index_tasks.discard)
@@ -0,0 +1,135 @@
+"""
+portfolio_analytics.py
+Vectorized analytics over Kite holdings.
+
+holdings_frame() turns the normalized get_holdings rows into a columnar DataFrame in one pass;
+analyze() then computes per-position value, P&L, day change and weight plus portfolio totals
+and concentration (largest positions, Herfindahl index) with whole-column NumPy arithmetic, so
+a portfolio of thousands of positions is analysed in a few milliseconds.
+"""
+
+from typing import Any, Dict, Iterable, List
+
+import numpy as np
+import pandas as pd
+
+
+# Kite holding field -> frame column
+FIELDS = {
+    "tradingsymbol": "symbol",
+    "exchange": "exchange",
+    "quantity": "quantity",
+    "t1_quantity": "t1_quantity",
+    "average_price": "average_price",
+    "last_price": "last_price",
+    "close_price": "close_price",
+}
+NUMERIC = ["quantity", "t1_quantity", "average_price", "last_price", "close_price"]
+TOP_N = 5
+
+
+def holdings_frame(holdings: Iterable[Dict[str, Any]]) -> pd.DataFrame:
+    """Columnar frame of holdings; missing or non-numeric values become 0."""
+    rows = [h for h in holdings if isinstance(h, dict)]
+    df = pd.DataFrame({col: [r.get(field) for r in rows] for field, col in FIELDS.items()})
+    for col in NUMERIC:
+        df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0.0)
+    df["symbol"] = df["symbol"].fillna("").astype(str)
+    df["exchange"] = df["exchange"].fillna("").astype(str)
+    # Shares bought yesterday (T1) are held but not yet delivered; count them.
+    df["quantity"] = df["quantity"] + df["t1_quantity"]
+    return df.drop(columns="t1_quantity")
+
+
+def _pct(num: np.ndarray, den: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(den != 0, num / den * 100, 0.0)
+
+
+def analyze(holdings: Any) -> Dict[str, Any]:
+    """Portfolio metrics for get_holdings rows (or a frame from holdings_frame)."""
+    df = holdings if isinstance(holdings, pd.DataFrame) else holdings_frame(holdings)
+    qty = df["quantity"].to_numpy(dtype=float)
+    avg = df["average_price"].to_numpy(dtype=float)
+    ltp = df["last_price"].to_numpy(dtype=float)
+    close = df["close_price"].to_numpy(dtype=float)
+    # Before the first trade of the day close_price can be 0; treat it as "no change".
+    close = np.where(close > 0, close, ltp)
+
+    invested = qty * avg
+    value = qty * ltp
+    pnl = value - invested
+    day_change = qty * (ltp - close)
+    total_value = value.sum()
+    weight = value / total_value if total_value else np.zeros_like(value)
+
+    positions = df[["symbol", "exchange", "quantity", "average_price", "last_price"]].assign(
+        invested=invested,
+        value=value,
+        pnl=pnl,
+        pnl_pct=_pct(pnl, invested),
+        day_change=day_change,
+        day_change_pct=_pct(ltp - close, close),
+        weight_pct=weight * 100,
+    ).sort_values("value", ascending=False, kind="stable")
+
+    total_invested = invested.sum()
+    total_pnl = pnl.sum()
+    total_day = day_change.sum()
+    hhi = float(np.square(weight).sum())
+    by_day = positions.sort_values("day_change_pct", kind="stable")
+    return {
+        "positions": positions,
+        "totals": {
+            "positions": int(len(df)),
+            "invested": float(total_invested),
+            "value": float(total_value),
+            "pnl": float(total_pnl),
+            "pnl_pct": float(_pct(np.array(total_pnl), np.array(total_invested))),
+            "day_change": float(total_day),
+            "day_change_pct": float(_pct(np.array(total_day), np.array(total_value - total_day))),
+        },
+        "concentration": {
+            "top_weight_pct": float(positions["weight_pct"].head(TOP_N).sum()),
+            "largest": positions["symbol"].iloc[0] if len(positions) else None,
+            "largest_weight_pct": float(positions["weight_pct"].iloc[0]) if len(positions) else 0.0,
+            "herfindahl": hhi,
+            "effective_positions": 1 / hhi if hhi else 0.0,
+        },
+        "top_gainers": by_day.tail(TOP_N)[::-1],
+        "top_losers": by_day.head(TOP_N),
+    }
+
+
+def _records(frame: pd.DataFrame) -> List[Dict[str, Any]]:
+    return frame.round(4).to_dict(orient="records")
+
+
+def analysis_to_json(analysis: Dict[str, Any]) -> Dict[str, Any]:
+    """analyze() result with frames converted to lists of records for the REST API."""
+    return {
+        "totals": analysis["totals"],
+        "concentration": analysis["concentration"],
+        "positions": _records(analysis["positions"]),
+        "top_gainers": _records(analysis["top_gainers"][["symbol", "day_change", "day_change_pct"]]),
+        "top_losers": _records(analysis["top_losers"][["symbol", "day_change", "day_change_pct"]]),
+    }
+
+
+def summarize(analysis: Dict[str, Any]) -> str:
+    """Short plain-text report of an analyze() result, for chat answers."""
+    t = analysis["totals"]
+    c = analysis["concentration"]
+    if not t["positions"]:
+        return "Your portfolio has no holdings."
+    lines = [
+        f"Portfolio: {t['positions']} holdings worth ₹{t['value']:,.2f} (invested ₹{t['invested']:,.2f}).",
+        f"Overall P&L: ₹{t['pnl']:+,.2f} ({t['pnl_pct']:+.2f}%). Today: ₹{t['day_change']:+,.2f} ({t['day_change_pct']:+.2f}%).",
+        f"Largest position: {c['largest']} at {c['largest_weight_pct']:.1f}% of value; "
+        f"top {TOP_N} make up {c['top_weight_pct']:.1f}% (effective number of positions {c['effective_positions']:.1f}).",
+    ]
+    gainers = [f"{r.symbol} {r.day_change_pct:+.2f}%" for r in analysis["top_gainers"].itertuples() if r.day_change_pct > 0]
+    losers = [f"{r.symbol} {r.day_change_pct:+.2f}%" for r in analysis["top_losers"].itertuples() if r.day_change_pct < 0]
+    lines.append("Top gainers today: " + (", ".join(gainers) or "none"))
+    lines.append("Top losers today: " + (", ".join(losers) or "none"))
+    return "\n".join(lines)
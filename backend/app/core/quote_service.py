@@ -0,0 +1,175 @@
+"""
+quote_service.py
+Batched, deduplicated market quotes in front of the Kite MCP get_quote tool.
+
+Symbols requested within a short window (QUOTE_BATCH_WINDOW_MS) are collected into one
+get_quote call, a symbol already being fetched for another caller is awaited rather than
+requested again, and quotes are cached for QUOTE_TTL_SECONDS. Many concurrent valuations and
+chat questions therefore cost one upstream round trip per window.
+
+Upstream calls are made with the requesting user's own Kite session: batching and in-flight
+deduplication happen per session, so one user's request never spends another user's broker
+credentials or rate limit. The cache is shared, since quotes are not user-specific.
+
+The service does not know how to reach MCP itself: the app installs a fetcher with
+set_fetcher(); fetcher(["NSE:INFY", ...], session_id) returns {"NSE:INFY": {...quote...}, ...}.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from app_logging import get_logger
+
+log = get_logger(__name__)
+
+
+BATCH_WINDOW_SECONDS = float(os.getenv("QUOTE_BATCH_WINDOW_MS", "20")) / 1000
+TTL_SECONDS = float(os.getenv("QUOTE_TTL_SECONDS", "1.0"))
+MAX_BATCH_SIZE = int(os.getenv("QUOTE_MAX_BATCH_SIZE", "200"))
+DEFAULT_EXCHANGE = "NSE"
+
+Fetcher = Callable[[List[str], Optional[str]], Awaitable[Dict[str, Any]]]
+
+
+def normalize_symbol(symbol: str, exchange: str = DEFAULT_EXCHANGE) -> str:
+    """'infy' -> 'NSE:INFY'; 'bse:tcs' -> 'BSE:TCS'."""
+    symbol = symbol.strip().upper()
+    return symbol if ":" in symbol else f"{exchange}:{symbol}"
+
+
+class QuoteService:
+    """Loop-bound like core.singleflight: use it from one event loop (the app's)."""
+
+    def __init__(
+        self,
+        fetcher: Optional[Fetcher] = None,
+        window: float = BATCH_WINDOW_SECONDS,
+        ttl: float = TTL_SECONDS,
+        max_batch: int = MAX_BATCH_SIZE,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._fetcher = fetcher
+        self.window = window
+        self.ttl = ttl
+        self.max_batch = max_batch
+        self._clock = clock
+        self._cache: Dict[str, Tuple[float, Optional[Dict]]] = {}
+        # (session, symbol) -> result, batched or in flight
+        self._waiting: Dict[Tuple[Optional[str], str], asyncio.Future] = {}
+        self._pending: Dict[Optional[str], List[str]] = {}  # per session, symbols not yet sent upstream
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()  # keeps batch fetches referenced until they finish
+        self._lock = threading.Lock()  # guards the counters, which are read from other threads
+        self.requests = 0
+        self.cache_hits = 0
+        self.deduplicated = 0
+        self.batches = 0
+        self.upstream_symbols = 0
+
+    def set_fetcher(self, fetcher: Fetcher) -> None:
+        self._fetcher = fetcher
+
+    async def get_quotes(self, symbols: Iterable[str], session_id: Optional[str] = None) -> Dict[str, Optional[Dict]]:
+        """Return {normalized symbol: quote or None if upstream does not know the symbol}.
+
+        Symbols that are not cached are fetched with `session_id`'s Kite session.
+        """
+        if self._fetcher is None:
+            raise RuntimeError("quote service has no fetcher configured")
+        wanted = list(dict.fromkeys(normalize_symbol(s) for s in symbols if s and s.strip()))
+        now = self._clock()
+        result: Dict[str, Optional[Dict]] = {}
+        futures: Dict[str, asyncio.Future] = {}
+        hits = dedup = 0
+        for sym in wanted:
+            cached = self._cache.get(sym)
+            if cached is not None and now - cached[0] < self.ttl:
+                result[sym] = cached[1]
+                hits += 1
+                continue
+            fut = self._waiting.get((session_id, sym))
+            if fut is not None:
+                dedup += 1
+            else:
+                fut = self._waiting[(session_id, sym)] = asyncio.get_running_loop().create_future()
+                self._pending.setdefault(session_id, []).append(sym)
+            futures[sym] = fut
+        with self._lock:
+            self.requests += 1
+            self.cache_hits += hits
+            self.deduplicated += dedup
+
+        if self._pending:
+            if len(self._pending.get(session_id, ())) >= self.max_batch:
+                self._flush()
+            elif self._flush_handle is None:
+                self._flush_handle = asyncio.get_running_loop().call_later(self.window, self._flush)
+
+        for sym, fut in futures.items():
+            result[sym] = await asyncio.shield(fut)
+        return {sym: result[sym] for sym in wanted}
+
+    async def get_quote(self, symbol: str, session_id: Optional[str] = None) -> Optional[Dict]:
+        return (await self.get_quotes([symbol], session_id))[normalize_symbol(symbol)]
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        pending, self._pending = self._pending, {}
+        for session_id, symbols in pending.items():
+            for i in range(0, len(symbols), self.max_batch):
+                task = asyncio.ensure_future(self._fetch_batch(session_id, symbols[i:i + self.max_batch]))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+
+    async def _fetch_batch(self, session_id: Optional[str], batch: List[str]) -> None:
+        with self._lock:
+            self.batches += 1
+            self.upstream_symbols += len(batch)
+        try:
+            quotes = await self._fetcher(batch, session_id)
+        except Exception as e:
+            log.warning("get_quote failed for %s symbols: %s", len(batch), e)
+            for sym in batch:
+                fut = self._waiting.pop((session_id, sym), None)
+                if fut is not None and not fut.done():
+                    fut.set_exception(e)
+                    fut.exception()  # retrieved here so an unawaited future does not warn
+            return
+        now = self._clock()
+        for sym in batch:
+            quote = quotes.get(sym)
+            self._cache[sym] = (now, quote)
+            fut = self._waiting.pop((session_id, sym), None)
+            if fut is not None and not fut.done():
+                fut.set_result(quote)
+        self._evict_expired(now)
+
+    def _evict_expired(self, now: float) -> None:
+        if len(self._cache) > 4 * self.max_batch:
+            for sym in [s for s, (t, _) in self._cache.items() if now - t >= self.ttl]:
+                del self._cache[sym]
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "cache_hits": self.cache_hits,
+                "deduplicated": self.deduplicated,
+                "batches": self.batches,
+                "upstream_symbols": self.upstream_symbols,
+                "cached_symbols": len(self._cache),
+                "ttl_seconds": self.ttl,
+                "batch_window_ms": self.window * 1000,
+            }
+
+
+# Process-wide service; main.py installs the MCP-backed fetcher
+quote_service = QuoteService()
@@ -0,0 +1,139 @@
+"""
+response_cache.py
+Bounded in-process cache for upstream API responses.
+
+Entries are keyed by request and hold the raw response body together with its validators
+(ETag / Last-Modified). Each logical endpoint has its own TTL; once an entry is stale it is kept
+so the next request can revalidate it with If-None-Match / If-Modified-Since, and a 304 simply
+extends its lifetime. The total size of cached bodies is bounded and the least recently used
+entries are evicted first.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+MAX_BYTES = int(os.getenv("FINANCIAL_API_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# TTL in seconds per logical endpoint; endpoints not listed here are never cached.
+ENDPOINT_TTLS: Dict[str, float] = {
+    "company_data": HOUR,
+    "company_financials": HOUR,
+    "company_financial_parameter": HOUR,
+    "companies_in_sector": DAY,
+    "financials_in_sector": HOUR,
+    "all_company_conference_calls": HOUR,
+    "company_conference_call_period": DAY,
+    "companies_with_conference_calls": HOUR,
+    "conference_call_details": HOUR,
+    "conference_call_summary": DAY,
+}
+
+
+class CacheEntry:
+    __slots__ = ("body", "etag", "last_modified", "expires_at", "size")
+
+    def __init__(self, body: bytes, etag: Optional[str], last_modified: Optional[str], expires_at: float):
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.expires_at = expires_at
+        self.size = len(body)
+
+    def is_fresh(self, now: float) -> bool:
+        return now < self.expires_at
+
+    def validators(self) -> Dict[str, str]:
+        """Conditional request headers for revalidating this entry."""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class ResponseCache:
+    """LRU cache of response bodies bounded by total body size."""
+
+    def __init__(self, max_bytes: int = MAX_BYTES, ttls: Optional[Dict[str, float]] = None, clock=time.monotonic):
+        self.max_bytes = max_bytes
+        self.ttls = dict(ENDPOINT_TTLS if ttls is None else ttls)
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, CacheEntry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.evictions = 0
+
+    def is_cacheable(self, endpoint: str) -> bool:
+        return self.ttls.get(endpoint, 0) > 0
+
+    def lookup(self, key: Hashable) -> Optional[CacheEntry]:
+        """Return the entry for key (fresh or stale) and mark it as recently used."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def is_fresh(self, entry: CacheEntry) -> bool:
+        return entry.is_fresh(self._clock())
+
+    def record_hit(self) -> None:
+        with self._lock:
+            self.hits += 1
+
+    def record_miss(self) -> None:
+        with self._lock:
+            self.misses += 1
+
+    def store(self, key: Hashable, endpoint: str, body: bytes, etag: Optional[str] = None, last_modified: Optional[str] = None) -> None:
+        entry = CacheEntry(body, etag, last_modified, self._clock() + self.ttls.get(endpoint, 0))
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old.size
+            if entry.size > self.max_bytes:
+                return
+            self._entries[key] = entry
+            self._bytes += entry.size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.size
+                self.evictions += 1
+
+    def refresh(self, key: Hashable, endpoint: str) -> None:
+        """Extend an entry's lifetime after the upstream answered 304 Not Modified."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.expires_at = self._clock() + self.ttls.get(endpoint, 0)
+                self.revalidated += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses + self.revalidated
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "revalidated": self.revalidated,
+                "evictions": self.evictions,
+                "hit_ratio": (self.hits + self.revalidated) / lookups if lookups else 0.0,
+            }
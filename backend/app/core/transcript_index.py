@@ -0,0 +1,328 @@
+"""
+transcript_index.py
+Local BM25 retrieval over conference-call transcripts.
+
+Transcripts fetched from the upstream API are split into overlapping word windows and indexed
+per (company, period) segment. Each segment is an inverted index whose posting lists are NumPy
+arrays in CSR layout (indptr / doc ids / term frequencies), saved to disk as .npz next to a JSON
+file with the vocabulary and chunk texts. A top-k query touches only the posting lists of its
+terms and scores them with whole-array BM25 arithmetic, so it is answered in milliseconds
+without a network round trip, and keeps working while the upstream API is down.
+
+Transcript payloads are parsed leniently: any dict with a text field (transcript, text, content
+or chunk) is a transcript, labelled with the fiscal_year/fiscal_quarter or time_period found on
+it or on an enclosing dict.
+
+The gunicorn workers share INDEX_DIR: segment files and aliases.json are replaced through
+uniquely named temporary files under an fcntl lock (core.file_lock), and aliases are re-read
+and merged under the lock so one worker never overwrites another's additions.
+"""
+
+import json
+import math
+import os
+import re
+import tempfile
+import threading
+from collections import Counter, OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from core.file_lock import atomic_write, locked
+from app_logging import get_logger
+
+log = get_logger(__name__)
+
+
+INDEX_DIR = os.getenv("TRANSCRIPT_INDEX_DIR", os.path.join(tempfile.gettempdir(), "saras_transcripts"))
+CHUNK_WORDS = int(os.getenv("TRANSCRIPT_CHUNK_WORDS", "180"))
+CHUNK_OVERLAP = int(os.getenv("TRANSCRIPT_CHUNK_OVERLAP", "40"))
+MAX_LOADED_SEGMENTS = 256
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+TEXT_FIELDS = ("transcript", "text", "content", "chunk")
+_TOKEN = re.compile(r"[a-z0-9]+(?:[.&'][a-z0-9]+)*")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were "
+    "will with we our you your they their there what which who how do does did".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN.findall(text.lower()) if t not in STOPWORDS]
+
+
+def chunk_text(text: str, size: int = CHUNK_WORDS, overlap: int = CHUNK_OVERLAP) -> List[str]:
+    """Split text into windows of `size` words that overlap by `overlap` words."""
+    words = text.split()
+    if len(words) <= size:
+        return [" ".join(words)] if words else []
+    step = max(size - overlap, 1)
+    return [" ".join(words[i:i + size]) for i in range(0, len(words) - overlap, step)]
+
+
+_YEAR = re.compile(r"(?:FY\s*)?((?:19|20)\d{2})", re.IGNORECASE)
+_QUARTER = re.compile(r"Q\s*([1-4])", re.IGNORECASE)
+
+
+def period_key(fiscal_year: Any = None, fiscal_quarter: Any = None, time_period: Any = None) -> str:
+    """Canonical segment name: 'FY2025Q2' for a year and quarter (also parsed out of strings such
+    as "Q2 FY2025"), else the sanitised time_period."""
+    if (fiscal_year is None or fiscal_quarter is None) and time_period is not None:
+        year, quarter = _YEAR.search(str(time_period)), _QUARTER.search(str(time_period))
+        if year and quarter:
+            fiscal_year, fiscal_quarter = year.group(1), quarter.group(1)
+    if fiscal_year is not None and fiscal_quarter is not None:
+        try:
+            return f"FY{int(fiscal_year)}Q{int(fiscal_quarter)}"
+        except (TypeError, ValueError):
+            pass
+    return re.sub(r"[^A-Za-z0-9_-]+", "_", str(time_period or "all"))
+
+
+def company_names(payload: Any) -> List[str]:
+    """company_name values anywhere in a payload (used to resolve search_chunks' company_name)."""
+    names: List[str] = []
+    stack = [payload]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, dict):
+            if isinstance(item.get("company_name"), str):
+                names.append(item["company_name"])
+            stack.extend(v for v in item.values() if isinstance(v, (dict, list)))
+        elif isinstance(item, list):
+            stack.extend(item)
+    return list(dict.fromkeys(names))
+
+
+def extract_transcripts(payload: Any, labels: Optional[Dict[str, Any]] = None) -> Dict[str, List[str]]:
+    """Collect transcript texts from an upstream payload, grouped by period key."""
+    labels = dict(labels or {})
+    found: Dict[str, List[str]] = {}
+    if isinstance(payload, list):
+        for item in payload:
+            for period, texts in extract_transcripts(item, labels).items():
+                found.setdefault(period, []).extend(texts)
+        return found
+    if not isinstance(payload, dict):
+        return found
+    for key in ("fiscal_year", "year"):
+        if key in payload:
+            labels["fiscal_year"] = payload[key]
+    for key in ("fiscal_quarter", "quarter"):
+        if key in payload:
+            labels["fiscal_quarter"] = payload[key]
+    for key in ("time_period", "period"):
+        if key in payload and isinstance(payload[key], (str, int)):
+            labels["time_period"] = payload[key]
+    for field in TEXT_FIELDS:
+        if isinstance(payload.get(field), str) and payload[field].strip():
+            period = period_key(labels.get("fiscal_year"), labels.get("fiscal_quarter"), labels.get("time_period"))
+            found.setdefault(period, []).append(payload[field])
+            break
+    for value in payload.values():
+        if isinstance(value, (dict, list)):
+            for period, texts in extract_transcripts(value, labels).items():
+                found.setdefault(period, []).extend(texts)
+    return found
+
+
+class Segment:
+    """Inverted index over the chunks of one company's transcripts for one period."""
+
+    def __init__(self, chunks: List[str], vocab: Dict[str, int], indptr: np.ndarray,
+                 doc_ids: np.ndarray, tfs: np.ndarray, doc_len: np.ndarray):
+        self.chunks = chunks
+        self.vocab = vocab
+        self.indptr = indptr
+        self.doc_ids = doc_ids
+        self.tfs = tfs
+        self.doc_len = doc_len
+        self.avgdl = float(doc_len.mean()) if len(doc_len) else 0.0
+
+    @classmethod
+    def build(cls, chunks: List[str]) -> "Segment":
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        doc_len = np.zeros(len(chunks), dtype=np.float32)
+        for doc, chunk in enumerate(chunks):
+            counts = Counter(tokenize(chunk))
+            doc_len[doc] = sum(counts.values())
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append((doc, tf))
+        terms = sorted(postings)
+        indptr = np.zeros(len(terms) + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum([len(postings[t]) for t in terms])
+        doc_ids = np.empty(indptr[-1], dtype=np.int32)
+        tfs = np.empty(indptr[-1], dtype=np.float32)
+        for i, term in enumerate(terms):
+            docs, counts = zip(*postings[term])
+            doc_ids[indptr[i]:indptr[i + 1]] = docs
+            tfs[indptr[i]:indptr[i + 1]] = counts
+        return cls(chunks, {t: i for i, t in enumerate(terms)}, indptr, doc_ids, tfs, doc_len)
+
+    def search(self, query: str, k: int = 3) -> List[Dict[str, Any]]:
+        n = len(self.chunks)
+        if not n:
+            return []
+        scores = np.zeros(n, dtype=np.float32)
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_len / (self.avgdl or 1.0))
+        for term in set(tokenize(query)):
+            t = self.vocab.get(term)
+            if t is None:
+                continue
+            lo, hi = self.indptr[t], self.indptr[t + 1]
+            docs, tf = self.doc_ids[lo:hi], self.tfs[lo:hi]
+            idf = math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            scores[docs] += idf * tf * (BM25_K1 + 1) / (tf + norm[docs])
+        k = min(k, n)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [
+            {"chunk_id": int(i), "score": round(float(scores[i]), 4), "text": self.chunks[i]}
+            for i in top if scores[i] > 0
+        ]
+
+    # --- Persistence ---
+
+    def save(self, base: str) -> None:
+        meta = json.dumps({"terms": sorted(self.vocab, key=self.vocab.get), "chunks": self.chunks})
+        # Locked so the .json and .npz moved into place come from the same writer.
+        with locked(base + ".lock"):
+            atomic_write(base + ".json", lambda f: f.write(meta.encode("utf-8")))
+            # The .npz is the marker a segment exists, so it is moved into place last.
+            atomic_write(base + ".npz", lambda f: np.savez(
+                f, indptr=self.indptr, doc_ids=self.doc_ids, tfs=self.tfs, doc_len=self.doc_len,
+            ))
+
+    @classmethod
+    def load(cls, base: str) -> "Segment":
+        with open(base + ".json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        with np.load(base + ".npz") as arrays:
+            return cls(
+                meta["chunks"], {t: i for i, t in enumerate(meta["terms"])},
+                arrays["indptr"], arrays["doc_ids"], arrays["tfs"], arrays["doc_len"],
+            )
+
+
+class TranscriptIndex:
+    def __init__(self, root: str = INDEX_DIR, max_loaded: int = MAX_LOADED_SEGMENTS):
+        self.root = root
+        self.max_loaded = max_loaded
+        self._segments: "OrderedDict[Tuple[str, str], Segment]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._aliases: Optional[Dict[str, str]] = None  # lower-case company name -> company key
+        self._aliases_version: Optional[Tuple[int, int]] = None  # (inode, mtime) of aliases.json when read
+        self.local_queries = 0
+        self.indexed_segments = 0
+
+    def _base(self, company: Any, period: str) -> str:
+        safe = re.sub(r"[^A-Za-z0-9_-]+", "_", str(company))
+        return os.path.join(self.root, safe, period)
+
+    def add(self, company: Any, period: str, texts: Iterable[str]) -> Segment:
+        chunks = [c for text in texts for c in chunk_text(text)]
+        segment = Segment.build(chunks)
+        segment.save(self._base(company, period))
+        with self._lock:
+            self._segments[(str(company), period)] = segment
+            self._segments.move_to_end((str(company), period))
+            self.indexed_segments += 1
+        log.debug("Indexed %s chunks for company %s %s", len(chunks), company, period)
+        return segment
+
+    def ingest(self, company: Any, payload: Any, labels: Optional[Dict[str, Any]] = None) -> List[str]:
+        """Index every transcript found in an upstream payload; return the period keys indexed."""
+        periods = extract_transcripts(payload, labels)
+        for period, texts in periods.items():
+            self.add(company, period, texts)
+        if periods:
+            for name in company_names(payload):
+                self.add_alias(name, company)
+        return list(periods)
+
+    # --- Company names ---
+
+    def _alias_path(self) -> str:
+        return os.path.join(self.root, "aliases.json")
+
+    def _load_aliases(self) -> Dict[str, str]:
+        """The aliases on disk, re-read whenever another worker has changed the file."""
+        version = self._alias_version()
+        if self._aliases is None or version != self._aliases_version:
+            try:
+                with open(self._alias_path(), "r", encoding="utf-8") as f:
+                    self._aliases = json.load(f)
+            except (OSError, ValueError):
+                self._aliases = {}
+            self._aliases_version = version
+        return self._aliases
+
+    def _alias_version(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(self._alias_path())
+        except OSError:
+            return None
+        return st.st_ino, st.st_mtime_ns
+
+    def add_alias(self, name: str, company: Any) -> None:
+        key = name.strip().lower()
+        with self._lock:
+            if self._load_aliases().get(key) == str(company):
+                return
+            # Merge into the current file under the lock, so other workers' aliases are kept.
+            with locked(self._alias_path() + ".lock"):
+                aliases = dict(self._load_aliases())
+                aliases[key] = str(company)
+                atomic_write(self._alias_path(), lambda f: f.write(json.dumps(aliases).encode("utf-8")))
+                self._aliases = aliases
+                self._aliases_version = self._alias_version()
+
+    def resolve(self, company_name: str) -> Optional[str]:
+        """Company key indexed under this name, if any."""
+        with self._lock:
+            return self._load_aliases().get(str(company_name).strip().lower())
+
+    def segment(self, company: Any, period: str) -> Optional[Segment]:
+        key = (str(company), period)
+        with self._lock:
+            seg = self._segments.get(key)
+            if seg is not None:
+                self._segments.move_to_end(key)
+                return seg
+        base = self._base(company, period)
+        if not os.path.exists(base + ".npz"):
+            return None
+        seg = Segment.load(base)
+        with self._lock:
+            self._segments[key] = seg
+            while len(self._segments) > self.max_loaded:
+                self._segments.popitem(last=False)
+        return seg
+
+    def has(self, company: Any, period: str) -> bool:
+        return self.segment(company, period) is not None
+
+    def search(self, company: Any, period: str, query: str, k: int = 3) -> Optional[List[Dict[str, Any]]]:
+        """Top-k chunks for the query, or None if this company/period is not indexed locally."""
+        seg = self.segment(company, period)
+        if seg is None:
+            return None
+        with self._lock:
+            self.local_queries += 1
+        return seg.search(query, k)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "loaded_segments": len(self._segments),
+                "indexed_segments": self.indexed_segments,
+                "local_queries": self.local_queries,
+                "root": self.root,
+            }
+
+
+# Process-wide index used by core.financial_data
+transcript_index = TranscriptIndex()
@@ -0,0 +1,286 @@
+"""
+warmup.py
+Background warm-up of conference-call data for newly reported quarters.
+
+Every WARMUP_INTERVAL_SECONDS the pipeline lists the companies with conference calls, works out
+each company's newest fiscal periods (from the listing when it carries them, else from the
+company's conference-call details) and prefetches what a first question about a new quarter
+needs: the call details and summary go through core.data_client, which leaves them in the
+response cache, and the transcripts are indexed into core.transcript_index. A period is warmed
+once; one that failed is retried on the next cycle.
+
+Companies are warmed WARMUP_CONCURRENCY at a time and every upstream call takes a token from a
+shared token bucket (WARMUP_RATE_PER_SECOND), so warming never crowds out user requests on the
+shared connection pool. status() reports progress for the /data/warmup endpoint.
+
+Every gunicorn worker runs the pipeline, because the call details and summaries land in each
+worker's own response cache; WARMUP_RATE_PER_SECOND is therefore a per-worker budget. The
+transcript index is on disk and shared, so only one worker builds it: the one holding a
+non-blocking fcntl lock on WARMUP_LOCK_FILE (under the transcript index directory). The others
+retry the lock every cycle, so one takes over if the indexing worker exits.
+"""
+
+import asyncio
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from core import financial_data
+from core.file_lock import release, try_lock
+from core.transcript_index import INDEX_DIR, period_key, transcript_index
+from app_logging import get_logger
+
+log = get_logger(__name__)
+
+
+ENABLED = os.getenv("WARMUP_ENABLED", "1") == "1"
+INTERVAL_SECONDS = float(os.getenv("WARMUP_INTERVAL_SECONDS", "900"))
+CONCURRENCY = int(os.getenv("WARMUP_CONCURRENCY", "4"))
+RATE_PER_SECOND = float(os.getenv("WARMUP_RATE_PER_SECOND", "2"))
+# How many of each company's most recent periods to keep warm.
+LATEST_PERIODS = int(os.getenv("WARMUP_LATEST_PERIODS", "1"))
+# Held by the one worker that indexes transcripts.
+LOCK_FILE = os.getenv("WARMUP_LOCK_FILE", os.path.join(INDEX_DIR, "warmup.lock"))
+
+Period = Tuple[int, int]  # (fiscal_year, fiscal_quarter)
+
+
+def company_ids(payload: Any) -> List[Tuple[Any, Any]]:
+    """(company_id, entry) for each company in a get_companies_with_conference_calls payload."""
+    if isinstance(payload, dict):
+        for key in ("companies", "results", "data", "items"):
+            if isinstance(payload.get(key), list):
+                payload = payload[key]
+                break
+    if not isinstance(payload, list):
+        return []
+    found = []
+    for entry in payload:
+        if isinstance(entry, dict):
+            cid = entry.get("company_id", entry.get("id"))
+            if cid is not None:
+                found.append((cid, entry))
+        elif isinstance(entry, (int, str)):
+            found.append((entry, None))
+    return found
+
+
+def conference_periods(payload: Any) -> List[Period]:
+    """Fiscal (year, quarter) pairs mentioned anywhere in a payload, newest first."""
+    periods: Set[Period] = set()
+    stack = [payload]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, list):
+            stack.extend(item)
+            continue
+        if not isinstance(item, dict):
+            continue
+        year = item.get("fiscal_year", item.get("year"))
+        quarter = item.get("fiscal_quarter", item.get("quarter"))
+        key = period_key(year, quarter, item.get("time_period", item.get("period")))
+        if key.startswith("FY") and "Q" in key:
+            try:
+                periods.add((int(key[2:6]), int(key[7:])))
+            except ValueError:
+                pass
+        stack.extend(v for v in item.values() if isinstance(v, (dict, list)))
+    return sorted(periods, reverse=True)
+
+
+class RateLimiter:
+    """Token bucket: `rate` acquisitions per second on average, bursts of up to `burst`."""
+
+    def __init__(self, rate: float, burst: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = burst if burst is not None else max(rate, 1.0)
+        self._tokens = self.burst
+        self._clock = clock
+        self._updated = clock()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = self._clock()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class WarmupPipeline:
+    def __init__(
+        self,
+        interval: float = INTERVAL_SECONDS,
+        concurrency: int = CONCURRENCY,
+        rate: float = RATE_PER_SECOND,
+        latest_periods: int = LATEST_PERIODS,
+        list_companies: Optional[Callable[[], Awaitable[Any]]] = None,
+        fetch_details: Optional[Callable[[Any], Awaitable[Any]]] = None,
+        fetch_summary: Optional[Callable[[Any, int, int], Awaitable[Any]]] = None,
+        index_transcripts: Optional[Callable[[Any], Awaitable[List[str]]]] = None,
+        is_indexed: Optional[Callable[[Any, str], bool]] = None,
+        lock_file: str = LOCK_FILE,
+    ):
+        self.interval = interval
+        self.lock_file = lock_file
+        self.concurrency = max(concurrency, 1)
+        self.latest_periods = max(latest_periods, 1)
+        self.limiter = RateLimiter(rate)
+        self._list_companies = list_companies or financial_data.get_companies_with_conference_calls_async
+        self._fetch_details = fetch_details or financial_data.get_conference_call_details_async
+        self._fetch_summary = fetch_summary or financial_data.get_conference_call_summary_async
+        self._index_transcripts = index_transcripts or financial_data.index_company_transcripts_async
+        self._is_indexed = is_indexed or transcript_index.has
+        self._warmed: Set[Tuple[str, Period]] = set()
+        self._task: Optional[asyncio.Task] = None
+        self._lock_fd: Optional[int] = None  # set while this worker is the one indexing
+        self._status: Dict[str, Any] = {
+            "state": "idle",
+            "cycles": 0,
+            "companies": 0,
+            "companies_done": 0,
+            "periods_warmed": 0,
+            "summaries_fetched": 0,
+            "transcripts_indexed": 0,
+            "errors": 0,
+            "indexer": False,
+            "last_error": None,
+            "last_started_at": None,
+            "last_finished_at": None,
+            "last_duration_seconds": None,
+            "next_run_at": None,
+        }
+
+    async def _call(self, fn: Callable[..., Awaitable[Any]], *args: Any) -> Any:
+        await self.limiter.acquire()
+        return await fn(*args)
+
+    def _error(self, what: str, e: Exception) -> None:
+        self._status["errors"] += 1
+        self._status["last_error"] = f"{what}: {e}"
+        log.warning("%s failed: %s", what, e)
+
+    async def _warm_company(self, company_id: Any, entry: Any, sem: asyncio.Semaphore, indexer: bool) -> None:
+        async with sem:
+            try:
+                periods = conference_periods(entry) if entry is not None else []
+                new = [p for p in periods[:self.latest_periods] if (str(company_id), p) not in self._warmed]
+                if periods and not new:
+                    return
+                # The details are prefetched for every company with a new period, and tell us its
+                # periods when the listing does not.
+                details = await self._call(self._fetch_details, company_id)
+                if not periods:
+                    periods = conference_periods(details)
+                    new = [p for p in periods[:self.latest_periods] if (str(company_id), p) not in self._warmed]
+                if not new:
+                    return
+                indexed = None
+                for year, quarter in new:
+                    ok = True
+                    try:
+                        await self._call(self._fetch_summary, company_id, year, quarter)
+                        self._status["summaries_fetched"] += 1
+                    except Exception as e:
+                        ok = False
+                        self._error(f"summary {company_id} FY{year}Q{quarter}", e)
+                    key = period_key(year, quarter)
+                    if not self._is_indexed(company_id, key):
+                        # Transcripts are indexed by one worker. The others only warm their
+                        # caches and revisit the period until that worker has indexed it.
+                        if not indexer:
+                            ok = False
+                        else:
+                            if indexed is None:
+                                indexed = await self._call(self._index_transcripts, company_id) or []
+                                if indexed:
+                                    self._status["transcripts_indexed"] += 1
+                            ok = ok and key in indexed
+                    if ok:
+                        self._warmed.add((str(company_id), (year, quarter)))
+                        self._status["periods_warmed"] += 1
+            except Exception as e:
+                self._error(f"company {company_id}", e)
+            finally:
+                self._status["companies_done"] += 1
+
+    async def run_once(self) -> None:
+        """One warm-up cycle over every company with conference calls."""
+        started = time.time()
+        self._status.update(state="running", last_started_at=started, companies=0, companies_done=0)
+        try:
+            companies = company_ids(await self._call(self._list_companies))
+        except Exception as e:
+            self._error("listing companies", e)
+            companies = []
+        self._status["companies"] = len(companies)
+        sem = asyncio.Semaphore(self.concurrency)
+        indexer = self._acquire()
+        self._status["indexer"] = indexer
+        await asyncio.gather(*(self._warm_company(cid, entry, sem, indexer) for cid, entry in companies))
+        finished = time.time()
+        self._status.update(
+            state="idle",
+            cycles=self._status["cycles"] + 1,
+            last_finished_at=finished,
+            last_duration_seconds=round(finished - started, 3),
+        )
+
+    def _acquire(self) -> bool:
+        if self._lock_fd is None:
+            try:
+                self._lock_fd = try_lock(self.lock_file)
+            except OSError as e:
+                self._error("warm-up lock", e)
+            if self._lock_fd is not None:
+                log.info("Worker %s indexes transcripts during warm-up", os.getpid())
+        return self._lock_fd is not None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                self._error("warm-up cycle", e)
+                self._status["state"] = "idle"
+            self._status["next_run_at"] = time.time() + self.interval
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        """Start the periodic warm-up loop on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._lock_fd is not None:
+            release(self._lock_fd)
+            self._lock_fd = None
+        self._status["state"] = "stopped"
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            **self._status,
+            "enabled": ENABLED,
+            "worker": os.getpid(),
+            "interval_seconds": self.interval,
+            "concurrency": self.concurrency,
+            "rate_per_second": self.limiter.rate,
+            "warmed_periods_total": len(self._warmed),
+        }
+
+
+# Process-wide pipeline; main.py starts it with the app when WARMUP_ENABLED=1
+warmup_pipeline = WarmupPipeline()
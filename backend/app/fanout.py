@@ -0,0 +1,100 @@
+"""
+fanout.py
+Run several agents for one query concurrently and merge their answers.
+
+A routing decision may name more than one agent, each with the part of the question it should
+answer: {"agents": [{"agent": "conference_call", "query": "..."}, {"agent": "news", "query":
+"..."}], "reason": "..."}. parse_plan() validates that against the registry, run_plan() starts
+every agent at once with its own deadline and merge_results() joins whatever came back, in plan
+order, into one response. An agent that fails or misses its deadline is reported in its section
+instead of failing the whole answer, so the total latency is that of the slowest agent (capped
+by its deadline), not the sum.
+"""
+
+import asyncio
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from agents.runner import AgentTimeout, agent_runner, parse_agent_settings
+from app_logging import get_logger
+
+log = get_logger(__name__)
+
+
+MAX_AGENTS = int(os.getenv("FANOUT_MAX_AGENTS", "3"))
+AGENT_DEADLINE_SECONDS = float(os.getenv("FANOUT_AGENT_DEADLINE_SECONDS", "20"))
+# Per-agent overrides of AGENT_DEADLINE_SECONDS, e.g. FANOUT_AGENT_DEADLINES="news=8,market_data=5"
+AGENT_DEADLINES = parse_agent_settings(os.getenv("FANOUT_AGENT_DEADLINES", ""))
+
+
+def parse_plan(selection: Any, known: Dict[str, Any], default_query: str = "") -> List[Tuple[str, str]]:
+    """[(agent_name, sub_query)] from a routing decision's "agents" list.
+
+    Entries may be {"agent": name, "query": sub_query} or bare names (which get the whole
+    query). Unknown agents are dropped, duplicates of the same (agent, query) merged and the
+    plan is capped at MAX_AGENTS. Returns [] for single-agent decisions.
+    """
+    if not isinstance(selection, dict) or not isinstance(selection.get("agents"), list):
+        return []
+    plan: List[Tuple[str, str]] = []
+    for entry in selection["agents"]:
+        if isinstance(entry, str):
+            name, query = entry, default_query
+        elif isinstance(entry, dict):
+            name, query = entry.get("agent"), entry.get("query") or default_query
+        else:
+            continue
+        if name in known and (name, query) not in plan:
+            plan.append((name, str(query)))
+    return plan[:MAX_AGENTS]
+
+
+def deadline_for(name: str) -> float:
+    return AGENT_DEADLINES.get(name, AGENT_DEADLINE_SECONDS)
+
+
+async def _timed(name: str, agent: Any, query: str, deadline: float) -> Dict[str, Any]:
+    start = time.perf_counter()
+    result: Dict[str, Any] = {"agent": name, "query": query}
+    try:
+        result["response"] = await asyncio.wait_for(agent_runner.run(name, agent, query), deadline)
+        result["status"] = "ok"
+    except (asyncio.TimeoutError, AgentTimeout):
+        result.update(status="timeout", error=f"no answer within {min(deadline, agent_runner.timeout_for(name)):g}s")
+    except Exception as e:
+        result.update(status="error", error=str(e))
+    result["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    log.debug("%s: %s in %s ms", name, result['status'], result['elapsed_ms'])
+    return result
+
+
+async def run_plan(plan: List[Tuple[str, str]], agents: Dict[str, Any],
+                   deadlines: Optional[Dict[str, float]] = None) -> List[Dict[str, Any]]:
+    """Run every (agent, sub_query) concurrently; results in plan order.
+
+    Each result is {agent, query, status: ok|timeout|error, response|error, elapsed_ms}.
+    """
+    deadlines = deadlines or {}
+    return list(await asyncio.gather(*(
+        _timed(name, agents[name], query, deadlines.get(name, deadline_for(name)))
+        for name, query in plan
+    )))
+
+
+def _title(name: str) -> str:
+    return name.replace("_", " ").capitalize()
+
+
+def merge_results(results: List[Dict[str, Any]]) -> str:
+    """One response with a section per agent, in plan order."""
+    if len(results) == 1 and results[0]["status"] == "ok":
+        return str(results[0]["response"])
+    sections = []
+    for r in results:
+        heading = f"**{_title(r['agent'])}** ({r['query']})"
+        if r["status"] == "ok":
+            sections.append(f"{heading}\n{r['response']}")
+        else:
+            sections.append(f"{heading}\nThis part could not be answered: {r['error']}.")
+    return "\n\n".join(sections)
@@ -0,0 +1,236 @@
+"""
+holdings_feed.py
+Per-session holdings snapshots shared by pollers and streaming subscribers.
+
+Each MCP session has one snapshot of its holdings. GET /mcp/holdings is answered from that
+snapshot, with its timestamp, while it is younger than the refresh interval. Otherwise the
+snapshot is refreshed with a single upstream get_holdings call that concurrent callers share.
+While a browser is subscribed to /mcp/holdings/stream, a background loop refreshes the snapshot
+every interval and pushes only the rows that changed. N tabs on one session therefore cost one
+upstream call per interval, not N.
+
+Rows are keyed by exchange:tradingsymbol (falling back to instrument_token, then position).
+Results that are not a list of rows (e.g. a "please log in" message) are pushed whole.
+"""
+
+import asyncio
+import os
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from core.singleflight import SingleFlight
+from app_logging import get_logger
+
+log = get_logger(__name__)
+
+
+REFRESH_INTERVAL_SECONDS = float(os.getenv("HOLDINGS_REFRESH_SECONDS", "5"))
+SUBSCRIBER_QUEUE_SIZE = 32
+
+
+def row_key(row: Dict[str, Any], index: int) -> str:
+    symbol = row.get("tradingsymbol")
+    if symbol is not None:
+        return f"{row.get('exchange', '')}:{symbol}"
+    token = row.get("instrument_token")
+    if token is not None:
+        return str(token)
+    return f"#{index}"
+
+
+def _as_rows(content: Any) -> Optional[Tuple[List[str], Dict[str, Dict]]]:
+    """Return (ordered keys, key -> row) if content is a list of row dicts, else None."""
+    if not isinstance(content, list) or not all(isinstance(r, dict) for r in content):
+        return None
+    keys: List[str] = []
+    rows: Dict[str, Dict] = {}
+    for i, row in enumerate(content):
+        key = row_key(row, i)
+        if key in rows:  # duplicate symbol; keep both rows
+            key = f"{key}#{i}"
+        keys.append(key)
+        rows[key] = row
+    return keys, rows
+
+
+class _Feed:
+    __slots__ = ("content", "keys", "rows", "version", "as_of", "fetched_at", "subscribers", "task")
+
+    def __init__(self) -> None:
+        self.content: Any = None
+        self.keys: Optional[List[str]] = None
+        self.rows: Dict[str, Dict] = {}
+        self.version = 0
+        self.as_of: Optional[float] = None  # wall-clock time of the last successful fetch
+        self.fetched_at: Optional[float] = None  # monotonic time of the same
+        self.subscribers: Set[asyncio.Queue] = set()
+        self.task: Optional[asyncio.Task] = None
+
+
+class HoldingsFeed:
+    def __init__(
+        self,
+        fetch: Callable[[str], Awaitable[Any]],
+        refresh_interval: float = REFRESH_INTERVAL_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+        wall_clock: Callable[[], float] = time.time,
+    ):
+        """fetch(session_id) returns the parsed holdings; it raises LookupError for a dead session."""
+        self.fetch = fetch
+        self.refresh_interval = refresh_interval
+        self._clock = clock
+        self._wall_clock = wall_clock
+        self._feeds: Dict[str, _Feed] = {}
+        self._singleflight = SingleFlight()
+        self.upstream_calls = 0
+        self.served_from_snapshot = 0
+        self.deltas_pushed = 0
+
+    # --- Snapshot ---
+
+    def _payload(self, feed: _Feed) -> Dict[str, Any]:
+        age = self._clock() - feed.fetched_at if feed.fetched_at is not None else None
+        payload = {
+            "holdings": feed.content,
+            "version": feed.version,
+            "as_of": feed.as_of,
+            "age_seconds": round(age, 3) if age is not None else None,
+        }
+        if feed.keys is not None:
+            payload["keys"] = list(feed.keys)
+        return payload
+
+    async def refresh(self, session_id: str) -> _Feed:
+        """Fetch holdings once (shared by concurrent callers) and publish what changed."""
+        return await self._singleflight.do(session_id, lambda: self._refresh(session_id))
+
+    async def _refresh(self, session_id: str) -> _Feed:
+        self.upstream_calls += 1
+        content = await self.fetch(session_id)
+        feed = self._feeds.setdefault(session_id, _Feed())
+        feed.fetched_at = self._clock()
+        feed.as_of = self._wall_clock()
+
+        parsed = _as_rows(content)
+        if parsed is not None and feed.keys is not None:
+            keys, rows = parsed
+            upserts = {k: r for k, r in rows.items() if feed.rows.get(k) != r}
+            removed = [k for k in feed.keys if k not in rows]
+            order_changed = keys != feed.keys
+            feed.content, feed.keys, feed.rows = content, keys, rows
+            if upserts or removed or order_changed:
+                feed.version += 1
+                delta = {"version": feed.version, "as_of": feed.as_of, "upserts": upserts, "removed": removed}
+                if order_changed:
+                    delta["keys"] = list(keys)
+                self._publish(feed, "delta", delta)
+        elif content != feed.content or feed.version == 0:
+            feed.content = content
+            feed.keys, feed.rows = parsed if parsed is not None else (None, {})
+            feed.version += 1
+            self._publish(feed, "snapshot", self._payload(feed))
+        return feed
+
+    async def snapshot(self, session_id: str) -> Dict[str, Any]:
+        """Holdings for a poller: the snapshot if fresh, else one (coalesced) refresh."""
+        feed = self._feeds.get(session_id)
+        if feed is not None and feed.fetched_at is not None and self._clock() - feed.fetched_at < self.refresh_interval:
+            self.served_from_snapshot += 1
+            return self._payload(feed)
+        try:
+            feed = await self.refresh(session_id)
+        except LookupError:
+            self.drop(session_id)
+            raise
+        except Exception as e:
+            if feed is None or feed.fetched_at is None:
+                raise
+            log.warning("Refresh failed for %s; serving stale snapshot: %s", session_id, e)
+            return {**self._payload(feed), "stale": True, "error": str(e)}
+        return self._payload(feed)
+
+    # --- Streaming ---
+
+    def _publish(self, feed: _Feed, event: str, data: Dict[str, Any]) -> None:
+        for queue in list(feed.subscribers):
+            if queue.full():
+                # Slow consumer: discard its backlog and resynchronise it with a full snapshot.
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(("snapshot", self._payload(feed)))
+            else:
+                queue.put_nowait((event, data))
+            if event == "delta":
+                self.deltas_pushed += 1
+
+    async def subscribe(self, session_id: str) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """Yield ("snapshot", payload) first, then ("delta" | "snapshot" | "error", data) as holdings change."""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        try:
+            yield "snapshot", await self.snapshot(session_id)
+        except Exception as e:
+            yield "error", {"error": str(e), "fatal": isinstance(e, LookupError)}
+            return
+        feed = self._feeds.setdefault(session_id, _Feed())
+        feed.subscribers.add(queue)
+        if feed.task is None or feed.task.done():
+            feed.task = asyncio.get_running_loop().create_task(self._run(session_id))
+        try:
+            while True:
+                event, data = await queue.get()
+                yield event, data
+                if event == "error" and data.get("fatal"):
+                    return
+        finally:
+            feed.subscribers.discard(queue)
+            if not feed.subscribers and feed.task is not None:
+                feed.task.cancel()
+                feed.task = None
+
+    async def _run(self, session_id: str) -> None:
+        """Refresh loop for one session; runs while it has subscribers."""
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            feed = self._feeds.get(session_id)
+            if feed is None:
+                return
+            try:
+                await self.refresh(session_id)
+            except asyncio.CancelledError:
+                raise
+            except LookupError as e:
+                self._publish(feed, "error", {"error": str(e), "fatal": True})
+                self.drop(session_id)
+                return
+            except Exception as e:
+                log.warning("Refresh failed for %s: %s", session_id, e)
+                self._publish(feed, "error", {"error": str(e), "fatal": False})
+
+    # --- Lifecycle ---
+
+    def drop(self, session_id: str) -> None:
+        """Forget a session's snapshot and end its subscriptions (e.g. when the session closes)."""
+        feed = self._feeds.pop(session_id, None)
+        if feed is None:
+            return
+        if feed.task is not None and feed.task is not asyncio.current_task():
+            feed.task.cancel()
+        feed.task = None
+        for queue in list(feed.subscribers):
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(("error", {"error": "session_closed", "fatal": True}))
+
+    def stop(self) -> None:
+        for session_id in list(self._feeds):
+            self.drop(session_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sessions": len(self._feeds),
+            "subscribers": sum(len(f.subscribers) for f in self._feeds.values()),
+            "upstream_calls": self.upstream_calls,
+            "served_from_snapshot": self.served_from_snapshot,
+            "deltas_pushed": self.deltas_pushed,
+            "refresh_interval_seconds": self.refresh_interval,
+        }
@@ -4,15 +4,17 @@ Router for handling LLM-based chat focused on Conference Call data.
 Supports OpenAI and Gemini tool-calling to query the latest API endpoints.
 
 Situations to cater to:
--> Multiple agents being called in one query
+-> Multiple agents being called in one query: the router may return several agents with a
+   sub-query each; they run concurrently via fanout.py and their answers are merged.
 """
 
 # --- Imports ---
 import os
 import json
+from typing import Optional
 from fastapi import APIRouter, Request
-from openai import OpenAI
-import threading
+from fastapi.responses import StreamingResponse
+from openai import AsyncOpenAI
 from dotenv import load_dotenv
 from tools import tools
 
@@ -22,60 +24,89 @@ from agents.news_agent import NewsAgent
 from agents.market_data_agent import MarketDataAgent
 from agents.company_kb_agent import CompanyKBAgent
 from agents.company_disclosures_agent import CompanyDisclosuresAgent
+from agents.portfolio_agent import PortfolioAgent
+from agents.base import current_mcp_session
 from agents.registry import registry
+from agents.runner import agent_runner
+from routing_cache import routing_cache
+from local_router import local_router
+from session_store import create_session_store
+from context_builder import context_builder, count_tokens
+from routing_prompt import routing_prompt
+from fanout import merge_results, parse_plan, run_plan
+from telemetry import span
+from app_logging import Lazy, get_logger
+
+log = get_logger(__name__)
 
 
 # --- Configuration & Setup ---
-print("[llm_router] Loading environment variables...")
+log.debug("Loading environment variables...")
 load_dotenv(dotenv_path=".env")
 
 router = APIRouter()
-openai_client = OpenAI()
+# One shared async client per worker process: it keeps a pooled keep-alive HTTP connection
+# to the provider, and awaiting it leaves the event loop free to serve other requests.
+openai_client = AsyncOpenAI(
+    timeout=float(os.getenv("OPENAI_TIMEOUT_SECONDS", "60")),
+    max_retries=int(os.getenv("OPENAI_MAX_RETRIES", "2")),
+)
 
 # Register all agents here
-print("[llm_router] Registering agents...")
+log.debug("Registering agents...")
 registry.register("conference_call", ConferenceCallAgent())
 registry.register("financial_statements", FinancialStatementsAgent())
 registry.register("news", NewsAgent())
 registry.register("market_data", MarketDataAgent())
 registry.register("company_kb", CompanyKBAgent())
 registry.register("company_disclosures", CompanyDisclosuresAgent())
-print("[llm_router] Agents registered.")
+registry.register("portfolio", PortfolioAgent())
+log.info("Agents registered.")
+routing_prompt.report(registry.list_agents())
 
 
-# --- In-memory per-session chat histories ---
-# Keeps the most recent N messages (user + assistant) per session in memory only.
-chat_histories = {}
-chat_histories_lock = threading.Lock()
+# --- Per-session chat histories ---
+# Keeps the most recent N messages (user + assistant) per session. The backend is chosen by
+# CHAT_SESSION_BACKEND: "memory" (per worker) or "sqlite" (shared by all workers on the host).
+# Idle sessions are removed by a background sweeper thread.
 HISTORY_LIMIT = 20
+session_store = create_session_store(history_limit=HISTORY_LIMIT)
+session_store.start_sweeper()
 
 
-def get_chat_history(session_id: str):
+async def get_chat_history(session_id: str):
     """Return a copy of the chat history list for the given session id.
 
     Each message is a dict: {"role": "user"|"assistant", "content": str}
     """
-    with chat_histories_lock:
-        return list(chat_histories.get(session_id, []))
+    with span("history", "get"):
+        return await session_store.aget(session_id)
 
 
-def add_to_chat_history(session_id: str, message: dict):
+async def add_to_chat_history(session_id: str, message: dict):
     """Append a message to the session history and trim to the most recent HISTORY_LIMIT messages."""
     if not isinstance(message, dict) or "role" not in message or "content" not in message:
         return
-    with chat_histories_lock:
-        if session_id not in chat_histories:
-            chat_histories[session_id] = []
-        chat_histories[session_id].append(message)
-        # Trim to last HISTORY_LIMIT messages
-        if len(chat_histories[session_id]) > HISTORY_LIMIT:
-            chat_histories[session_id] = chat_histories[session_id][-HISTORY_LIMIT:]
+    with span("history", "append"):
+        await session_store.aappend(session_id, message)
+
+
+@router.get("/stats")
+async def session_stats():
+    """Session store sizing: number of sessions, messages and bytes held."""
+    return session_store.stats()
+
+
+@router.get("/agents/stats")
+async def agent_stats():
+    """Agent runner counters: running calls per agent, completed, timed out, failed, cancelled."""
+    return agent_runner.stats()
 
 
 @router.post("/reset")
 @router.post("/session/reset")
 async def reset_session(request: Request):
-    """Clear the in-memory history for a given session_id.
+    """Clear the stored history for a given session_id.
 
     Body: {"session_id": "..."}
     Returns: {"status": "ok", "cleared": bool}
@@ -83,149 +114,279 @@ async def reset_session(request: Request):
     try:
         body = await request.json()
         session_id = str(body.get("session_id", "default"))
-        with chat_histories_lock:
-            existed = session_id in chat_histories
-            if existed:
-                del chat_histories[session_id]
-        print(f"[llm_router] Cleared session history for {session_id}: existed={existed}")
+        with span("history", "clear"):
+            existed = await session_store.aclear(session_id)
+        context_builder.forget(session_id)
+        log.debug("Cleared session history for %s: existed=%s", session_id, existed)
         return {"status": "ok", "cleared": existed}
     except Exception as e:
-        print(f"[llm_router] Error clearing session: {e}")
+        log.warning("Error clearing session: %s", e)
         return {"status": "error", "error": str(e)}
 
 
-def choose_agent_via_llm(user_query: str, session_id: str = None):
+def _context_before_query(history_msgs: list, user_query: str) -> list:
+    """History excluding the current query, which chat_endpoint records before routing."""
+    if history_msgs and history_msgs[-1] == {"role": "user", "content": user_query}:
+        return history_msgs[:-1]
+    return history_msgs
+
+
+def _parse_agent_selection(choice_msg: str):
+    """Parse the JSON decision from the model output; be permissive."""
+    try:
+        return json.loads(choice_msg)
+    except Exception:
+        # try to extract first JSON substring
+        start = choice_msg.find('{')
+        end = choice_msg.rfind('}')
+        if start != -1 and end != -1 and end > start:
+            try:
+                return json.loads(choice_msg[start:end+1])
+            except Exception as e:
+                log.warning("Failed parsing JSON substring: %s", e)
+    return None
+
+
+async def choose_agent_via_llm(user_query: str, session_id: str = None):
     """Ask the LLM to pick an agent from the registry for the given user_query.
 
-    Returns a dict: {"agent": "registry_name", "reason": "..."}
+    Decisions for a near-identical query in the same recent context are served from
+    routing_cache without calling the model.
+
+    Returns a dict: {"agent": "registry_name", "reason": "..."}, or for multi-part questions
+    {"agents": [{"agent": "registry_name", "query": "sub-query"}, ...], "reason": "..."}.
     If selection fails, returns None.
     """
     try:
         agents_map = registry.list_agents()
-        print(f"[llm_router] Available agents for selection: {agents_map}")
-
-        # Load routing knowledge base if available
-        kb_text = ""
-        kb_path = os.path.join(os.path.dirname(__file__), "agent_routing_knowledge.md")
-        try:
-            with open(kb_path, "r", encoding="utf-8") as f:
-                kb_text = f.read()
-                print("[llm_router] Loaded agent routing knowledge base for prompt.")
-        except Exception:
-            print("[llm_router] No agent routing knowledge base found; proceeding without it.")
-
-        system_prompt = (
-            "You are an assistant that selects the best specialised agent to handle a user's query."
-            " Respond only with valid JSON in the format: {\"agent\": \"registry_name\", \"reason\": \"why\"}."
-            " If you are unsure, return agent as null.\n\n"
-            + (kb_text or "")
-        )
-
-        agent_list_text = "\n".join([f"- {name}: {clsname}" for name, clsname in agents_map.items()])
+        log.debug("Available agents for selection: %s", agents_map)
+
+        history_msgs = await get_chat_history(session_id) if session_id else []
+        routing_cache.validate(routing_prompt.version(agents_map))
+        cache_key = routing_cache.make_key(user_query, _context_before_query(history_msgs, user_query))
+        cached = routing_cache.get(cache_key)
+        if cached is not None:
+            log.debug("Routing cache hit: %s", cached)
+            return cached
+
+        # The static prefix (instructions, knowledge base, agent list) is prebuilt and cached.
+        system_prompt = routing_prompt.system_prompt(agents_map)
         user_prompt = (
-            f"Available agents:\n{agent_list_text}\n\n"
             f"User query: \"{user_query}\"\n\n"
-            "Choose the single most appropriate agent and return the JSON object as described."
+            "Choose the most appropriate agent (or agents, if the query has several distinct parts) "
+            "and return the JSON object as described."
         )
 
-        # Build messages: system prompt, optional recent session history, then the user prompt
+        # Build messages: static system prompt first (byte-identical across requests so provider
+        # prompt caching applies), then token-budgeted session context, then the user prompt
         messages = [{"role": "system", "content": system_prompt}]
-        if session_id:
-            history_msgs = get_chat_history(session_id)
-            if history_msgs:
-                print(f"[llm_router] Including {len(history_msgs)} history messages from session {session_id} in agent selection prompt")
-                # history_msgs are already in {role, content} format
-                messages.extend(history_msgs)
+        if history_msgs:
+            context_msgs = context_builder.build(session_id, history_msgs)
+            log.debug(
+                "Including %s context messages (~%s tokens) from session %s in agent selection prompt",
+                len(context_msgs), Lazy(lambda: sum(count_tokens(m["content"]) for m in context_msgs)), session_id,
+            )
+            messages.extend(context_msgs)
 
         messages.append({"role": "user", "content": user_prompt})
 
-        resp = openai_client.chat.completions.create(
-            model="gpt-5-mini",
-            messages=messages
-        )
+        with span("routing", "llm"):
+            resp = await openai_client.chat.completions.create(
+                model="gpt-5-mini",
+                messages=messages
+            )
         choice_msg = resp.choices[0].message.content
-        print(f"[llm_router] Agent selection raw response: {choice_msg}")
-
-        # Parse JSON from the model output; be permissive
-        try:
-            parsed = json.loads(choice_msg)
-            return parsed
-        except Exception:
-            # try to extract first JSON substring
-            start = choice_msg.find('{')
-            end = choice_msg.rfind('}')
-            if start != -1 and end != -1 and end > start:
-                try:
-                    parsed = json.loads(choice_msg[start:end+1])
-                    return parsed
-                except Exception as e:
-                    print(f"[llm_router] Failed parsing JSON substring: {e}")
-        return None
+        log.debug("Agent selection raw response: %s", choice_msg)
+
+        parsed = _parse_agent_selection(choice_msg)
+        # Only cache definite routes; clarifying questions (agent null) depend on the conversation.
+        if isinstance(parsed, dict) and (parsed.get("agent") in agents_map or parse_plan(parsed, agents_map)):
+            routing_cache.put(cache_key, parsed)
+        return parsed
     except Exception as e:
-        print(f"[llm_router] Error when asking LLM to choose agent: {e}")
+        log.warning("Error when asking LLM to choose agent: %s", e)
         return None
 
+async def select_agent(user_query: str, session_id: str = None):
+    """Pick an agent for the query: the local classifier when it is confident, else the LLM.
+
+    Multi-part questions always go to the LLM, which may split them across agents: those with
+    keyword matches for several agents here, those with several strong classifier scores (and
+    advice or out-of-scope questions) in local_router.route.
+    Returns the same dict (or None) as choose_agent_via_llm.
+    """
+    with span("routing", "local"):
+        multi_part = len(registry.match_agents(user_query)) > 1
+        local = None if multi_part else local_router.route(user_query, registry.agents())
+    if local is not None:
+        log.debug("Local router selected agent without LLM: %s", local)
+        return local
+    return await choose_agent_via_llm(user_query, session_id)
+
+async def _resolve_agent(user_query: str, session_id: str):
+    """Run agent selection for a query.
+
+    Returns (agent_name, agent, clarification, plan): `clarification` is set when the router
+    asked a clarifying question instead of picking an agent; `plan` lists (agent_name, sub_query)
+    pairs when several agents should answer parts of the query; otherwise `agent` is None when
+    the caller should fall back to registry.route_query.
+    """
+    with span("routing", "select"):
+        selection = await select_agent(user_query, session_id)
+    log.debug("Agent selection result: %s", selection)
+    if not selection or not isinstance(selection, dict):
+        return None, None, None, []
+
+    if "agents" in selection:
+        plan = parse_plan(selection, registry.agents(), user_query)
+        if len(plan) > 1:
+            log.debug("Fanning out to %s agents: %s", len(plan), plan)
+            return None, None, None, plan
+        if not plan:
+            log.info("No registered agent in multi-agent selection; falling back to default routing")
+            return None, None, None, []
+        selection = {"agent": plan[0][0], "reason": selection.get("reason")}
+
+    agent_name = selection.get("agent")
+    reason = selection.get("reason")
+    log.debug("LLM selected agent: %s (reason: %s)", agent_name, reason)
+
+    # If LLM explicitly returned null/None for agent, treat 'reason' as a clarifying question
+    if agent_name is None:
+        if reason:
+            log.info("LLM requested clarification: %s", reason)
+            return None, None, reason, []
+        log.info("LLM returned null agent without reason; falling back to default routing")
+        return None, None, None, []
+
+    agent = registry.get(agent_name)
+    if agent is None:
+        log.info("Selected agent '%s' not found in registry; falling back to default routing", agent_name)
+        return agent_name, None, None, []
+    log.debug("Routing to agent '%s' -> %s", agent_name, agent.__class__.__name__)
+    return agent_name, agent, None, []
+
+
 # --- Main Chat Endpoint ---
 
 @router.post("")
 @router.post("/")
 async def chat_endpoint(request: Request):
     try:
-        print("[llm_router] Received POST request at chat endpoint.")
+        log.debug("Received POST request at chat endpoint.")
         body = await request.json()
         user_query = body.get("query")
         session_id = str(body.get("session_id", "default"))  # Use a real session/user id in production
-        print(f"[llm_router] Received user query: {user_query} (session: {session_id})")
+        current_mcp_session.set(body.get("mcp_session_id"))
+        log.debug("Received user query: %s (session: %s)", user_query, session_id)
 
         # Record user message into session history (will be trimmed to HISTORY_LIMIT)
-        add_to_chat_history(session_id, {"role": "user", "content": user_query})
-
-        # Ask LLM to choose an agent (include session history)
-        selection = choose_agent_via_llm(user_query, session_id)
-        print(f"[llm_router] Agent selection result: {selection}")
-
-        response = None
-        if selection and isinstance(selection, dict):
-            agent_name = selection.get("agent")
-            reason = selection.get("reason")
-            print(f"[llm_router] LLM selected agent: {agent_name} (reason: {reason})")
-
-            # If LLM explicitly returned null/None for agent, treat 'reason' as a clarifying question
-            if agent_name is None:
-                if reason:
-                    print(f"[llm_router] LLM requested clarification: {reason}")
-                    # Save assistant clarifying question and return
-                    add_to_chat_history(session_id, {"role": "assistant", "content": reason})
-                    return {"response": reason}
-                else:
-                    print("[llm_router] LLM returned null agent without reason; falling back to default routing")
-
-            if agent_name and registry.get(agent_name):
-                agent = registry.get(agent_name)
-                print(f"[llm_router] Routing to agent '{agent_name}' -> {agent.__class__.__name__}")
-                try:
-                    response = agent.handle(user_query)
-                except TypeError:
-                    # fallback to just passing the query
-                    response = agent.handle(user_query)
-            else:
-                print(f"[llm_router] Selected agent '{agent_name}' not found in registry; falling back to default routing")
-
-        if response is None:
+        await add_to_chat_history(session_id, {"role": "user", "content": user_query})
+
+        agent_name, agent, clarification, plan = await _resolve_agent(user_query, session_id)
+        if clarification is not None:
+            # Save assistant clarifying question and return
+            await add_to_chat_history(session_id, {"role": "assistant", "content": clarification})
+            return {"response": clarification}
+
+        if plan:
+            response = merge_results(await run_plan(plan, registry.agents()))
+        elif agent is not None:
+            response = await agent_runner.run(agent_name, agent, user_query)
+        else:
             # fallback: let registry find a matching agent by can_handle
-            print("[llm_router] Falling back to registry.route_query")
-            response = registry.route_query(user_query)
+            log.info("Falling back to registry.route_query")
+            response = await registry.aroute_query(user_query)
 
         # Save assistant response into session history
-        add_to_chat_history(session_id, {"role": "assistant", "content": response})
+        await add_to_chat_history(session_id, {"role": "assistant", "content": response})
 
-        print(f"[llm_router] Response from agent: {response}")
+        log.debug("Response from agent: %s", response)
         return {"response": response}
 
     except Exception as e:
-        print(f"[llm_router] Unexpected error in chat endpoint: {e}")
+        log.error("Unexpected error in chat endpoint: %s", e)
         return {"response": f"An error occurred: {e}"}
 
+# --- Streaming Chat Endpoint (Server-Sent Events) ---
+
+def _sse(event: str, data: dict) -> str:
+    """Format one Server-Sent Events message."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def _single(text: str):
+    yield text
+
+
+async def _chat_events(user_query: str, session_id: str, mcp_session_id: Optional[str] = None):
+    """Run the chat pipeline and yield SSE messages: status, route, chunk..., done (or error).
+
+    Only the fully assembled answer is stored in the session history, exactly as chat_endpoint
+    stores it; nothing is stored if the client disconnects midway.
+    """
+    try:
+        current_mcp_session.set(mcp_session_id)
+        await add_to_chat_history(session_id, {"role": "user", "content": user_query})
+        yield _sse("status", {"stage": "routing"})
+
+        agent_name, agent, clarification, plan = await _resolve_agent(user_query, session_id)
+        if clarification is not None:
+            await add_to_chat_history(session_id, {"role": "assistant", "content": clarification})
+            yield _sse("chunk", {"text": clarification})
+            yield _sse("done", {"response": clarification})
+            return
+
+        if plan:
+            yield _sse("route", {"agent": None, "agents": [name for name, _ in plan]})
+        else:
+            yield _sse("route", {"agent": agent_name if agent is not None else None})
+        yield _sse("status", {"stage": "answering"})
+        if plan:
+            chunks = _single(merge_results(await run_plan(plan, registry.agents())))
+        elif agent is not None:
+            chunks = agent_runner.stream(agent_name, agent, user_query)
+        else:
+            log.info("Falling back to registry.route_query")
+            chunks = _single(await registry.aroute_query(user_query))
+
+        parts = []
+        async for chunk in chunks:
+            parts.append(chunk)
+            yield _sse("chunk", {"text": chunk})
+
+        response = "".join(parts)
+        await add_to_chat_history(session_id, {"role": "assistant", "content": response})
+        yield _sse("done", {"response": response})
+    except Exception as e:
+        log.error("Unexpected error in chat stream: %s", e)
+        yield _sse("error", {"error": f"An error occurred: {e}"})
+
+
+@router.post("/stream")
+async def chat_stream_endpoint(request: Request):
+    """Streaming variant of the chat endpoint.
+
+    Body: {"query": "...", "session_id": "...", "mcp_session_id": "..." (optional)}
+    Returns a text/event-stream: `status` (pipeline stage), `route` (selected agent),
+    one or more `chunk` events with answer text, then `done` with the full response.
+    A body that cannot be read yields a single `error` event, as /chat answers with an error.
+    """
+    try:
+        body = await request.json()
+        user_query = body.get("query")
+        session_id = str(body.get("session_id", "default"))
+        events = _chat_events(user_query, session_id, body.get("mcp_session_id"))
+        log.debug("Received streaming query: %s (session: %s)", user_query, session_id)
+    except Exception as e:
+        log.error("Invalid chat stream request: %s", e)
+        events = _single(_sse("error", {"error": f"An error occurred: {e}"}))
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 '''
 from core.financial_data import (
     get_companies_with_conference_calls,
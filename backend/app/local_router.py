@@ -0,0 +1,197 @@
+"""
+local_router.py
+Local TF-IDF classifier that routes confident queries without calling the LLM.
+
+Each registered agent is represented by a TF-IDF centroid built from its KEYWORDS and from the
+labelled queries in tests/data/routing_examples.jsonl. A query is scored against all agents at
+once (one sparse-vector x dense-matrix product). The router only answers when the best score
+clears the threshold and beats the runner-up by a margin; everything else, including queries
+with no identifiable subject that need a clarifying question, goes to choose_agent_via_llm.
+
+Queries the routing knowledge base has policy rules for are never routed locally either:
+requests for advice or opinions (rule 11), non-financial topics (rule 10) and questions that
+more than one agent has a real claim on, which the LLM may split across agents.
+"""
+
+import json
+import os
+import re
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app_logging import get_logger
+
+log = get_logger(__name__)
+
+
+EXAMPLES_PATH = os.getenv(
+    "LOCAL_ROUTER_EXAMPLES",
+    os.path.join(os.path.dirname(__file__), "tests", "data", "routing_examples.jsonl"),
+)
+ENABLED = os.getenv("LOCAL_ROUTER_ENABLED", "1") not in ("0", "false", "False")
+THRESHOLD = float(os.getenv("LOCAL_ROUTER_THRESHOLD", "0.45"))
+MARGIN = float(os.getenv("LOCAL_ROUTER_MARGIN", "0.15"))
+# An agent scoring at least this much has a real claim on part of the query; when two do, the
+# query is left to the LLM, which may split it across agents.
+SECOND_AGENT_SCORE = float(os.getenv("LOCAL_ROUTER_SECOND_AGENT_SCORE", "0.2"))
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+# Advice, opinions and predictions: the LLM router declines these (knowledge base rule 11).
+_ADVICE = re.compile(
+    r"\b(should (i|we)|buy|sell|hold|invest|investing|recommend\w*|advi[cs]e|opinion|worth it|"
+    r"predict\w*|forecast|target price|good (stock|buy|time|investment)|(go|going) (up|down))\b",
+    re.IGNORECASE,
+)
+# Non-financial topics: the LLM router redirects these (knowledge base rule 10).
+_OUT_OF_SCOPE = re.compile(
+    r"\b(weather|jokes?|recipes?|movies?|songs?|cricket|football|horoscope|poems?|flights?|holidays?)\b",
+    re.IGNORECASE,
+)
+
+# Words that never identify what a query is about on their own. A query made only of these and
+# of agent keywords (e.g. "Show me the balance sheet") lacks a subject, so the LLM should ask.
+GENERIC_WORDS = {
+    "a", "about", "all", "an", "and", "any", "are", "as", "at", "be", "by", "can", "company",
+    "current", "did", "do", "does", "for", "from", "get", "give", "how", "i", "in", "is", "it",
+    "its", "last", "latest", "list", "me", "my", "of", "on", "please", "q1", "q2", "q3", "q4",
+    "quarter", "recent", "show", "summarise", "summarize", "summary", "tell", "that", "the",
+    "this", "to", "was", "what", "whats", "when", "where", "which", "who", "why", "with", "year",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall((text or "").lower())
+
+
+def extract_features(text: str) -> Counter:
+    """Word unigrams, word bigrams and boundary-marked character trigrams of non-generic words."""
+    words = [w for w in tokenize(text) if w not in GENERIC_WORDS]
+    feats: Counter = Counter()
+    feats.update(f"w:{w}" for w in words)
+    feats.update(f"b:{a}_{b}" for a, b in zip(words, words[1:]))
+    for w in words:
+        padded = f"<{w}>"
+        feats.update(f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2))
+    return feats
+
+
+def load_examples(path: str = EXAMPLES_PATH) -> List[Dict[str, str]]:
+    examples = []
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    examples.append(json.loads(line))
+    except OSError:
+        log.info("No routing examples at %s; training on agent keywords only.", path)
+    return examples
+
+
+class LocalRouter:
+    def __init__(self, threshold: float = THRESHOLD, margin: float = MARGIN, examples_path: str = EXAMPLES_PATH,
+                 second_agent_score: float = SECOND_AGENT_SCORE):
+        self.threshold = threshold
+        self.margin = margin
+        self.second_agent_score = second_agent_score
+        self.examples_path = examples_path
+        self._lock = threading.Lock()
+        self._fingerprint = None
+        self._names: List[str] = []
+        self._vocab: Dict[str, int] = {}
+        self._idf = np.zeros(0, dtype=np.float32)
+        self._centroids = np.zeros((0, 0), dtype=np.float32)
+        self._intent_words: set = set()
+
+    def fit(self, agents: Dict[str, object]) -> None:
+        """Build per-agent TF-IDF centroids from agent keywords and labelled examples."""
+        docs: Dict[str, Counter] = {name: Counter() for name in agents}
+        intent_words = set(GENERIC_WORDS)
+        for name, agent in agents.items():
+            for kw in getattr(agent, "KEYWORDS", None) or []:
+                docs[name].update(extract_features(kw))
+                intent_words.update(tokenize(kw))
+        for ex in load_examples(self.examples_path):
+            name = ex.get("expected_agent")
+            if name in docs:
+                docs[name].update(extract_features(ex.get("query", "")))
+
+        names = [n for n, d in docs.items() if d]
+        vocab: Dict[str, int] = {}
+        for n in names:
+            for feat in docs[n]:
+                vocab.setdefault(feat, len(vocab))
+
+        centroids = np.zeros((len(names), len(vocab)), dtype=np.float32)
+        for row, n in enumerate(names):
+            idx = np.fromiter((vocab[f] for f in docs[n]), dtype=np.int64, count=len(docs[n]))
+            counts = np.fromiter(docs[n].values(), dtype=np.float32, count=len(docs[n]))
+            centroids[row, idx] = 1.0 + np.log(counts)  # sublinear tf
+        # Features used by every agent carry no information: idf = log(N / df) makes them 0.
+        df = np.count_nonzero(centroids, axis=0)
+        idf = np.log(len(names) / np.maximum(df, 1)).astype(np.float32) if names else np.zeros(0, np.float32)
+        centroids *= idf
+        norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+        centroids /= np.where(norms > 0, norms, 1.0)
+
+        self._names, self._vocab, self._idf, self._centroids = names, vocab, idf, centroids
+        self._intent_words = intent_words
+
+    def _ensure_fitted(self, agents: Dict[str, object]) -> None:
+        fingerprint = tuple((name, agent.__class__.__name__) for name, agent in agents.items())
+        with self._lock:
+            if fingerprint != self._fingerprint:
+                self.fit(agents)
+                self._fingerprint = fingerprint
+
+    def scores(self, query: str) -> List[Tuple[str, float]]:
+        """Cosine similarity of the query to every agent, highest first."""
+        feats = extract_features(query)
+        known = [(self._vocab[f], c) for f, c in feats.items() if f in self._vocab]
+        if not known or not self._names:
+            return [(n, 0.0) for n in self._names]
+        idx = np.fromiter((i for i, _ in known), dtype=np.int64, count=len(known))
+        vec = (1.0 + np.log(np.fromiter((c for _, c in known), dtype=np.float32, count=len(known)))) * self._idf[idx]
+        norm = np.linalg.norm(vec)
+        if norm == 0:
+            return [(n, 0.0) for n in self._names]
+        sims = self._centroids[:, idx] @ (vec / norm)
+        order = np.argsort(-sims)
+        return [(self._names[i], float(sims[i])) for i in order]
+
+    def has_subject(self, query: str) -> bool:
+        """True if the query names something beyond generic words and agent keywords."""
+        return any(len(w) > 1 and w not in self._intent_words for w in tokenize(query))
+
+    @staticmethod
+    def needs_policy(query: str) -> bool:
+        """True for advice/opinion and out-of-scope questions, which the LLM router's rules handle."""
+        return bool(_ADVICE.search(query) or _OUT_OF_SCOPE.search(query))
+
+    def route(self, query: str, agents: Dict[str, object]) -> Optional[Dict[str, str]]:
+        """Return {"agent", "reason"} when confident, else None so the caller asks the LLM."""
+        if not ENABLED or self.needs_policy(query):
+            return None
+        self._ensure_fitted(agents)
+        ranked = self.scores(query)
+        if not ranked:
+            return None
+        best_name, best = ranked[0]
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+        if best < self.threshold or best - runner_up < self.margin:
+            return None
+        if runner_up >= self.second_agent_score:
+            return None  # multi-intent: another agent has a real claim on part of the query
+        if not self.has_subject(query):
+            return None
+        return {
+            "agent": best_name,
+            "reason": f"Local classifier match (score {best:.2f}, margin {best - runner_up:.2f}).",
+        }
+
+
+# Process-wide router used by llm_router
+local_router = LocalRouter()
@@ -1,19 +1,47 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 from dotenv import load_dotenv
+import json
 import os
+from datetime import datetime
 from llm_router import router as chat_router
-from typing import Any, Dict
-import uuid
-import time
+from typing import Any, Dict, List, Optional
 
 # Reuse helpers from local mcp_client module for URL extraction and header parsing
-from mcp_client import extract_url, parse_headers  # type: ignore
+from mcp_client import extract_url, parse_headers, to_columnar  # type: ignore
+from core.financial_data import get_data_client_stats
+from core.quote_service import quote_service
+from core.candle_store import INTERVAL_SECONDS, candle_store
+from core import warmup
+from core.portfolio_analytics import analysis_to_json, analyze
+from agents.portfolio_agent import set_holdings_source
+from mcp_sessions import MCPSessionManager
+from holdings_feed import HoldingsFeed
+from app_logging import Lazy, get_logger, redact_headers, stats as log_stats
+from telemetry import current_request_id, new_request_id, span, telemetry, worker_label
+from mcp_portfolio import MAX_TOOL_TIMEOUT_SECONDS, READ_ONLY_TOOLS, TOOL_TIMEOUT_SECONDS, fetch_views, parse_views
 
 load_dotenv(dotenv_path="app/.env")
 
-app = FastAPI()
+log = get_logger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Background maintenance for per-worker MCP sessions (idle reaping, health checks)
+    mcp_sessions.start()
+    # Prefetch conference-call summaries and transcripts for newly reported quarters
+    if warmup.ENABLED:
+        warmup.warmup_pipeline.start()
+    yield
+    await warmup.warmup_pipeline.stop()
+    holdings_feed.stop()
+    await mcp_sessions.stop()
+
+
+app = FastAPI(lifespan=lifespan)
 #app.include_router(chat_router, prefix="/chat")
 
 
@@ -33,6 +61,60 @@ app.add_middleware(
 
 app.include_router(chat_router, prefix="/chat")
 
+
+def _route_label(scope: Dict[str, Any]) -> str:
+    """The matched route's path template (e.g. /traces/{request_id}), so the number of series stays bounded."""
+    route = scope.get("route")
+    template = getattr(route, "path_format", None)
+    if template is None:
+        return "unmatched"
+    # Routes of included routers carry only their own template; put back the literal prefix
+    # they were included under (the part of the path before the template matches).
+    path = scope.get("path", "")
+    for i, ch in enumerate(path):
+        if ch == "/" and route.path_regex.match(path[i:]):
+            return path[:i] + template
+    return template
+
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """Give every request an ID (echoed as X-Request-ID) and time it as the "request" stage.
+
+    Spans opened while serving the request (routing, agents, upstream calls, MCP tools,
+    history) carry the same ID.
+    """
+    request_id = request.headers.get("x-request-id") or new_request_id()
+    current_request_id.set(request_id[:64])
+    with span("request", "*") as s:
+        response = await call_next(request)
+        s.target = f"{request.method} {_route_label(request.scope)}"
+        if response.status_code >= 500:
+            s.error = str(response.status_code)
+    response.headers["X-Request-ID"] = request_id[:64]
+    return response
+
+
+@app.get("/metrics")
+async def metrics() -> PlainTextResponse:
+    """Stage latency histograms, error counts and in-flight gauges in Prometheus text format.
+
+    Only this worker's metrics, labelled worker=<pid>; every gunicorn worker must be scraped.
+    """
+    logs = log_stats()
+    text = telemetry.render() + (
+        "# HELP saras_log_dropped_total Log records dropped because the log queue was full.\n"
+        "# TYPE saras_log_dropped_total counter\n"
+        f"saras_log_dropped_total{{{worker_label()}}} {logs['dropped']}\n"
+    )
+    return PlainTextResponse(text, media_type="text/plain; version=0.0.4")
+
+
+@app.get("/traces/{request_id}")
+async def trace(request_id: str) -> Dict[str, Any]:
+    """Recent spans recorded for one request ID (kept in a bounded in-memory ring of this worker)."""
+    return {"request_id": request_id, "spans": telemetry.spans_for(request_id)}
+
 # Optional: avoid 307 redirect from /chat to /chat/ by handling both.
 @app.get("/chat")
 async def chat_root_get():
@@ -43,8 +125,23 @@ async def root():
     return {"status": "ok"}
 
 
+@app.get("/data/stats")
+async def data_stats() -> Dict[str, Any]:
+    """Counters for the upstream financial data client (response cache, coalesced calls), quotes and candles."""
+    return {**get_data_client_stats(), "quotes": quote_service.stats(), "candles": candle_store.stats()}
+
+
+@app.get("/data/warmup")
+async def data_warmup() -> Dict[str, Any]:
+    """Progress of this worker's conference-call warm-up pipeline.
+
+    Every worker warms its own response cache; "indexer" tells whether it is the one building
+    the shared transcript index.
+    """
+    return warmup.warmup_pipeline.status()
+
+
 # --- Minimal MCP endpoints ---
-_MCP_SESSIONS: Dict[str, Dict[str, Any]] = {}
 
 
 def _make_client() -> Any:
@@ -54,15 +151,24 @@ def _make_client() -> Any:
     sse_url = os.getenv("MCP_SSE_URL", "https://mcp.kite.trade/sse")
     headers_text = os.getenv("MCP_SSE_HEADERS", "")
     headers = parse_headers(headers_text)
-    print("[DEBUG][_make_client] sse_url=", sse_url)
-    print("[DEBUG][_make_client] raw headers_text=", headers_text)
-    print("[DEBUG][_make_client] parsed headers=", headers)
+    # MCP_SSE_HEADERS carries credentials: log header names with their values masked only.
+    log.debug("_make_client: sse_url=%s headers=%s", sse_url, Lazy(lambda: redact_headers(headers)))
     transport = SSETransport(url=sse_url, headers=headers or {})
     client = Client(transport)
-    print("[DEBUG][_make_client] fastmcp Client created")
+    log.debug("_make_client: fastmcp Client created")
     return client
 
 
+# Open fastmcp clients, keyed by the session_id handed to the frontend
+mcp_sessions = MCPSessionManager(_make_client)
+
+
+async def _call_tool(client: Any, name: str, args: Dict[str, Any]) -> Any:
+    """client.call_tool timed as an "mcp_tool" span."""
+    with span("mcp_tool", name):
+        return await client.call_tool(name, args)
+
+
 @app.get("/mcp/login")
 async def mcp_login() -> Dict[str, Any]:
     """Create an MCP session, request login URL, and return {session_id, login_url}.
@@ -70,96 +176,282 @@ async def mcp_login() -> Dict[str, Any]:
     Keep the fastmcp client open in-memory so subsequent calls can reuse the session.
     """
     try:
-        print("[DEBUG][mcp_login] starting login flow")
-        client = _make_client()
+        log.debug("mcp_login: starting login flow")
+        # Open the connection (equivalent to `async with Client(...)`)
+        sid, client = await mcp_sessions.open()
     except Exception as e:
-        print(f"[ERROR][mcp_login] failed to create client: {e}")
+        log.error("mcp_login: failed to create client: %s", e)
         return {"error": f"fastmcp unavailable: {e}"}
 
     try:
-        # Open the connection (equivalent to `async with Client(...)`)
-        print("[DEBUG][mcp_login] entering client context and calling login tool")
-        await client.__aenter__()
-        result = await client.call_tool("login", {})
-        print("[DEBUG][mcp_login] raw login tool result=", result)
+        log.debug("mcp_login: calling login tool")
+        result = await _call_tool(client, "login", {})
+        log.debug("mcp_login: raw login tool result=%s", result)
         login_url = extract_url(result)
-        print("[DEBUG][mcp_login] extracted login_url=", login_url)
-        sid = str(uuid.uuid4())
-        _MCP_SESSIONS[sid] = {"client": client, "created": time.time()}
-        print(f"[DEBUG][mcp_login] session created sid={sid}")
+        log.debug("mcp_login: extracted login_url=%s", login_url)
+        log.debug("mcp_login: session created sid=%s", sid)
         return {"session_id": sid, "login_url": login_url}
     except Exception as e:
         # Ensure we close any partially opened client
-        print(f"[ERROR][mcp_login] login flow failed: {e}")
+        log.error("mcp_login: login flow failed: %s", e)
+        await mcp_sessions.close(sid)
+        return {"error": f"login_failed: {e}"}
+
+
+def _tool_content(raw: Any) -> Any:
+    """Unwrap a fastmcp tool result to its first content item, JSON-parsed when possible."""
+    # Normalize a few common shapes without being strict.
+    content = raw
+    try:
+        if hasattr(raw, "content"):
+            c = getattr(raw, "content")
+            if isinstance(c, (list, tuple)) and c:
+                first = c[0]
+                content = getattr(first, "text", first)
+        elif isinstance(raw, dict) and "content" in raw:
+            c = raw.get("content")
+            if isinstance(c, (list, tuple)) and c:
+                first = c[0]
+                content = first.get("text", first)
+    except Exception as ex:
+        log.warning("_tool_content: normalization failed, using raw. err=%s", ex)
+        content = raw
+
+    # Try to JSON-parse if it's a string
+    if isinstance(content, str):
         try:
-            await client.__aexit__(None, None, None)
+            content = json.loads(content)
         except Exception:
             pass
-        return {"error": f"login_failed: {e}"}
+    return content
+
+
+async def _fetch_holdings(session_id: str) -> Any:
+    client = await mcp_sessions.get(session_id)
+    if client is None:
+        raise LookupError("invalid_session")
+    log.debug("_fetch_holdings: calling get_holdings tool for session_id=%s", session_id)
+    raw = await _call_tool(client, "get_holdings", {})
+    return _tool_content(raw)
+
+
+# Per-session holdings snapshots; one upstream call per refresh interval however many tabs poll
+holdings_feed = HoldingsFeed(_fetch_holdings)
+mcp_sessions.add_close_listener(holdings_feed.drop)
+
+
+async def _snapshot_holdings(session_id: str) -> Any:
+    return (await holdings_feed.snapshot(session_id))["holdings"]
+
+
+# Lets the chat's PortfolioAgent analyse the holdings of the requester's MCP session
+set_holdings_source(_snapshot_holdings)
 
 
 @app.get("/mcp/holdings")
-async def mcp_holdings(session_id: str) -> Dict[str, Any]:
+async def mcp_holdings(session_id: str, format: str = "rows") -> Dict[str, Any]:
     """Fetch holdings from Zerodha MCP server after user login.
 
-    Returns a JSON structure suitable for rendering a table in the frontend.
+    Served from the session's snapshot while it is fresh. Returns
+    {holdings, version, as_of, age_seconds[, keys]} for rendering a table in the frontend.
+    With format=columnar, tabular holdings are sent as {columns: [...], values: [[...], ...]}.
     """
-    print(f"[DEBUG][mcp_holdings] called with session_id={session_id}")
-    sess = _MCP_SESSIONS.get(session_id)
-    if not sess:
-        print("[WARN][mcp_holdings] session not found")
+    log.debug("mcp_holdings: called with session_id=%s", session_id)
+    try:
+        snapshot = await holdings_feed.snapshot(session_id)
+        holdings = snapshot["holdings"]
+        if format == "columnar" and isinstance(holdings, list) and all(isinstance(r, dict) for r in holdings):
+            snapshot = {**snapshot, "holdings": to_columnar(holdings), "format": "columnar"}
+        return snapshot
+    except LookupError:
+        log.warning("mcp_holdings: session not found")
         return {"error": "invalid_session"}
-    client = sess.get("client")
-    print("[DEBUG][mcp_holdings] found session, calling get_holdings tool")
+    except Exception as e:
+        log.error("mcp_holdings: failed to fetch holdings: %s", e)
+        return {"error": f"holdings_failed: {e}"}
 
-    try:
-        raw = await client.call_tool("get_holdings", {})
-        print("[DEBUG][mcp_holdings] raw holdings result=", raw)
 
-        # Normalize a few common shapes without being strict.
-        content = raw
-        try:
-            if hasattr(raw, "content"):
-                c = getattr(raw, "content")
-                if isinstance(c, (list, tuple)) and c:
-                    first = c[0]
-                    content = getattr(first, "text", first)
-            elif isinstance(raw, dict) and "content" in raw:
-                c = raw.get("content")
-                if isinstance(c, (list, tuple)) and c:
-                    first = c[0]
-                    content = first.get("text", first)
-        except Exception as ex:
-            print("[WARN][mcp_holdings] normalization failed, using raw. err=", ex)
-            content = raw
-
-        # Try to JSON-parse if it's a string
-        if isinstance(content, str):
-            try:
-                content = __import__("json").loads(content)
-                print("[DEBUG][mcp_holdings] parsed content as JSON")
-            except Exception:
-                print("[DEBUG][mcp_holdings] content is not JSON string, leaving as-is")
-                pass
-
-        print("[DEBUG][mcp_holdings] returning holdings content type=", type(content))
-        return {"holdings": content}
+@app.get("/mcp/holdings/stream")
+async def mcp_holdings_stream(session_id: str) -> StreamingResponse:
+    """Server-Sent Events: a `snapshot` event, then `delta` events with only the changed rows.
+
+    delta data: {version, as_of, upserts: {key: row}, removed: [key][, keys: [key] if order changed]}.
+    `error` events carry {error, fatal}; the stream ends after a fatal one.
+    """
+
+    async def events():
+        async for event, data in holdings_feed.subscribe(session_id):
+            yield f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/mcp/portfolio/analytics")
+async def mcp_portfolio_analytics(session_id: str) -> Dict[str, Any]:
+    """P&L, weights, day change and concentration for the session's holdings.
+
+    Computed from the holdings snapshot: {as_of, totals, concentration, positions, top_gainers, top_losers}.
+    """
+    try:
+        snapshot = await holdings_feed.snapshot(session_id)
+    except LookupError:
+        return {"error": "invalid_session"}
     except Exception as e:
-        print(f"[ERROR][mcp_holdings] failed to fetch holdings: {e}")
+        log.error("mcp_portfolio_analytics: failed to fetch holdings: %s", e)
         return {"error": f"holdings_failed: {e}"}
+    holdings = snapshot["holdings"]
+    if not isinstance(holdings, list):
+        return {"error": f"holdings_unavailable: {str(holdings)[:200]}"}
+    return {"as_of": snapshot["as_of"], **analysis_to_json(analyze(holdings))}
+
+
+@app.get("/mcp/portfolio")
+async def mcp_portfolio(session_id: str, views: Optional[str] = None, timeout: float = TOOL_TIMEOUT_SECONDS) -> Dict[str, Any]:
+    """Fetch several read-only account views (holdings, positions, margins, mf_holdings, ...) at once.
+
+    `views` is comma-separated (default: holdings,positions,margins,mf_holdings). Each view runs
+    concurrently under `timeout` seconds and reports {status, elapsed_ms, data|error}; holdings
+    come from the session's snapshot.
+    """
+    try:
+        names = parse_views(views)
+    except ValueError as e:
+        return {"error": str(e)}
+    try:
+        client = await mcp_sessions.get(session_id)
+    except Exception as e:
+        log.error("mcp_portfolio: session reconnect failed: %s", e)
+        return {"error": f"session_unavailable: {e}"}
+    if client is None:
+        return {"error": "invalid_session"}
+
+    async def holdings() -> Any:
+        return (await holdings_feed.snapshot(session_id))["holdings"]
+
+    def tool(name: str):
+        async def call() -> Any:
+            return _tool_content(await _call_tool(client, name, {}))
+        return call
+
+    calls = {v: holdings if v == "holdings" else tool(READ_ONLY_TOOLS[v]) for v in names}
+    result = await fetch_views(calls, timeout=min(max(timeout, 0.1), MAX_TOOL_TIMEOUT_SECONDS))
+    log.debug("mcp_portfolio: fetched %s in %s ms", names, result['elapsed_ms'])
+    return result
+
+
+QUOTE_TOOL = os.getenv("MCP_QUOTE_TOOL", "get_quote")
+
+
+NO_SESSION = "no active Kite MCP session; log in via 'Interact with your Zerodha Portfolio'"
+
+
+async def _fetch_quotes(symbols: List[str], session_id: Optional[str]) -> Dict[str, Any]:
+    """Quote fetcher for core.quote_service: one get_quote call for a batch of symbols,
+    made with the requesting user's own session."""
+    client = await mcp_sessions.get(session_id) if session_id else None
+    if client is None:
+        raise LookupError(NO_SESSION)
+    content = _tool_content(await _call_tool(client, QUOTE_TOOL, {"instruments": symbols}))
+    if not isinstance(content, dict):
+        raise ValueError(f"unexpected get_quote result: {str(content)[:200]}")
+    return content
+
+
+quote_service.set_fetcher(_fetch_quotes)
+
+
+@app.get("/quotes")
+async def quotes(symbols: str, session_id: Optional[str] = None) -> Dict[str, Any]:
+    """Latest quotes for comma-separated symbols (INFY or NSE:INFY), batched and briefly cached.
+
+    Requires the caller's MCP session; quotes are fetched from Kite with that session only.
+    """
+    try:
+        client = await mcp_sessions.get(session_id) if session_id else None
+    except Exception as e:
+        log.error("quotes: session reconnect failed: %s", e)
+        return {"error": f"session_unavailable: {e}"}
+    if client is None:
+        return {"error": f"no_session: {NO_SESSION}"}
+    try:
+        return {"quotes": await quote_service.get_quotes(symbols.split(","), session_id)}
+    except LookupError as e:
+        return {"error": f"no_session: {e}"}
+    except Exception as e:
+        log.error("quotes: failed to fetch quotes: %s", e)
+        return {"error": f"quotes_failed: {e}"}
+
+
+async def _fetch_candles(instrument_token: str, interval: str, start: datetime, end: datetime,
+                         session_id: Optional[str]) -> List[Any]:
+    """Candle fetcher for core.candle_store: one get_historical_data call for the missing range,
+    made with the requesting user's own session."""
+    client = await mcp_sessions.get(session_id) if session_id else None
+    if client is None:
+        raise LookupError(NO_SESSION)
+    content = _tool_content(await _call_tool(client, "get_historical_data", {
+        "instrument_token": int(instrument_token),
+        "from_date": start.strftime("%Y-%m-%d %H:%M:%S"),
+        "to_date": end.strftime("%Y-%m-%d %H:%M:%S"),
+        "interval": interval,
+    }))
+    if isinstance(content, dict):
+        content = content.get("candles", content.get("data", []))
+    if not isinstance(content, list):
+        raise ValueError(f"unexpected get_historical_data result: {str(content)[:200]}")
+    return content
+
+
+candle_store.set_fetcher(_fetch_candles)
+
+
+@app.get("/candles")
+async def candles(instrument_token: str, start: str, end: Optional[str] = None, interval: str = "day",
+                  session_id: Optional[str] = None) -> Dict[str, Any]:
+    """Historical candles in columnar form: {ts: [...], open: [...], ..., volume: [...]}.
+
+    Served from the local candle store; only the part not stored yet is fetched from Kite, with
+    the caller's MCP session.
+    """
+    try:
+        token = int(instrument_token)
+    except ValueError:
+        return {"error": f"invalid_instrument_token: {instrument_token[:40]}"}
+    if interval not in INTERVAL_SECONDS:
+        return {"error": f"invalid_interval: expected one of {', '.join(INTERVAL_SECONDS)}"}
+    try:
+        client = await mcp_sessions.get(session_id) if session_id else None
+    except Exception as e:
+        log.error("candles: session reconnect failed: %s", e)
+        return {"error": f"session_unavailable: {e}"}
+    if client is None:
+        return {"error": f"no_session: {NO_SESSION}"}
+    instrument_token = str(token)
+    try:
+        cols = await candle_store.get_range(instrument_token, interval, start, end, session_id)
+    except LookupError as e:
+        return {"error": f"no_session: {e}"}
+    except Exception as e:
+        log.error("candles: failed to load candles: %s", e)
+        return {"error": f"candles_failed: {e}"}
+    return {"instrument_token": instrument_token, "interval": interval, **{k: v.tolist() for k, v in cols.items()}}
 
 
 @app.post("/mcp/session/close")
 async def mcp_session_close(session_id: str) -> Dict[str, Any]:
-    print(f"[DEBUG][mcp_session_close] closing session_id={session_id}")
-    sess = _MCP_SESSIONS.pop(session_id, None)
-    if not sess:
-        print("[WARN][mcp_session_close] session not found")
+    log.debug("mcp_session_close: closing session_id=%s", session_id)
+    if not await mcp_sessions.close(session_id):
+        log.warning("mcp_session_close: session not found")
         return {"status": "not_found"}
-    client = sess.get("client")
-    try:
-        await client.__aexit__(None, None, None)
-        print("[DEBUG][mcp_session_close] client closed")
-    except Exception:
-        print("[WARN][mcp_session_close] error while closing client")
-    return {"status": "closed"}
\ No newline at end of file
+    log.debug("mcp_session_close: client closed")
+    return {"status": "closed"}
+
+
+@app.get("/mcp/sessions/stats")
+async def mcp_sessions_stats() -> Dict[str, Any]:
+    """Open MCP session count and lifecycle counters for this worker."""
+    return {**mcp_sessions.stats(), "holdings_feed": holdings_feed.stats()}
@@ -22,11 +22,12 @@ cancel_mf_sip - Cancels a SIP
 
 import argparse
 import asyncio
+import io
 import json
 import re
 import sys
 import webbrowser
-from typing import Optional, Dict
+from typing import Any, Dict, List, Optional, TextIO, Tuple
 
 # fastmcp imports: attempt at module import time but tolerate missing package so file can be
 # imported for linting or editing without having fastmcp installed.
@@ -94,47 +95,74 @@ def extract_url(obj):
         if m2:
             return m2.group(0)
     return None
+
+
+def _cell(value) -> str:
+    return json.dumps(value) if isinstance(value, (dict, list)) else str(value)
+
+
+def _is_table(data) -> bool:
+    return isinstance(data, (list, tuple)) and bool(data) and all(isinstance(item, dict) for item in data)
+
+
+def _layout(rows) -> Tuple[Dict[str, int], List[Dict[str, str]]]:
+    """One pass over the cells: ordered column widths plus each row's cells as strings."""
+    widths: Dict[str, int] = {}  # insertion-ordered, so it doubles as an ordered set of columns
+    cells = []
+    for item in rows:
+        row = {k: _cell(v) for k, v in item.items()}
+        for k, text in row.items():
+            w = widths.get(k)
+            if w is None:
+                widths[k] = max(len(str(k)), len(text))
+            elif len(text) > w:
+                widths[k] = len(text)
+        cells.append(row)
+    return widths, cells
+
+
+def write_table(rows, out: TextIO) -> None:
+    """Stream an aligned table of a list of dicts to `out`, one line at a time.
+
+    Each cell is converted to text once; lines are written as they are formatted rather than
+    collected and joined.
+    """
+    widths, cells = _layout(rows)
+    cols = list(widths)
+    out.write(" | ".join(str(c).ljust(widths[c]) for c in cols))
+    out.write("\n")
+    out.write("-+-".join("-" * widths[c] for c in cols))
+    for row in cells:
+        out.write("\n")
+        out.write(" | ".join(row.get(c, "").ljust(widths[c]) for c in cols))
+
+
+def to_columnar(rows) -> Dict[str, Any]:
+    """Compact JSON form of a list of dicts: {"columns": [...], "values": [[column 0...], ...]}.
+
+    Keys are sent once instead of once per row; missing cells are null.
+    """
+    cols = list(dict.fromkeys(k for item in rows for k in item))
+    return {"columns": cols, "values": [[item.get(c) for item in rows] for c in cols]}
+
+
 def format_holdings(data) -> str:
     """Return a human-readable string for holdings data.
 
-    - list[dict] -> aligned table
+    - list[dict] -> aligned table (see write_table to stream it instead)
     - dict -> pretty JSON
     - list of primitives -> one-per-line
     - otherwise -> str()
     """
     # list of dicts -> table
-    if isinstance(data, (list, tuple)) and data:
-        if all(isinstance(item, dict) for item in data):
-            # collect columns
-            cols = []
-            for item in data:
-                for k in item.keys():
-                    if k not in cols:
-                        cols.append(k)
-
-            # compute column widths
-            rows = []
-            col_widths = {c: len(str(c)) for c in cols}
-            for item in data:
-                row = []
-                for c in cols:
-                    v = item.get(c, "")
-                    s = json.dumps(v) if isinstance(v, (dict, list)) else str(v)
-                    row.append(s)
-                    col_widths[c] = max(col_widths[c], len(s))
-                rows.append(row)
-
-            # build table string
-            header = " | ".join(c.ljust(col_widths[c]) for c in cols)
-            sep = "-+-".join("-" * col_widths[c] for c in cols)
-            lines = [header, sep]
-            for row in rows:
-                lines.append(" | ".join(row[i].ljust(col_widths[cols[i]]) for i in range(len(cols))))
-            return "\n".join(lines)
-
-        # list of primitives
-        if all(not isinstance(item, (dict, list, tuple)) for item in data):
-            return "\n".join(str(x) for x in data)
+    if _is_table(data):
+        buf = io.StringIO()
+        write_table(data, buf)
+        return buf.getvalue()
+
+    # list of primitives
+    if isinstance(data, (list, tuple)) and data and all(not isinstance(item, (dict, list, tuple)) for item in data):
+        return "\n".join(str(x) for x in data)
 
     # dict -> pretty JSON
     if isinstance(data, dict):
@@ -236,7 +264,11 @@ class MCPClient:
                             holdings = raw_holdings
 
                         print("Your holdings:")
-                        print(format_holdings(holdings))
+                        if _is_table(holdings):
+                            write_table(holdings, sys.stdout)
+                            print()
+                        else:
+                            print(format_holdings(holdings))
                         break
                     except Exception as e:
                         attempts += 1
@@ -0,0 +1,66 @@
+"""
+mcp_portfolio.py
+Concurrent fan-out of read-only Kite MCP tools for the account view.
+
+Every requested view is fetched at the same time on the session's client, each under its own
+timeout, so the whole call takes as long as the slowest tool rather than the sum of all of them.
+A view that fails or times out does not fail the others: each result carries its own status
+and timing.
+"""
+
+import asyncio
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+
+# View name -> read-only MCP tool. Tools that place or modify orders are deliberately absent.
+READ_ONLY_TOOLS: Dict[str, str] = {
+    "holdings": "get_holdings",
+    "positions": "get_positions",
+    "margins": "get_margins",
+    "mf_holdings": "get_mf_holdings",
+    "mf_orders": "get_mf_orders",
+    "mf_sips": "get_mf_sips",
+}
+DEFAULT_VIEWS = ("holdings", "positions", "margins", "mf_holdings")
+TOOL_TIMEOUT_SECONDS = float(os.getenv("MCP_PORTFOLIO_TOOL_TIMEOUT_SECONDS", "8"))
+MAX_TOOL_TIMEOUT_SECONDS = 30.0
+
+
+def parse_views(views: Optional[str]) -> List[str]:
+    """Parse a comma-separated view list; raise ValueError for views that are not read-only tools."""
+    if not views:
+        return list(DEFAULT_VIEWS)
+    names = list(dict.fromkeys(v.strip() for v in views.split(",") if v.strip()))
+    unknown = [v for v in names if v not in READ_ONLY_TOOLS]
+    if unknown:
+        raise ValueError(f"unknown views {unknown}; choose from {sorted(READ_ONLY_TOOLS)}")
+    return names
+
+
+async def _timed(call: Callable[[], Awaitable[Any]], timeout: float) -> Dict[str, Any]:
+    start = time.perf_counter()
+    try:
+        data = await asyncio.wait_for(call(), timeout=timeout)
+        result = {"status": "ok", "data": data}
+    except asyncio.TimeoutError:
+        result = {"status": "timeout", "error": f"no response within {timeout:g}s"}
+    except Exception as e:
+        result = {"status": "error", "error": str(e)}
+    result["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return result
+
+
+async def fetch_views(
+    calls: Dict[str, Callable[[], Awaitable[Any]]],
+    timeout: float = TOOL_TIMEOUT_SECONDS,
+) -> Dict[str, Any]:
+    """Run every call concurrently; return {"views": {name: result}, "elapsed_ms": total}."""
+    start = time.perf_counter()
+    names = list(calls)
+    results = await asyncio.gather(*(_timed(calls[name], timeout) for name in names))
+    return {
+        "views": dict(zip(names, results)),
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 1),
+    }
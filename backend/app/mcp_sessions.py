@@ -0,0 +1,223 @@
+"""
+mcp_sessions.py
+Lifecycle management for the per-user fastmcp (Kite MCP) clients held by the API.
+
+Each browser login opens an SSE-backed fastmcp Client that stays open between requests. The
+manager caps how many are open per worker, closes sessions that have been idle or alive for too
+long, and runs a background loop that reaps expired sessions and pings live ones, reconnecting
+clients whose SSE transport has died. A client is also reconnected transparently when it is
+fetched while disconnected. Note that a reconnected transport is a new MCP session upstream, so
+the user may have to log in to Kite again.
+"""
+
+import asyncio
+import os
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app_logging import get_logger
+
+log = get_logger(__name__)
+
+
+MAX_SESSIONS = int(os.getenv("MCP_MAX_SESSIONS", "200"))
+IDLE_TIMEOUT_SECONDS = float(os.getenv("MCP_SESSION_IDLE_TIMEOUT_SECONDS", str(30 * 60)))
+MAX_AGE_SECONDS = float(os.getenv("MCP_SESSION_MAX_AGE_SECONDS", str(8 * 3600)))
+REAP_INTERVAL_SECONDS = float(os.getenv("MCP_SESSION_REAP_INTERVAL_SECONDS", "60"))
+PING_TIMEOUT_SECONDS = float(os.getenv("MCP_SESSION_PING_TIMEOUT_SECONDS", "10"))
+
+
+class MCPSession:
+    __slots__ = ("client", "created", "last_used", "reconnects", "lock")
+
+    def __init__(self, client: Any, now: float):
+        self.client = client
+        self.created = now
+        self.last_used = now
+        self.reconnects = 0
+        self.lock = asyncio.Lock()
+
+
+class MCPSessionManager:
+    def __init__(
+        self,
+        client_factory: Callable[[], Any],
+        max_sessions: int = MAX_SESSIONS,
+        idle_timeout: float = IDLE_TIMEOUT_SECONDS,
+        max_age: float = MAX_AGE_SECONDS,
+        reap_interval: float = REAP_INTERVAL_SECONDS,
+        ping_timeout: float = PING_TIMEOUT_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.client_factory = client_factory
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.max_age = max_age
+        self.reap_interval = reap_interval
+        self.ping_timeout = ping_timeout
+        self._clock = clock
+        self._sessions: Dict[str, MCPSession] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._close_listeners: List[Callable[[str], None]] = []
+        self.opened = 0
+        self.closed = 0
+        self.reaped = 0
+        self.evicted = 0
+        self.reconnected = 0
+        self.failed_health_checks = 0
+
+    # --- Session API ---
+
+    async def open(self) -> Tuple[str, Any]:
+        """Create and connect a new client; return (session_id, client).
+
+        If the cap is reached, the least recently used session is closed first.
+        """
+        while len(self._sessions) >= self.max_sessions:
+            oldest = min(self._sessions, key=lambda sid: self._sessions[sid].last_used)
+            log.info("Session cap %s reached; closing %s", self.max_sessions, oldest)
+            await self.close(oldest)
+            self.evicted += 1
+        client = self.client_factory()
+        await client.__aenter__()
+        sid = str(uuid.uuid4())
+        self._sessions[sid] = MCPSession(client, self._clock())
+        self.opened += 1
+        return sid, client
+
+    async def get(self, session_id: str) -> Optional[Any]:
+        """Return the session's connected client, or None if unknown or expired."""
+        sess = self._sessions.get(session_id)
+        if sess is None:
+            return None
+        now = self._clock()
+        if self._expired(sess, now):
+            await self._close_expired(session_id)
+            return None
+        sess.last_used = now
+        if not self._is_connected(sess.client):
+            await self._reconnect(session_id, sess)
+        return sess.client
+
+    def add_close_listener(self, listener: Callable[[str], None]) -> None:
+        """Call listener(session_id) whenever a session is closed, reaped or evicted."""
+        self._close_listeners.append(listener)
+
+    async def close(self, session_id: str) -> bool:
+        sess = self._sessions.pop(session_id, None)
+        if sess is None:
+            return False
+        for listener in self._close_listeners:
+            try:
+                listener(session_id)
+            except Exception as e:
+                log.warning("Close listener failed for session %s: %s", session_id, e)
+        try:
+            await sess.client.__aexit__(None, None, None)
+        except Exception as e:
+            log.warning("Error while closing session %s: %s", session_id, e)
+        self.closed += 1
+        return True
+
+    async def close_all(self) -> None:
+        for sid in list(self._sessions):
+            await self.close(sid)
+
+    # --- Expiry and health ---
+
+    def _expired(self, sess: MCPSession, now: float) -> bool:
+        return now - sess.last_used > self.idle_timeout or now - sess.created > self.max_age
+
+    async def _close_expired(self, session_id: str) -> None:
+        if await self.close(session_id):
+            self.reaped += 1
+
+    @staticmethod
+    def _is_connected(client: Any) -> bool:
+        check = getattr(client, "is_connected", None)
+        return bool(check()) if callable(check) else True
+
+    async def _reconnect(self, session_id: str, sess: MCPSession) -> None:
+        async with sess.lock:
+            if self._is_connected(sess.client):
+                return  # another request already reconnected it
+            log.info("Reconnecting session %s", session_id)
+            try:
+                await sess.client.__aexit__(None, None, None)
+            except Exception:
+                pass
+            await sess.client.__aenter__()
+            sess.reconnects += 1
+            self.reconnected += 1
+
+    async def reap(self) -> int:
+        """Close every idle or too-old session; return how many were closed."""
+        now = self._clock()
+        expired = [sid for sid, sess in self._sessions.items() if self._expired(sess, now)]
+        for sid in expired:
+            await self._close_expired(sid)
+        if expired:
+            log.info("Reaped %s expired sessions", len(expired))
+        return len(expired)
+
+    async def check_health(self) -> None:
+        """Ping every open session and reconnect those whose transport is dead."""
+        for sid, sess in list(self._sessions.items()):
+            try:
+                await asyncio.wait_for(sess.client.ping(), timeout=self.ping_timeout)
+                continue
+            except Exception as e:
+                self.failed_health_checks += 1
+                log.warning("Health check failed for session %s: %s", sid, e)
+            if sid not in self._sessions:
+                continue
+            try:
+                # Force a fresh transport even if the client still believes it is connected.
+                await sess.client.__aexit__(None, None, None)
+            except Exception:
+                pass
+            try:
+                await self._reconnect(sid, sess)
+            except Exception as e:
+                log.warning("Reconnect failed for session %s; closing it: %s", sid, e)
+                await self.close(sid)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.reap_interval)
+            try:
+                await self.reap()
+                await self.check_health()
+            except Exception as e:
+                log.warning("Maintenance loop error: %s", e)
+
+    def start(self) -> None:
+        """Start the background reaper/health-check loop on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background loop and close every session."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.close_all()
+
+    def stats(self) -> Dict[str, Any]:
+        now = self._clock()
+        return {
+            "open_sessions": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "oldest_session_age_seconds": max((now - s.created for s in self._sessions.values()), default=0.0),
+            "opened": self.opened,
+            "closed": self.closed,
+            "reaped": self.reaped,
+            "evicted": self.evicted,
+            "reconnected": self.reconnected,
+            "failed_health_checks": self.failed_health_checks,
+        }
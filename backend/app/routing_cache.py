@@ -0,0 +1,108 @@
+"""
+routing_cache.py
+Cache of agent routing decisions made by the LLM router.
+
+A decision ({"agent": ..., "reason": ...}) is keyed on the normalized user query plus a short
+fingerprint of the most recent session messages, so a near-repeat of a question in the same
+context skips the routing LLM call. Entries expire after a TTL, the least recently used entries
+are evicted beyond a size cap, and the whole cache is dropped whenever the routing inputs
+(registered agents, routing knowledge base) change.
+"""
+
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+
+TTL_SECONDS = float(os.getenv("ROUTING_CACHE_TTL_SECONDS", "600"))
+MAX_ENTRIES = int(os.getenv("ROUTING_CACHE_MAX_ENTRIES", "2048"))
+# How many of the latest history messages make up the context fingerprint.
+CONTEXT_MESSAGES = int(os.getenv("ROUTING_CACHE_CONTEXT_MESSAGES", "2"))
+
+_NON_WORD = re.compile(r"[^\w\s]+")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace: "Latest TCS concall summary?" and
+    "latest  tcs concall summary" normalize to the same key."""
+    q = _NON_WORD.sub(" ", (query or "").lower())
+    return _SPACES.sub(" ", q).strip()
+
+
+def context_fingerprint(history: List[Dict[str, Any]], n: int = CONTEXT_MESSAGES) -> str:
+    """Short stable hash of the last n messages (role + content)."""
+    if not history or n <= 0:
+        return ""
+    h = hashlib.sha1()
+    for msg in history[-n:]:
+        h.update(str(msg.get("role", "")).encode("utf-8"))
+        h.update(b"\x00")
+        h.update(str(msg.get("content", "")).encode("utf-8"))
+        h.update(b"\x01")
+    return h.hexdigest()[:16]
+
+
+class RoutingCache:
+    def __init__(self, ttl: float = TTL_SECONDS, max_entries: int = MAX_ENTRIES, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._version: Optional[Hashable] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def make_key(self, query: str, history: List[Dict[str, Any]]) -> Tuple[str, str]:
+        return normalize_query(query), context_fingerprint(history)
+
+    def validate(self, version: Hashable) -> None:
+        """Drop every entry if the routing inputs changed since the last call."""
+        with self._lock:
+            if version != self._version:
+                if self._entries:
+                    self.invalidations += 1
+                self._entries.clear()
+                self._version = version
+
+    def get(self, key: Tuple[str, str]) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None or item[0] <= self._clock():
+                if item is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(item[1])
+
+    def put(self, key: Tuple[str, str], decision: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl, dict(decision))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+            }
+
+
+# Process-wide cache used by llm_router
+routing_cache = RoutingCache()
@@ -0,0 +1,88 @@
+"""
+routing_prompt.py
+Prebuilt system prompt for agent selection.
+
+The routing system prompt (instructions, agent_routing_knowledge.md and the list of registered
+agents) is assembled once and reused byte-for-byte until the knowledge file's mtime or the
+registered agents change. It is always the first message of the routing request, so the
+provider's prompt caching can reuse the processed prefix across requests; only the session
+context and the user query that follow it vary.
+"""
+
+import os
+import threading
+from typing import Dict, Hashable, Optional, Tuple
+
+from context_builder import count_tokens
+from app_logging import get_logger
+
+log = get_logger(__name__)
+
+
+KB_PATH = os.path.join(os.path.dirname(__file__), "agent_routing_knowledge.md")
+# Providers only cache prompt prefixes above a minimum length (1024 tokens for OpenAI).
+PROMPT_CACHE_MIN_TOKENS = 1024
+
+INSTRUCTIONS = (
+    "You are an assistant that selects the best specialised agent to handle a user's query."
+    " Respond only with valid JSON in the format: {\"agent\": \"registry_name\", \"reason\": \"why\"}."
+    " If the query has several distinct parts for different agents, respond instead with"
+    " {\"agents\": [{\"agent\": \"registry_name\", \"query\": \"the part for this agent\"}, ...], \"reason\": \"why\"}."
+    " If you are unsure, return agent as null.\n\n"
+)
+
+
+class RoutingPrompt:
+    def __init__(self, kb_path: str = KB_PATH):
+        self.kb_path = kb_path
+        self._lock = threading.Lock()
+        self._version: Optional[Hashable] = None
+        self._system_prompt = ""
+        self._tokens = 0
+
+    def version(self, agents_map: Dict[str, str]) -> Tuple:
+        """Identify the routing inputs: registered agents and the knowledge file's mtime."""
+        try:
+            kb_mtime = os.stat(self.kb_path).st_mtime_ns
+        except OSError:
+            kb_mtime = None
+        return tuple(agents_map.items()), kb_mtime
+
+    def _build(self, agents_map: Dict[str, str]) -> str:
+        kb_text = ""
+        try:
+            with open(self.kb_path, "r", encoding="utf-8") as f:
+                kb_text = f.read()
+            log.info("Loaded agent routing knowledge base for prompt.")
+        except Exception:
+            log.info("No agent routing knowledge base found; proceeding without it.")
+        agent_list_text = "\n".join(f"- {name}: {clsname}" for name, clsname in agents_map.items())
+        return INSTRUCTIONS + kb_text + f"\n\nAvailable agents:\n{agent_list_text}\n"
+
+    def system_prompt(self, agents_map: Dict[str, str]) -> str:
+        """Return the cached system prompt, rebuilding it if the routing inputs changed."""
+        version = self.version(agents_map)
+        with self._lock:
+            if version != self._version:
+                self._system_prompt = self._build(agents_map)
+                self._tokens = count_tokens(self._system_prompt)
+                self._version = version
+            return self._system_prompt
+
+    def prefix_tokens(self, agents_map: Dict[str, str]) -> int:
+        self.system_prompt(agents_map)
+        return self._tokens
+
+    def report(self, agents_map: Dict[str, str]) -> int:
+        """Log the static prefix size; called once at startup."""
+        tokens = self.prefix_tokens(agents_map)
+        cacheable = "eligible" if tokens >= PROMPT_CACHE_MIN_TOKENS else "too short"
+        log.info(
+            "Routing prompt prefix: %s tokens (%s for provider prompt caching, minimum %s)",
+            tokens, cacheable, PROMPT_CACHE_MIN_TOKENS,
+        )
+        return tokens
+
+
+# Process-wide prompt used by llm_router
+routing_prompt = RoutingPrompt()
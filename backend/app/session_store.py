@@ -0,0 +1,345 @@
+"""
+session_store.py
+Pluggable storage for per-session chat histories.
+
+`InMemorySessionStore` keeps histories in the worker process. `SQLiteSessionStore` keeps them in
+a local SQLite database in WAL mode, so every gunicorn worker on the machine sees the same
+history for a session and a reset clears it everywhere. Both keep only the most recent
+`history_limit` messages per session and expire sessions idle for longer than `ttl` seconds.
+
+Select the backend with CHAT_SESSION_BACKEND=memory|sqlite (see create_session_store).
+
+Async request handlers use aget/aappend/aclear. The in-memory store answers those directly;
+the SQLite store runs its blocking calls (which may wait up to busy_timeout for another
+worker's write lock) in a thread, so contention between workers never stalls the event loop.
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Optional
+
+from app_logging import get_logger
+
+log = get_logger(__name__)
+
+
+HISTORY_LIMIT = 20
+BACKEND = os.getenv("CHAT_SESSION_BACKEND", "memory")
+DB_PATH = os.getenv("CHAT_SESSION_DB", os.path.join(tempfile.gettempdir(), "saras_chat_sessions.db"))
+TTL_SECONDS = float(os.getenv("CHAT_SESSION_TTL_SECONDS", str(6 * 3600)))
+MAX_SESSIONS = int(os.getenv("CHAT_SESSION_MAX_SESSIONS", "10000"))
+SWEEP_INTERVAL_SECONDS = float(os.getenv("CHAT_SESSION_SWEEP_INTERVAL_SECONDS", "60"))
+
+
+class SessionStore(ABC):
+    """Chat history storage. Each message is a dict: {"role": "user"|"assistant", "content": str}."""
+
+    def __init__(self, history_limit: int = HISTORY_LIMIT, ttl: float = TTL_SECONDS, clock=time.time):
+        self.history_limit = history_limit
+        self.ttl = ttl
+        self._clock = clock
+        self._sweeper: Optional[threading.Thread] = None
+        self._sweeper_stop = threading.Event()
+
+    @abstractmethod
+    def get(self, session_id: str) -> List[Dict]:
+        """Return a copy of the session's messages, oldest first ([] if unknown or expired)."""
+
+    @abstractmethod
+    def append(self, session_id: str, message: Dict) -> None:
+        """Append a message, keeping only the most recent history_limit messages."""
+
+    @abstractmethod
+    def clear(self, session_id: str) -> bool:
+        """Delete a session; return True if it existed."""
+
+    async def aget(self, session_id: str) -> List[Dict]:
+        return self.get(session_id)
+
+    async def aappend(self, session_id: str, message: Dict) -> None:
+        self.append(session_id, message)
+
+    async def aclear(self, session_id: str) -> bool:
+        return self.clear(session_id)
+
+    @abstractmethod
+    def purge_expired(self) -> int:
+        """Delete sessions idle for longer than ttl; return how many were removed."""
+
+    @abstractmethod
+    def stats(self) -> Dict[str, Any]:
+        """Return sizing counters: at least {"backend", "sessions", "bytes"}."""
+
+    def start_sweeper(self, interval: float = SWEEP_INTERVAL_SECONDS) -> None:
+        """Start a daemon thread that calls purge_expired every `interval` seconds."""
+        if self._sweeper is not None and self._sweeper.is_alive():
+            return
+        self._sweeper_stop.clear()
+
+        def run():
+            while not self._sweeper_stop.wait(interval):
+                try:
+                    removed = self.purge_expired()
+                    if removed:
+                        log.info("Swept %s idle sessions", removed)
+                except Exception as e:
+                    log.warning("Sweeper error: %s", e)
+
+        self._sweeper = threading.Thread(target=run, name="chat-session-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def stop_sweeper(self) -> None:
+        self._sweeper_stop.set()
+        if self._sweeper is not None:
+            self._sweeper.join(timeout=5)
+            self._sweeper = None
+
+
+class _Session:
+    __slots__ = ("messages", "bytes", "last_access")
+
+    def __init__(self, history_limit: int, now: float):
+        self.messages: Deque[Dict] = deque(maxlen=history_limit)  # ring buffer
+        self.bytes = 0
+        self.last_access = now
+
+
+def _message_size(message: Dict) -> int:
+    """Approximate memory held by a message (its string objects)."""
+    return sum(sys.getsizeof(v) for v in message.values())
+
+
+class InMemorySessionStore(SessionStore):
+    """Per-process store; histories are lost on restart and not shared between workers.
+
+    Each session is a fixed-capacity ring buffer. At most `max_sessions` sessions are kept;
+    beyond that the least recently used session is evicted.
+    """
+
+    def __init__(self, history_limit: int = HISTORY_LIMIT, ttl: float = TTL_SECONDS, clock=time.time,
+                 max_sessions: int = MAX_SESSIONS):
+        super().__init__(history_limit, ttl, clock)
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()  # least recently used first
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evicted = 0
+
+    def _drop(self, session_id: str) -> Optional[_Session]:
+        sess = self._sessions.pop(session_id, None)
+        if sess is not None:
+            self._bytes -= sess.bytes
+        return sess
+
+    def get(self, session_id: str) -> List[Dict]:
+        now = self._clock()
+        with self._lock:
+            sess = self._sessions.get(session_id)
+            if sess is None:
+                return []
+            if now - sess.last_access > self.ttl:
+                self._drop(session_id)
+                return []
+            return list(sess.messages)
+
+    def append(self, session_id: str, message: Dict) -> None:
+        now = self._clock()
+        size = _message_size(message)
+        with self._lock:
+            sess = self._sessions.get(session_id)
+            if sess is not None and now - sess.last_access > self.ttl:
+                self._drop(session_id)
+                sess = None
+            if sess is None:
+                sess = self._sessions[session_id] = _Session(self.history_limit, now)
+                while len(self._sessions) > self.max_sessions:
+                    self._drop(next(iter(self._sessions)))
+                    self.evicted += 1
+            else:
+                self._sessions.move_to_end(session_id)
+            if len(sess.messages) == sess.messages.maxlen:
+                dropped = _message_size(sess.messages[0])
+                sess.bytes -= dropped
+                self._bytes -= dropped
+            sess.messages.append(message)
+            sess.bytes += size
+            self._bytes += size
+            sess.last_access = now
+
+    def clear(self, session_id: str) -> bool:
+        with self._lock:
+            return self._drop(session_id) is not None
+
+    def purge_expired(self) -> int:
+        cutoff = self._clock() - self.ttl
+        with self._lock:
+            # Sessions are ordered by last use, so expired ones are at the front.
+            expired = []
+            for sid, sess in self._sessions.items():
+                if sess.last_access >= cutoff:
+                    break
+                expired.append(sid)
+            for sid in expired:
+                self._drop(sid)
+            return len(expired)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": "memory",
+                "sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "messages": sum(len(s.messages) for s in self._sessions.values()),
+                "bytes": self._bytes,
+                "evicted": self.evicted,
+            }
+
+
+class SQLiteSessionStore(SessionStore):
+    """Store shared by all worker processes on one machine through a local SQLite file.
+
+    WAL mode lets readers proceed while another worker writes. Each thread gets its own
+    connection. Keep the database on local disk: SQLite locking is unreliable on network shares.
+    The async methods run the queries in the default thread pool.
+    """
+
+    def __init__(self, path: str = DB_PATH, history_limit: int = HISTORY_LIMIT, ttl: float = TTL_SECONDS, clock=time.time):
+        super().__init__(history_limit, ttl, clock)
+        self.path = path
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS chat_sessions (
+                    session_id TEXT PRIMARY KEY,
+                    updated_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS chat_messages (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    session_id TEXT NOT NULL,
+                    message TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS chat_messages_session ON chat_messages(session_id, id);
+                CREATE INDEX IF NOT EXISTS chat_sessions_updated ON chat_sessions(updated_at);
+                """
+            )
+
+    async def aget(self, session_id: str) -> List[Dict]:
+        return await asyncio.to_thread(self.get, session_id)
+
+    async def aappend(self, session_id: str, message: Dict) -> None:
+        await asyncio.to_thread(self.append, session_id, message)
+
+    async def aclear(self, session_id: str) -> bool:
+        return await asyncio.to_thread(self.clear, session_id)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._local.conn = conn
+        return conn
+
+    def get(self, session_id: str) -> List[Dict]:
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT updated_at FROM chat_sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        if row is None or self._clock() - row[0] > self.ttl:
+            return []
+        rows = conn.execute(
+            "SELECT message FROM chat_messages WHERE session_id = ? ORDER BY id", (session_id,)
+        ).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def append(self, session_id: str, message: Dict) -> None:
+        now = self._clock()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT updated_at FROM chat_sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            if row is not None and now - row[0] > self.ttl:
+                conn.execute("DELETE FROM chat_messages WHERE session_id = ?", (session_id,))
+            conn.execute(
+                "INSERT INTO chat_sessions (session_id, updated_at) VALUES (?, ?) "
+                "ON CONFLICT(session_id) DO UPDATE SET updated_at = excluded.updated_at",
+                (session_id, now),
+            )
+            conn.execute(
+                "INSERT INTO chat_messages (session_id, message) VALUES (?, ?)",
+                (session_id, json.dumps(message)),
+            )
+            # Trim to last history_limit messages
+            conn.execute(
+                "DELETE FROM chat_messages WHERE session_id = ? AND id NOT IN ("
+                "SELECT id FROM chat_messages WHERE session_id = ? ORDER BY id DESC LIMIT ?)",
+                (session_id, session_id, self.history_limit),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def clear(self, session_id: str) -> bool:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            existed = conn.execute(
+                "DELETE FROM chat_sessions WHERE session_id = ?", (session_id,)
+            ).rowcount > 0
+            conn.execute("DELETE FROM chat_messages WHERE session_id = ?", (session_id,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return existed
+
+    def purge_expired(self) -> int:
+        cutoff = self._clock() - self.ttl
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "DELETE FROM chat_messages WHERE session_id IN "
+                "(SELECT session_id FROM chat_sessions WHERE updated_at < ?)",
+                (cutoff,),
+            )
+            removed = conn.execute(
+                "DELETE FROM chat_sessions WHERE updated_at < ?", (cutoff,)
+            ).rowcount
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        conn = self._conn()
+        sessions = conn.execute("SELECT COUNT(*) FROM chat_sessions").fetchone()[0]
+        messages, size = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(CAST(message AS BLOB))), 0) FROM chat_messages"
+        ).fetchone()
+        return {"backend": "sqlite", "sessions": sessions, "messages": messages, "bytes": size}
+
+
+def create_session_store(backend: str = BACKEND, history_limit: int = HISTORY_LIMIT) -> SessionStore:
+    """Build the store configured by CHAT_SESSION_BACKEND (memory|sqlite)."""
+    if backend == "sqlite":
+        log.info("Using SQLite session store at %s", DB_PATH)
+        return SQLiteSessionStore(DB_PATH, history_limit=history_limit)
+    if backend != "memory":
+        log.warning("Unknown CHAT_SESSION_BACKEND '%s'; using in-memory store", backend)
+    return InMemorySessionStore(history_limit=history_limit)
@@ -0,0 +1,193 @@
+"""
+telemetry.py
+Per-stage latency tracing and Prometheus metrics.
+
+Every HTTP request gets a request ID (taken from an incoming X-Request-ID header or generated)
+that is kept in a ContextVar, so spans opened anywhere while serving it (routing, agents,
+upstream data API calls, MCP tool calls, chat history operations) are linked to it. A span
+measures one stage with time.perf_counter and, when it ends, updates:
+
+- saras_stage_duration_seconds: histogram per (stage, target), fixed buckets
+- saras_stage_errors_total: spans that ended with an exception
+- saras_stage_in_flight: spans currently open
+
+The cost of a span is two clock reads, a bisect and a few counter updates under a lock, so the
+instrumentation stays on in production. The most recent spans are kept in a bounded ring for
+looking up a single slow request (/traces/{request_id}); render() produces the Prometheus text
+exposition served at /metrics.
+
+Metrics are kept per process. Under gunicorn every series carries a `worker` label (the pid),
+so series from different workers never look like one counter that keeps resetting; every worker
+has to be scraped (e.g. one scrape target per worker, or scraping until each worker label has
+been seen) and aggregated with sum without (worker). Likewise /traces only sees the spans
+recorded by the worker that answers it.
+"""
+
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+
+ENABLED = os.getenv("TELEMETRY_ENABLED", "1") == "1"
+# Upper bounds in seconds; the +Inf bucket is implicit.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+RECENT_SPANS = int(os.getenv("TELEMETRY_RECENT_SPANS", "2048"))
+
+current_request_id: ContextVar[Optional[str]] = ContextVar("current_request_id", default=None)
+
+Labels = Tuple[str, str]  # (stage, target)
+
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+class _Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, buckets: int):
+        self.counts = [0] * (buckets + 1)
+        self.sum = 0.0
+        self.count = 0
+
+
+class Span:
+    """Handle yielded by span(). `target` may be refined before the span ends (e.g. to the
+    matched route, which is only known after routing) and `error` set to count a failure that
+    did not raise (e.g. a 5xx response)."""
+
+    __slots__ = ("stage", "target", "error")
+
+    def __init__(self, stage: str, target: str):
+        self.stage = stage
+        self.target = target
+        self.error: Optional[str] = None
+
+
+class Telemetry:
+    def __init__(self, enabled: bool = ENABLED, buckets: Tuple[float, ...] = BUCKETS, recent: int = RECENT_SPANS):
+        self.enabled = enabled
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._histograms: Dict[Labels, _Histogram] = {}
+        self._errors: Dict[Labels, int] = {}
+        self._in_flight: Dict[Labels, int] = {}
+        self._recent: Deque[Dict[str, Any]] = deque(maxlen=recent)
+
+    def observe(self, stage: str, target: str, seconds: float, error: Optional[str] = None) -> None:
+        """Record one finished span."""
+        key = (stage, target)
+        i = bisect_left(self.buckets, seconds)
+        with self._lock:
+            h = self._histograms.get(key)
+            if h is None:
+                h = self._histograms[key] = _Histogram(len(self.buckets))
+            h.counts[i] += 1
+            h.sum += seconds
+            h.count += 1
+            if error is not None:
+                self._errors[key] = self._errors.get(key, 0) + 1
+            self._recent.append({
+                "request_id": current_request_id.get(),
+                "stage": stage,
+                "target": target,
+                "duration_ms": round(seconds * 1000, 3),
+                "error": error,
+                "at": time.time(),
+            })
+
+    def _enter(self, key: Labels) -> None:
+        with self._lock:
+            self._in_flight[key] = self._in_flight.get(key, 0) + 1
+
+    def _exit(self, key: Labels) -> None:
+        with self._lock:
+            self._in_flight[key] -= 1
+
+    @contextmanager
+    def span(self, stage: str, target: str = "") -> Iterator[Span]:
+        """Time the enclosed block as one stage; works in sync and async code."""
+        handle = Span(stage, target)
+        if not self.enabled:
+            yield handle
+            return
+        key = (stage, target)
+        self._enter(key)
+        start = time.perf_counter()
+        error = None
+        try:
+            yield handle
+            error = handle.error
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            self._exit(key)
+            self.observe(stage, handle.target, time.perf_counter() - start, error)
+
+    def spans_for(self, request_id: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [s for s in self._recent if s["request_id"] == request_id]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+            self._errors.clear()
+            self._in_flight = {k: v for k, v in self._in_flight.items() if v}
+            self._recent.clear()
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4), labelled with this worker."""
+        worker = worker_label()
+        with self._lock:
+            histograms = [(k, list(h.counts), h.sum, h.count) for k, h in sorted(self._histograms.items())]
+            errors = sorted(self._errors.items())
+            in_flight = sorted(self._in_flight.items())
+        lines = [
+            "# HELP saras_stage_duration_seconds Latency of each request stage.",
+            "# TYPE saras_stage_duration_seconds histogram",
+        ]
+        for (stage, target), counts, total, count in histograms:
+            labels = f'{worker},stage="{_escape(stage)}",target="{_escape(target)}"'
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                lines.append(f'saras_stage_duration_seconds_bucket{{{labels},le="{bound:g}"}} {cumulative}')
+            lines.append(f'saras_stage_duration_seconds_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f"saras_stage_duration_seconds_sum{{{labels}}} {total:.6f}")
+            lines.append(f"saras_stage_duration_seconds_count{{{labels}}} {count}")
+        lines += [
+            "# HELP saras_stage_errors_total Stages that ended with an exception.",
+            "# TYPE saras_stage_errors_total counter",
+        ]
+        lines += [
+            f'saras_stage_errors_total{{{worker},stage="{_escape(s)}",target="{_escape(t)}"}} {n}' for (s, t), n in errors
+        ]
+        lines += [
+            "# HELP saras_stage_in_flight Stages currently running.",
+            "# TYPE saras_stage_in_flight gauge",
+        ]
+        lines += [
+            f'saras_stage_in_flight{{{worker},stage="{_escape(s)}",target="{_escape(t)}"}} {n}' for (s, t), n in in_flight
+        ]
+        return "\n".join(lines) + "\n"
+
+
+def worker_label() -> str:
+    """The `worker` label of this process's series."""
+    return f'worker="{os.getpid()}"'
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# Process-wide collector; module-level span() is the usual entry point
+telemetry = Telemetry()
+span = telemetry.span
@@ -0,0 +1,16 @@
+import pytest
+
+from agents.registry import registry
+import llm_router
+from routing_cache import routing_cache
+from session_store import InMemorySessionStore
+
+
+@pytest.fixture(autouse=True)
+def clear_state(monkeypatch):
+    registry._agents.clear()
+    routing_cache.clear()
+    monkeypatch.setattr(llm_router, "session_store", InMemorySessionStore())
+    yield
+    registry._agents.clear()
+    routing_cache.clear()
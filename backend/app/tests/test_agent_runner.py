@@ -0,0 +1,147 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from agents.base import Agent, cancelled
+from agents.runner import AgentRunner, AgentTimeout
+
+
+class SleepyAgent(Agent):
+    """Legacy sync agent that checks for cancellation between steps."""
+
+    def __init__(self, steps=5, step_seconds=0.05):
+        self.steps, self.step_seconds = steps, step_seconds
+        self.stopped_early = threading.Event()
+        self.active = self.max_active = 0
+        self.lock = threading.Lock()
+
+    def handle(self, query):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            for _ in range(self.steps):
+                if cancelled():
+                    self.stopped_early.set()
+                    return "cancelled"
+                time.sleep(self.step_seconds)
+            return f"done: {query}"
+        finally:
+            with self.lock:
+                self.active -= 1
+
+
+class TickingStreamAgent(Agent):
+    def __init__(self, gap):
+        self.gap = gap
+        self.closed = False
+
+    def handle(self, query):
+        return "unused"
+
+    async def astream(self, query):
+        try:
+            for word in ["one ", "two ", "three"]:
+                yield word
+                await asyncio.sleep(self.gap)
+        finally:
+            self.closed = True
+
+
+class SyncStreamAgent(Agent):
+    def handle(self, query):
+        return "unused"
+
+    def stream(self, query):
+        for word in ["a", "b"]:
+            time.sleep(0.05)
+            yield word
+
+
+async def _ticks_during(coro):
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    task = asyncio.create_task(ticker())
+    try:
+        return await coro, ticks
+    finally:
+        task.cancel()
+
+
+def test_sync_agents_run_in_threads_without_blocking_the_loop():
+    runner = AgentRunner(timeout=5)
+    answer, ticks = asyncio.run(_ticks_during(runner.run("sleepy", SleepyAgent(), "q")))
+    assert answer == "done: q"
+    assert ticks >= 10  # the loop kept running during the 0.25 s handle()
+    assert runner.stats()["completed"] == 1
+
+
+def test_timeout_raises_and_signals_cancellation():
+    runner = AgentRunner(timeout=0.08)
+    agent = SleepyAgent(steps=50)
+    with pytest.raises(AgentTimeout, match="did not answer within 0.08s"):
+        asyncio.run(runner.run("sleepy", agent, "q"))
+    assert agent.stopped_early.wait(1)
+    assert runner.stats()["timed_out"] == 1
+
+
+def test_per_agent_concurrency_limit():
+    runner = AgentRunner(timeout=5, concurrency={"sleepy": 2})
+    agent = SleepyAgent(steps=2)
+
+    async def many():
+        return await asyncio.gather(*(runner.run("sleepy", agent, str(i)) for i in range(6)))
+
+    assert len(asyncio.run(many())) == 6
+    assert agent.max_active == 2
+
+
+def test_streams_are_bounded_by_the_timeout_and_closed():
+    runner = AgentRunner(timeout=0.1)
+    agent = TickingStreamAgent(gap=0.07)
+
+    async def collect():
+        chunks = []
+        with pytest.raises(AgentTimeout):
+            async for chunk in runner.stream("ticker", agent, "q"):
+                chunks.append(chunk)
+        return chunks
+
+    assert asyncio.run(collect()) == ["one ", "two "]
+    assert agent.closed and runner.stats()["timed_out"] == 1
+
+    async def sync_stream():
+        return [c async for c in AgentRunner(timeout=5).stream("sync", SyncStreamAgent(), "q")]
+
+    chunks, ticks = asyncio.run(_ticks_during(sync_stream()))
+    assert chunks == ["a", "b"] and ticks >= 5
+
+
+class BrokenStreamAgent(Agent):
+    def handle(self, query):
+        return "unused"
+
+    def stream(self, query):
+        raise ValueError("cannot stream")
+
+
+def test_stream_that_fails_to_start_releases_its_slot():
+    runner = AgentRunner(timeout=1, concurrency={"broken": 1})
+
+    async def twice():
+        for _ in range(2):
+            with pytest.raises(ValueError):
+                async for _ in runner.stream("broken", BrokenStreamAgent(), "q"):
+                    pass
+
+    asyncio.run(twice())
+    stats = runner.stats()
+    assert stats["failed"] == 2 and stats["timed_out"] == 0 and stats["running"] == {}
@@ -0,0 +1,64 @@
+import logging
+import queue
+
+import app_logging
+from app_logging import Lazy, get_logger, redact, redact_headers, truncate
+from telemetry import current_request_id
+
+
+def test_redacts_credentials_in_text_and_headers():
+    text = redact(
+        "headers={'Authorization': 'Bearer abc.def.ghi', 'X-Api-Key': 'k123'} "
+        "url=https://x/?access_token=tok123&page=2 key=sk-proj-ABCDEFGHIJK password: hunter2"
+    )
+    assert "abc.def" not in text and "k123" not in text and "tok123" not in text
+    assert "ABCDEFGHIJK" not in text and "hunter2" not in text
+    assert "'Authorization': 'Bearer ***'" in text and "page=2" in text
+    assert redact("instrument_token=408065 tokens=12") == "instrument_token=408065 tokens=12"
+    assert redact_headers({"Authorization": "Bearer x", "Accept": "json"}) == {"Authorization": "***", "Accept": "json"}
+
+
+def test_truncates_large_payloads():
+    assert truncate("x" * 10, 4) == "xxxx... [6 chars truncated]"
+    assert truncate("short", 10) == "short"
+
+
+def make_logger(maxsize=10, max_chars=40):
+    q = queue.Queue(maxsize=maxsize)
+    handler = app_logging._BoundedQueueHandler(q, max_chars)
+    handler.addFilter(app_logging._RequestIdFilter())
+    logger = logging.getLogger("saras-test")
+    logger.handlers = [handler]
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    return logger, handler, q
+
+
+def test_records_below_level_are_never_formatted():
+    logger, _, q = make_logger()
+    calls = []
+    logger.debug("expensive %s", Lazy(lambda: calls.append(1) or "value"))
+    assert calls == [] and q.empty()
+
+    token = current_request_id.set("req-9")
+    try:
+        logger.info("holdings=%s token=%s", Lazy(lambda: "r" * 100), "secret-value")
+    finally:
+        current_request_id.reset(token)
+    record = q.get_nowait()
+    assert record.request_id == "req-9"
+    assert "secret-value" not in record.msg and record.msg.endswith("chars truncated]")
+
+
+def test_full_queue_drops_instead_of_blocking():
+    logger, handler, q = make_logger(maxsize=2)
+    for i in range(5):
+        logger.warning("message %d", i)
+    assert q.qsize() == 2 and handler.dropped == 3
+
+
+def test_module_loggers_share_the_configured_pipeline():
+    log = get_logger("some.module")
+    assert log.name == "saras.some.module"
+    assert not logging.getLogger("saras").propagate
+    assert app_logging.stats()["level"] in ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL")
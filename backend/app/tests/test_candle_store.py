@@ -0,0 +1,184 @@
+import asyncio
+import multiprocessing
+import os
+import time
+
+import numpy as np
+import pytest
+
+from core.candle_store import CandleStore, candles_to_columns
+
+DAY = 86400
+T0 = 1704067200  # 2024-01-01 00:00 UTC
+
+
+def daily(start_day, end_day, close_offset=0.0):
+    return [[T0 + d * DAY, 100 + d, 101 + d, 99 + d, 100.5 + d + close_offset, 1000 * d] for d in range(start_day, end_day)]
+
+
+class Upstream:
+    def __init__(self, candles):
+        self.candles = candles
+        self.requests = []
+        self.sessions = []
+
+    async def __call__(self, instrument, interval, start, end, session_id=None):
+        lo, hi = int(start.timestamp()), int(end.timestamp())
+        self.requests.append((lo, hi))
+        self.sessions.append(session_id)
+        return [c for c in self.candles if lo <= c[0] <= hi]
+
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_sync_fetches_only_the_missing_tail(tmp_path):
+    clock = FakeClock(T0 + 10 * DAY)
+    upstream = Upstream(daily(0, 10))
+    store = CandleStore(str(tmp_path), upstream, refresh_seconds=0, clock=clock)
+
+    cols = asyncio.run(store.get_range("NSE:INFY", "day", T0))
+    assert len(cols["ts"]) == 10 and cols["close"][-1] == 109.5
+
+    # Two more days pass; the last stored candle is re-fetched along with the new ones.
+    upstream.candles = daily(0, 12)
+    upstream.candles[9][4] = 200.0  # yesterday's bar was still forming
+    clock.now = T0 + 12 * DAY
+    assert asyncio.run(store.sync("NSE:INFY", "day", T0)) == 2
+    assert upstream.requests[-1][0] == T0 + 9 * DAY
+    cols = store.read("NSE:INFY", "day")
+    assert len(cols["ts"]) == 12 and cols["close"][9] == 200.0
+    assert np.all(np.diff(cols["ts"]) > 0)
+
+
+def test_range_reads_are_views_into_the_maps(tmp_path):
+    store = CandleStore(str(tmp_path))
+    store.append("NSE:TCS", "minute", candles_to_columns(
+        [[T0 + i * 60, 1, 2, 0.5, 1.5, i] for i in range(100_000)]
+    ))
+    cols = store.read("NSE:TCS", "minute", T0 + 600, T0 + 1200)
+    assert cols["ts"][0] == T0 + 600 and len(cols["ts"]) == 11
+    assert isinstance(cols["close"].base, np.memmap) or isinstance(cols["close"], np.memmap)
+    assert np.shares_memory(cols["volume"], store.read("NSE:TCS", "minute")["volume"])
+
+    start = time.perf_counter()
+    for _ in range(100):
+        store.read("NSE:TCS", "minute", T0 + 50_000 * 60, T0 + 60_000 * 60)
+    assert (time.perf_counter() - start) / 100 < 0.001
+
+
+def test_backfill_before_first_candle_rewrites_in_order(tmp_path):
+    clock = FakeClock(T0 + 10 * DAY)
+    upstream = Upstream(daily(0, 10))
+    store = CandleStore(str(tmp_path), upstream, refresh_seconds=3600, clock=clock)
+    asyncio.run(store.sync("NSE:INFY", "day", T0 + 5 * DAY))
+    assert len(store.read("NSE:INFY", "day")["ts"]) == 5
+
+    asyncio.run(store.sync("NSE:INFY", "day", T0))
+    ts = store.read("NSE:INFY", "day")["ts"]
+    assert list(ts) == [T0 + d * DAY for d in range(10)]
+    # The refresh interval has not passed, so the tail was not requested again.
+    assert len(upstream.requests) == 2
+
+
+def test_store_reopens_from_disk(tmp_path):
+    CandleStore(str(tmp_path)).append("NSE:INFY", "day", candles_to_columns(daily(0, 3)))
+    reopened = CandleStore(str(tmp_path))
+    assert reopened.bounds("NSE:INFY", "day") == (T0, T0 + 2 * DAY)
+    assert candles_to_columns([{"date": "2024-01-01T09:15:00+0530", "open": 1, "high": 2, "low": 0, "close": 1, "volume": 5}])["ts"][0] == 1704080700
+
+
+def test_sync_passes_the_requesters_session(tmp_path):
+    upstream = Upstream(daily(0, 3))
+    store = CandleStore(str(tmp_path), upstream, clock=FakeClock(T0 + 3 * DAY))
+    asyncio.run(store.get_range("408065", "day", T0, session_id="mcp-1"))
+    assert upstream.sessions == ["mcp-1"]
+
+
+@pytest.mark.parametrize("instrument,interval", [
+    ("408065", "../../escape"), ("408065", "week"), ("../408065", "day"), ("..", "day"), ("a/b", "day"),
+])
+def test_unsafe_series_names_are_rejected(tmp_path, instrument, interval):
+    root = tmp_path / "store"
+    with pytest.raises(ValueError):
+        CandleStore(str(root)).read(instrument, interval)
+    assert not (tmp_path / "escape").exists()
+    assert not root.exists() or not any(root.iterdir())
+
+
+def _append_days(root, days):
+    store = CandleStore(root)
+    for d in days:
+        store.append("NSE:INFY", "day", candles_to_columns(daily(d, d + 1)))
+
+
+def test_workers_appending_the_same_series_do_not_interleave(tmp_path):
+    ctx = multiprocessing.get_context("fork")
+    # Both workers write every day; each tail append overlaps what the other just wrote.
+    workers = [ctx.Process(target=_append_days, args=(str(tmp_path), range(200))) for _ in range(2)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    assert all(w.exitcode == 0 for w in workers)
+    cols = CandleStore(str(tmp_path)).read("NSE:INFY", "day")
+    assert list(cols["ts"]) == [T0 + d * DAY for d in range(200)]
+    assert list(cols["close"]) == [100.5 + d for d in range(200)]
+    assert not [f for f in os.listdir(tmp_path / "NSE_INFY" / "day") if f.endswith(".tmp")]
+
+
+def test_candles_endpoint_validates_before_touching_the_store(monkeypatch, tmp_path):
+    from fastapi.testclient import TestClient
+
+    import main
+
+    monkeypatch.setattr(main.candle_store, "root", str(tmp_path))
+    client = TestClient(main.app)
+    res = client.get("/candles", params={"instrument_token": "408065", "start": "2024-01-01", "interval": "../../x"})
+    assert res.json()["error"].startswith("invalid_interval")
+    res = client.get("/candles", params={"instrument_token": "../1", "start": "2024-01-01"})
+    assert res.json()["error"].startswith("invalid_instrument_token")
+    res = client.get("/candles", params={"instrument_token": "408065", "start": "2024-01-01"})
+    assert res.json()["error"].startswith("no_session")
+    assert not any(tmp_path.iterdir())
+
+
+def test_sync_waits_for_another_workers_lock_off_the_event_loop(tmp_path):
+    from core.file_lock import locked
+
+    store = CandleStore(str(tmp_path), Upstream(daily(0, 3)), clock=FakeClock(T0 + 3 * DAY))
+    lock_path = os.path.join(store._get_series("NSE:INFY", "day").path, ".lock")
+    held, release = multiprocessing.Event(), multiprocessing.Event()
+
+    def other_worker():
+        with locked(lock_path):
+            held.set()
+            release.wait(5)
+
+    worker = multiprocessing.get_context("fork").Process(target=other_worker)
+    worker.start()
+    held.wait(5)
+
+    async def scenario():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticker = asyncio.ensure_future(tick())
+        asyncio.get_running_loop().call_later(0.3, release.set)
+        added = await store.sync("NSE:INFY", "day", T0)
+        ticker.cancel()
+        return added, ticks
+
+    added, ticks = asyncio.run(scenario())
+    worker.join()
+    assert added == 3 and ticks >= 10
@@ -0,0 +1,82 @@
+import asyncio
+import json
+import time
+from unittest.mock import MagicMock, patch
+
+from agents.registry import registry
+import llm_router
+
+
+LLM_DELAY = 0.3
+
+
+class FakeRequest:
+    """Minimal stand-in for starlette's Request: chat_endpoint only awaits .json()."""
+
+    def __init__(self, body):
+        self._body = body
+
+    async def json(self):
+        return self._body
+
+
+def make_slow_client(delay=LLM_DELAY):
+    """Return a mock OpenAI client whose completion call takes `delay` seconds without blocking."""
+
+    async def slow_create(**kwargs):
+        await asyncio.sleep(delay)
+        content = json.dumps({"agent": "echo", "reason": "test"})
+        return MagicMock(choices=[MagicMock(message=MagicMock(content=content))])
+
+    client = MagicMock()
+    client.chat.completions.create = slow_create
+    return client
+
+
+class EchoAgent:
+    def can_handle(self, query: str) -> bool:
+        return True
+
+    def handle(self, query: str) -> str:
+        return f"echo: {query}"
+
+
+def test_concurrent_chats_overlap_slow_llm_calls():
+    registry.register("echo", EchoAgent())
+    n = 8
+
+    async def run_all():
+        requests = [
+            FakeRequest({"query": f"question {i}", "session_id": f"s{i}"}) for i in range(n)
+        ]
+        return await asyncio.gather(*(llm_router.chat_endpoint(r) for r in requests))
+
+    with patch.object(llm_router, "openai_client", new=make_slow_client()):
+        start = time.perf_counter()
+        results = asyncio.run(run_all())
+        elapsed = time.perf_counter() - start
+
+    assert [r["response"] for r in results] == [f"echo: question {i}" for i in range(n)]
+    # Serialised calls would take n * LLM_DELAY; overlapping calls finish in roughly one delay.
+    assert elapsed < LLM_DELAY * 3
+
+
+def test_event_loop_stays_responsive_during_routing_call():
+    registry.register("echo", EchoAgent())
+
+    async def scenario():
+        chat = asyncio.create_task(
+            llm_router.chat_endpoint(FakeRequest({"query": "hello", "session_id": "s"}))
+        )
+        await asyncio.sleep(0)  # let the chat task start its routing call
+        start = time.perf_counter()
+        await asyncio.sleep(0.01)  # e.g. a health check being served meanwhile
+        health_latency = time.perf_counter() - start
+        result = await chat
+        return health_latency, result
+
+    with patch.object(llm_router, "openai_client", new=make_slow_client()):
+        health_latency, result = asyncio.run(scenario())
+
+    assert health_latency < LLM_DELAY / 2
+    assert result == {"response": "echo: hello"}
@@ -0,0 +1,95 @@
+import asyncio
+import json
+from unittest.mock import patch
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from agents.registry import registry
+import llm_router
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(llm_router.router, prefix="/chat")
+    return TestClient(app)
+
+
+def parse_sse(text):
+    events = []
+    for block in text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+class StreamingAgent:
+    def can_handle(self, query):
+        return True
+
+    def handle(self, query):
+        return "".join(self.stream(query))
+
+    def stream(self, query):
+        yield "Hello, "
+        yield "world"
+
+
+async def select(name, reason="r"):
+    return {"agent": name, "reason": reason}
+
+
+def test_stream_emits_status_route_chunks_and_done(client):
+    registry.register("streamer", StreamingAgent())
+    with patch.object(llm_router, "select_agent", new=lambda q, s: select("streamer")):
+        res = client.post("/chat/stream", json={"query": "hi", "session_id": "s1"})
+
+    assert res.headers["content-type"].startswith("text/event-stream")
+    events = parse_sse(res.text)
+    assert [e for e, _ in events] == ["status", "route", "status", "chunk", "chunk", "done"]
+    assert events[1][1] == {"agent": "streamer"}
+    assert events[-1][1] == {"response": "Hello, world"}
+    # History holds the user message and only the assembled answer, as with /chat.
+    assert asyncio.run(llm_router.get_chat_history("s1")) == [
+        {"role": "user", "content": "hi"},
+        {"role": "assistant", "content": "Hello, world"},
+    ]
+
+
+def test_stream_returns_clarifying_question(client):
+    with patch.object(llm_router, "select_agent", new=lambda q, s: select(None, "Which company?")):
+        res = client.post("/chat/stream", json={"query": "balance sheet", "session_id": "s2"})
+
+    events = parse_sse(res.text)
+    assert events[-1] == ("done", {"response": "Which company?"})
+    assert asyncio.run(llm_router.get_chat_history("s2"))[-1] == {"role": "assistant", "content": "Which company?"}
+
+
+class AsyncAgent:
+    async def ahandle(self, query):
+        await asyncio.sleep(0)
+        return f"async answer to {query}"
+
+    def handle(self, query):
+        raise AssertionError("the chat endpoints must await ahandle()")
+
+
+def test_async_agents_are_awaited_by_both_endpoints(client):
+    registry.register("async", AsyncAgent())
+    with patch.object(llm_router, "select_agent", new=lambda q, s: select("async")):
+        plain = client.post("/chat/", json={"query": "hi", "session_id": "s3"}).json()
+        streamed = parse_sse(client.post("/chat/stream", json={"query": "hi", "session_id": "s4"}).text)
+
+    assert plain == {"response": "async answer to hi"}
+    assert streamed[-1] == ("done", {"response": "async answer to hi"})
+
+
+def test_malformed_body_yields_an_error_event(client):
+    res = client.post("/chat/stream", content=b"{not json", headers={"content-type": "application/json"})
+
+    assert res.status_code == 200
+    events = parse_sse(res.text)
+    assert [e for e, _ in events] == ["error"]
+    assert events[0][1]["error"].startswith("An error occurred:")
@@ -0,0 +1,39 @@
+from context_builder import ContextBuilder, count_tokens
+
+
+def msg(role, content):
+    return {"role": role, "content": content}
+
+
+def test_short_history_is_passed_through():
+    builder = ContextBuilder(budget=500, message_cap=100, summary_budget=100)
+    history = [msg("user", "hi"), msg("assistant", "hello")]
+    assert builder.build("s", history) == history
+
+
+def test_large_messages_are_capped_and_older_turns_summarized():
+    builder = ContextBuilder(budget=200, message_cap=50, summary_budget=60)
+    table = "| col | " * 400
+    history = [msg("user", f"question {i}") if i % 2 == 0 else msg("assistant", table) for i in range(10)]
+
+    context = builder.build("s", history)
+
+    total = sum(count_tokens(m["content"]) for m in context)
+    assert total <= 200 + 10  # budget plus the summary header
+    assert context[0]["role"] == "system" and "earlier conversation" in context[0]["content"]
+    assert context[-1]["role"] == "assistant" and context[-1]["content"].endswith("…")
+    assert all(count_tokens(m["content"]) <= 52 for m in context[1:])
+
+
+def test_summary_is_cached_and_only_extended_by_new_turns():
+    builder = ContextBuilder(budget=130, message_cap=20, summary_budget=100)
+    history = [msg("user", f"turn {i} " + "x" * 60) for i in range(4)]
+    first = builder.build("s", history)[0]["content"]
+
+    history.append(msg("user", "turn 4 " + "x" * 60))
+    second = builder.build("s", history)[0]["content"]
+
+    assert second.startswith(first)
+    assert second.count("turn 0") == 1 and "turn 3" in second and "turn 3" not in first
+    builder.forget("s")
+    assert "s" not in builder._summaries
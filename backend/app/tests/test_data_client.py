@@ -0,0 +1,154 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from core import financial_data
+from core.data_client import DataClient
+from core.response_cache import ResponseCache
+
+
+@pytest.fixture
+def client_and_calls(monkeypatch):
+    calls = []
+
+    async def handler(request: httpx.Request):
+        calls.append(request)
+        if request.method == "POST":
+            return httpx.Response(200, json={"echo": request.read().decode()})
+        return httpx.Response(200, json={"path": request.url.path})
+
+    client = DataClient(base_url="https://upstream.test/", transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(financial_data, "data_client", client)
+    yield client, calls
+    client.close()
+
+
+def test_sync_facade_uses_shared_session(client_and_calls):
+    client, calls = client_and_calls
+    assert financial_data.get_company_data("TCS") == {"path": "/companies/TCS"}
+    session = client._client
+    assert financial_data.get_companies_in_sector("IT") == {"path": "/sectors/IT/companies/"}
+    assert client._client is session
+    assert len(calls) == 2
+
+
+def test_async_wrappers_work_from_different_event_loops(client_and_calls):
+    client, calls = client_and_calls
+    first = asyncio.run(financial_data.get_conference_call_details_async(7))
+    second = asyncio.run(financial_data.conference_call_qa_async(7, 2025, 2, "margins?", k=2))
+    assert first == {"path": "/companies/7/conference-calls/details/"}
+    assert json.loads(second["echo"]) == {"question": "margins?", "k": 2}
+    assert calls[1].extensions["timeout"]["read"] == client.timeout_for("conference_call_qa").read
+
+
+def test_http_errors_are_raised(monkeypatch):
+    client = DataClient(
+        base_url="https://upstream.test/",
+        transport=httpx.MockTransport(lambda request: httpx.Response(503)),
+    )
+    monkeypatch.setattr(financial_data, "data_client", client)
+    try:
+        with pytest.raises(httpx.HTTPStatusError):
+            financial_data.get_company_data("TCS")
+    finally:
+        client.close()
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_cached_get_revalidates_with_etag():
+    clock = FakeClock()
+    seen_headers = []
+
+    def handler(request: httpx.Request):
+        seen_headers.append(request.headers.get("If-None-Match"))
+        if request.headers.get("If-None-Match") == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, json={"id": "TCS"}, headers={"ETag": '"v1"'})
+
+    client = DataClient(
+        base_url="https://upstream.test/",
+        transport=httpx.MockTransport(handler),
+        cache=ResponseCache(ttls={"company_data": 60}, clock=clock),
+    )
+    try:
+        fetch = lambda: client.run_sync(client.get("company_data", "/companies/TCS"))
+        assert fetch() == {"id": "TCS"}
+        assert fetch() == {"id": "TCS"}  # fresh: served without a request
+        clock.now = 61
+        assert fetch() == {"id": "TCS"}  # stale: conditional request answered with 304
+        assert seen_headers == [None, '"v1"']
+        stats = client.stats()["cache"]
+        assert (stats["misses"], stats["hits"], stats["revalidated"]) == (1, 1, 1)
+    finally:
+        client.close()
+
+
+def test_response_cache_evicts_least_recently_used_by_size():
+    cache = ResponseCache(max_bytes=10, ttls={"e": 60})
+    cache.store("a", "e", b"aaaa")
+    cache.store("b", "e", b"bbbb")
+    cache.lookup("a")  # touch a so b becomes least recently used
+    cache.store("c", "e", b"cccc")
+    assert cache.lookup("b") is None
+    assert cache.lookup("a") is not None and cache.lookup("c") is not None
+    assert cache.stats()["bytes"] == 8
+    assert cache.stats()["evictions"] == 1
+
+
+def test_concurrent_identical_requests_share_one_fetch():
+    upstream_calls = []
+
+    async def handler(request: httpx.Request):
+        upstream_calls.append(request.url.path)
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, json={"summary": "ok"})
+
+    client = DataClient(
+        base_url="https://upstream.test/",
+        transport=httpx.MockTransport(handler),
+        cache=ResponseCache(ttls={}),
+    )
+
+    async def burst():
+        return await asyncio.gather(
+            *(client.get("conference_call_summary", "/companies/1/conference-calls/2025/2/summary/") for _ in range(10)),
+            client.get("conference_call_summary", "/companies/2/conference-calls/2025/2/summary/"),
+        )
+
+    try:
+        results = asyncio.run(burst())
+        assert all(r == {"summary": "ok"} for r in results)
+        assert results[0] is not results[1]  # every caller gets its own decoded copy
+        assert len(upstream_calls) == 2
+        assert client.stats()["singleflight"] == {"executed": 2, "coalesced": 9, "in_flight": 0}
+    finally:
+        client.close()
+
+
+def test_coalesced_callers_all_receive_the_error():
+    async def handler(request: httpx.Request):
+        await asyncio.sleep(0.05)
+        return httpx.Response(500)
+
+    client = DataClient(base_url="https://upstream.test/", transport=httpx.MockTransport(handler))
+
+    async def burst():
+        return await asyncio.gather(
+            *(client.get("company_data", "/companies/TCS") for _ in range(3)), return_exceptions=True
+        )
+
+    try:
+        results = asyncio.run(burst())
+        assert all(isinstance(r, httpx.HTTPStatusError) for r in results)
+        assert client.stats()["singleflight"]["coalesced"] == 2
+    finally:
+        client.close()
@@ -0,0 +1,148 @@
+import asyncio
+import json
+import time
+from unittest.mock import MagicMock, patch
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from agents.registry import registry
+import fanout
+import llm_router
+
+
+class FakeRequest:
+    def __init__(self, body):
+        self._body = body
+
+    async def json(self):
+        return self._body
+
+
+class SlowAsyncAgent:
+    def __init__(self, name, delay):
+        self.name, self.delay = name, delay
+
+    async def ahandle(self, query):
+        await asyncio.sleep(self.delay)
+        return f"{self.name}: {query}"
+
+
+class SlowSyncAgent:
+    def handle(self, query):
+        time.sleep(0.2)
+        return f"sync: {query}"
+
+
+class FailingAgent:
+    async def ahandle(self, query):
+        raise RuntimeError("upstream down")
+
+
+def test_parse_plan_validates_against_registry():
+    known = {"conference_call": object(), "news": object()}
+    selection = {"agents": [
+        {"agent": "conference_call", "query": "TCS Q2 call"},
+        {"agent": "weather", "query": "rain?"},
+        "news",
+        {"agent": "conference_call", "query": "TCS Q2 call"},
+    ]}
+    assert fanout.parse_plan(selection, known, "whole query") == [
+        ("conference_call", "TCS Q2 call"), ("news", "whole query"),
+    ]
+    assert fanout.parse_plan({"agent": "news", "reason": "r"}, known) == []
+
+
+def test_agents_run_concurrently_with_their_own_deadlines():
+    agents = {
+        "a": SlowAsyncAgent("a", 0.2),
+        "b": SlowSyncAgent(),
+        "slow": SlowAsyncAgent("slow", 5),
+        "broken": FailingAgent(),
+    }
+    plan = [("a", "q1"), ("b", "q2"), ("slow", "q3"), ("broken", "q4")]
+    start = time.perf_counter()
+    results = asyncio.run(fanout.run_plan(plan, agents, deadlines={"slow": 0.3}))
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 0.6  # the slowest deadline, not the sum of the agents' latencies
+    assert [r["status"] for r in results] == ["ok", "ok", "timeout", "error"]
+    merged = fanout.merge_results(results)
+    assert merged.index("a: q1") < merged.index("sync: q2")
+    assert "**Slow** (q3)\nThis part could not be answered: no answer within 0.3s." in merged
+    assert "upstream down" in merged
+
+
+async def select_plan(q, s):
+    return {"agents": [{"agent": "calls", "query": "TCS Q2 results"}, {"agent": "news", "query": "TCS news"}], "reason": "r"}
+
+
+def test_chat_endpoints_merge_fanned_out_answers():
+    registry.register("calls", SlowAsyncAgent("calls", 0.1))
+    registry.register("news", SlowAsyncAgent("news", 0.1))
+    app = FastAPI()
+    app.include_router(llm_router.router, prefix="/chat")
+    client = TestClient(app)
+
+    with patch.object(llm_router, "select_agent", new=select_plan):
+        plain = client.post("/chat/", json={"query": "compare", "session_id": "f1"}).json()
+        streamed = client.post("/chat/stream", json={"query": "compare", "session_id": "f2"}).text
+
+    expected = "**Calls** (TCS Q2 results)\ncalls: TCS Q2 results\n\n**News** (TCS news)\nnews: TCS news"
+    assert plain == {"response": expected}
+    events = [block.split("\n") for block in streamed.strip().split("\n\n")]
+    route = json.loads(next(b[1][6:] for b in events if b[0] == "event: route"))
+    assert route == {"agent": None, "agents": ["calls", "news"]}
+    assert json.loads(events[-1][1][6:]) == {"response": expected}
+    assert asyncio.run(llm_router.get_chat_history("f1"))[-1] == {"role": "assistant", "content": expected}
+
+
+class KeywordAgent:
+    """Stands in for a real agent: same KEYWORDS, so local routing sees it the same way."""
+
+    def __init__(self, name, keywords):
+        self.name, self.KEYWORDS = name, keywords
+
+    async def ahandle(self, query):
+        return f"{self.name}: {query}"
+
+    def handle(self, query):
+        return f"{self.name}: {query}"
+
+
+def counting_llm(decision):
+    calls = []
+
+    async def create(**kwargs):
+        calls.append(kwargs)
+        return MagicMock(choices=[MagicMock(message=MagicMock(content=json.dumps(decision)))])
+
+    client = MagicMock()
+    client.chat.completions.create = create
+    return client, calls
+
+
+def test_multi_part_question_reaches_the_llm_and_fans_out():
+    from agents.conference_call_agent import ConferenceCallAgent
+    from agents.news_agent import NewsAgent
+
+    registry.register("conference_call", KeywordAgent("calls", ConferenceCallAgent.KEYWORDS))
+    registry.register("news", KeywordAgent("news", NewsAgent.KEYWORDS))
+    plan = {"agents": [{"agent": "conference_call", "query": "TCS Q2 concall"},
+                       {"agent": "news", "query": "TCS news since Q2"}], "reason": "two parts"}
+    client, calls = counting_llm(plan)
+
+    async def ask(query, session_id):
+        return await llm_router.chat_endpoint(FakeRequest({"query": query, "session_id": session_id}))
+
+    with patch.object(llm_router, "openai_client", new=client):
+        multi = asyncio.run(ask("Compare TCS Q2 concall with the news since", "m1"))
+        assert len(calls) == 1
+        single = asyncio.run(ask("latest TCS concall summary", "m2"))
+        assert len(calls) == 1  # a confident single-intent question still routes locally
+
+    assert multi["response"] == (
+        "**Conference call** (TCS Q2 concall)\ncalls: TCS Q2 concall\n\n"
+        "**News** (TCS news since Q2)\nnews: TCS news since Q2"
+    )
+    assert single["response"] == "calls: latest TCS concall summary"
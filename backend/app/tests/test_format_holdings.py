@@ -0,0 +1,37 @@
+import io
+
+from mcp_client import format_holdings, to_columnar, write_table
+
+ROWS = [
+    {"tradingsymbol": "INFY", "quantity": 10},
+    {"tradingsymbol": "TCS", "quantity": 2, "tags": ["it"]},
+]
+
+
+def test_table_keeps_first_seen_column_order_and_widths():
+    assert format_holdings(ROWS).splitlines() == [
+        "tradingsymbol | quantity | tags  ",
+        "--------------+----------+-------",
+        "INFY          | 10       |       ",
+        "TCS           | 2        | [\"it\"]",
+    ]
+
+
+def test_write_table_streams_the_same_text():
+    out = io.StringIO()
+    write_table(ROWS, out)
+    assert out.getvalue() == format_holdings(ROWS)
+
+
+def test_other_shapes_unchanged():
+    assert format_holdings([1, 2]) == "1\n2"
+    assert format_holdings({"a": 1}) == '{\n  "a": 1\n}'
+    assert format_holdings("please log in") == "please log in"
+
+
+def test_columnar_json():
+    assert to_columnar(ROWS) == {
+        "columns": ["tradingsymbol", "quantity", "tags"],
+        "values": [["INFY", "TCS"], [10, 2], [None, ["it"]]],
+    }
+    assert to_columnar([]) == {"columns": [], "values": []}
@@ -0,0 +1,100 @@
+import asyncio
+
+import pytest
+
+from holdings_feed import HoldingsFeed
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def row(symbol, qty, price):
+    return {"tradingsymbol": symbol, "exchange": "NSE", "quantity": qty, "last_price": price}
+
+
+class Upstream:
+    def __init__(self, holdings):
+        self.holdings = holdings
+        self.calls = 0
+
+    async def __call__(self, session_id):
+        self.calls += 1
+        await asyncio.sleep(0)
+        if session_id != "sid":
+            raise LookupError("invalid_session")
+        return list(self.holdings)
+
+
+def test_pollers_share_snapshot_until_stale():
+    clock = FakeClock()
+    upstream = Upstream([row("INFY", 10, 1500.0)])
+    feed = HoldingsFeed(upstream, refresh_interval=5, clock=clock, wall_clock=lambda: 1000.0)
+
+    async def scenario():
+        first = await asyncio.gather(*(feed.snapshot("sid") for _ in range(5)))
+        clock.now = 3
+        cached = await feed.snapshot("sid")
+        clock.now = 6
+        refreshed = await feed.snapshot("sid")
+        return first, cached, refreshed
+
+    first, cached, refreshed = asyncio.run(scenario())
+    assert upstream.calls == 2  # five concurrent pollers coalesced, then one refresh when stale
+    assert first[0]["holdings"] == [row("INFY", 10, 1500.0)]
+    assert first[0]["keys"] == ["NSE:INFY"] and first[0]["as_of"] == 1000.0
+    assert cached["age_seconds"] == 3
+    assert refreshed["age_seconds"] == 0 and refreshed["version"] == 1  # unchanged holdings
+
+
+def test_unknown_session_raises_lookup_error():
+    feed = HoldingsFeed(Upstream([]))
+    with pytest.raises(LookupError):
+        asyncio.run(feed.snapshot("other"))
+
+
+def test_subscribers_receive_only_changed_rows():
+    upstream = Upstream([row("INFY", 10, 1500.0), row("TCS", 5, 3500.0)])
+    feed = HoldingsFeed(upstream, refresh_interval=0.01)
+
+    async def scenario():
+        stream = feed.subscribe("sid")
+        events = [await stream.__anext__()]
+        upstream.holdings = [row("INFY", 10, 1510.0)]
+        events.append(await stream.__anext__())
+        upstream.holdings = [row("INFY", 10, 1510.0), row("HDFCBANK", 2, 1600.0)]
+        events.append(await stream.__anext__())
+        await stream.aclose()
+        return events
+
+    events = asyncio.run(scenario())
+    assert events[0][0] == "snapshot" and events[0][1]["keys"] == ["NSE:INFY", "NSE:TCS"]
+    kind, delta = events[1]
+    assert kind == "delta"
+    assert delta["upserts"] == {"NSE:INFY": row("INFY", 10, 1510.0)}
+    assert delta["removed"] == ["NSE:TCS"] and delta["keys"] == ["NSE:INFY"]
+    kind, delta = events[2]
+    assert delta["upserts"] == {"NSE:HDFCBANK": row("HDFCBANK", 2, 1600.0)} and delta["removed"] == []
+    assert feed.stats()["subscribers"] == 0
+
+
+def test_drop_ends_subscriptions():
+    feed = HoldingsFeed(Upstream([row("INFY", 10, 1500.0)]), refresh_interval=60)
+
+    async def scenario():
+        stream = feed.subscribe("sid")
+        await stream.__anext__()
+        pending = asyncio.ensure_future(stream.__anext__())
+        await asyncio.sleep(0)
+        feed.drop("sid")
+        event = await pending
+        with pytest.raises(StopAsyncIteration):
+            await stream.__anext__()
+        return event
+
+    assert asyncio.run(scenario()) == ("error", {"error": "session_closed", "fatal": True})
+    assert feed.stats()["sessions"] == 0
@@ -0,0 +1,53 @@
+from agents.company_kb_agent import CompanyKBAgent
+from agents.conference_call_agent import ConferenceCallAgent
+from agents.financial_statements_agent import FinancialStatementsAgent
+from agents.market_data_agent import MarketDataAgent
+from agents.news_agent import NewsAgent
+from local_router import LocalRouter
+
+
+AGENTS = {
+    "conference_call": ConferenceCallAgent(),
+    "financial_statements": FinancialStatementsAgent(),
+    "news": NewsAgent(),
+    "market_data": MarketDataAgent(),
+    "company_kb": CompanyKBAgent(),
+}
+
+
+def test_confident_queries_route_locally():
+    router = LocalRouter(threshold=0.45, margin=0.15)
+    assert router.route("latest TCS concall summary", AGENTS)["agent"] == "conference_call"
+    assert router.route("Any breaking news about ADANIPORTS?", AGENTS)["agent"] == "news"
+    assert router.route("Reliance market price and volume", AGENTS)["agent"] == "market_data"
+
+
+def test_ambiguous_or_subjectless_queries_defer_to_llm():
+    router = LocalRouter(threshold=0.45, margin=0.15)
+    assert router.route("Tell me the weather in Mumbai today", AGENTS) is None
+    assert router.route("Summarize the call and give EPS for the quarter", AGENTS) is None
+    # Clearly financial_statements, but no company named: the LLM should ask which one.
+    lenient = LocalRouter(threshold=0.3, margin=0.15)
+    assert lenient.route("Show me the balance sheet for TCS", AGENTS)["agent"] == "financial_statements"
+    assert lenient.route("Show me the balance sheet", AGENTS) is None
+
+
+def test_refits_when_agents_change():
+    router = LocalRouter(threshold=0.3, margin=0.1)
+    assert router.route("latest TCS concall summary", {"news": NewsAgent()}) is None
+    assert router.route("latest TCS concall summary", AGENTS)["agent"] == "conference_call"
+
+
+def test_policy_and_multi_intent_queries_defer_to_llm():
+    router = LocalRouter(threshold=0.45, margin=0.15)
+    # Advice and opinions (knowledge base rule 11), even when an agent keyword matches strongly.
+    assert router.route("Should I buy TCS after the concall?", AGENTS) is None
+    assert router.route("Is the TCS concall a good investment signal, will it go up?", AGENTS) is None
+    assert router.route("What is your opinion on the latest TCS concall?", AGENTS) is None
+    # Non-financial topics (rule 10).
+    assert router.route("Tell me a joke about the TCS concall", AGENTS) is None
+    # Several agents have a real claim on the question.
+    assert router.route("Compare TCS Q2 concall with the news since", AGENTS) is None
+    assert router.route("TCS concall summary and latest news", AGENTS) is None
+    # The confident single-intent case is unaffected.
+    assert router.route("latest TCS concall summary", AGENTS)["agent"] == "conference_call"
@@ -0,0 +1,44 @@
+import asyncio
+import time
+
+import pytest
+
+from mcp_portfolio import DEFAULT_VIEWS, fetch_views, parse_views
+
+
+def delayed(value, seconds):
+    async def call():
+        await asyncio.sleep(seconds)
+        return value
+    return call
+
+
+async def failing():
+    raise RuntimeError("Kite session expired")
+
+
+def test_views_run_concurrently_with_partial_results():
+    calls = {
+        "holdings": delayed([{"tradingsymbol": "INFY"}], 0.2),
+        "positions": delayed({"net": []}, 0.2),
+        "margins": delayed({}, 5),
+        "mf_holdings": failing,
+    }
+    start = time.perf_counter()
+    result = asyncio.run(fetch_views(calls, timeout=0.3))
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 0.6  # slowest call (capped by the timeout), not the sum
+    views = result["views"]
+    assert views["holdings"] == {"status": "ok", "data": [{"tradingsymbol": "INFY"}], "elapsed_ms": views["holdings"]["elapsed_ms"]}
+    assert views["positions"]["status"] == "ok"
+    assert views["margins"]["status"] == "timeout"
+    assert views["mf_holdings"]["status"] == "error" and "expired" in views["mf_holdings"]["error"]
+    assert list(views) == list(calls)
+
+
+def test_parse_views_only_allows_read_only_tools():
+    assert parse_views(None) == list(DEFAULT_VIEWS)
+    assert parse_views("margins, holdings,margins") == ["margins", "holdings"]
+    with pytest.raises(ValueError):
+        parse_views("holdings,place_order")
@@ -0,0 +1,94 @@
+import asyncio
+
+from mcp_sessions import MCPSessionManager
+
+
+class FakeClient:
+    def __init__(self):
+        self.connected = False
+        self.enters = 0
+        self.exits = 0
+        self.ping_ok = True
+
+    async def __aenter__(self):
+        self.connected = True
+        self.enters += 1
+        return self
+
+    async def __aexit__(self, *exc):
+        self.connected = False
+        self.exits += 1
+
+    def is_connected(self):
+        return self.connected
+
+    async def ping(self):
+        if not self.ping_ok:
+            raise ConnectionError("sse stream closed")
+        return True
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_cap_closes_least_recently_used_session():
+    clock = FakeClock()
+    manager = MCPSessionManager(FakeClient, max_sessions=2, clock=clock)
+
+    async def scenario():
+        a, client_a = await manager.open()
+        clock.now = 1
+        b, _ = await manager.open()
+        clock.now = 2
+        await manager.get(a)  # a becomes most recently used
+        c, _ = await manager.open()
+        return a, b, c, client_a
+
+    a, b, c, client_a = asyncio.run(scenario())
+    assert set(manager._sessions) == {a, c}
+    assert manager.stats()["evicted"] == 1 and manager.stats()["open_sessions"] == 2
+    assert client_a.connected
+
+
+def test_reaper_closes_idle_and_too_old_sessions():
+    clock = FakeClock()
+    manager = MCPSessionManager(FakeClient, idle_timeout=10, max_age=100, clock=clock)
+
+    async def scenario():
+        idle, idle_client = await manager.open()
+        busy, busy_client = await manager.open()
+        for t in range(1, 12):
+            clock.now = t
+            await manager.get(busy)
+        assert await manager.reap() == 1
+        clock.now = 101
+        assert await manager.get(busy) is None  # absolute timeout
+        return idle_client, busy_client
+
+    idle_client, busy_client = asyncio.run(scenario())
+    assert idle_client.exits == 1 and busy_client.exits == 1
+    assert manager.stats()["reaped"] == 2 and manager.stats()["open_sessions"] == 0
+
+
+def test_dead_transports_are_reconnected():
+    manager = MCPSessionManager(FakeClient)
+
+    async def scenario():
+        sid, client = await manager.open()
+        client.connected = False  # transport dropped
+        assert await manager.get(sid) is client
+        assert client.connected and client.enters == 2
+
+        client.ping_ok = False  # still "connected" but the stream is dead
+        await manager.check_health()
+        return client
+
+    client = asyncio.run(scenario())
+    assert client.enters == 3
+    assert manager.stats()["reconnected"] == 2
+    assert manager.stats()["failed_health_checks"] == 1
@@ -0,0 +1,84 @@
+import asyncio
+import time
+
+import numpy as np
+import pytest
+
+from agents import portfolio_agent
+from agents.base import current_mcp_session
+from agents.portfolio_agent import PortfolioAgent
+from core.portfolio_analytics import analysis_to_json, analyze, holdings_frame, summarize
+
+HOLDINGS = [
+    {"tradingsymbol": "INFY", "exchange": "NSE", "quantity": 10, "t1_quantity": 0,
+     "average_price": 1400.0, "last_price": 1500.0, "close_price": 1480.0},
+    {"tradingsymbol": "TCS", "exchange": "NSE", "quantity": 2, "t1_quantity": 1,
+     "average_price": 3600.0, "last_price": 3500.0, "close_price": 3550.0},
+    {"tradingsymbol": "IDEA", "exchange": "NSE", "quantity": "100", "average_price": None,
+     "last_price": 10.0, "close_price": 0},
+]
+
+
+def test_metrics():
+    a = analyze(HOLDINGS)
+    t = a["totals"]
+    # INFY 15000, TCS 3 x 3500 = 10500 (T1 shares count), IDEA 1000
+    assert t["value"] == pytest.approx(26500.0)
+    assert t["invested"] == pytest.approx(14000.0 + 10800.0)
+    assert t["pnl"] == pytest.approx(26500.0 - 24800.0)
+    assert t["day_change"] == pytest.approx(10 * 20 - 3 * 50)  # IDEA has no close yet: no change
+    assert t["day_change_pct"] == pytest.approx(50 / 26450 * 100)
+
+    positions = a["positions"]
+    assert list(positions["symbol"]) == ["INFY", "TCS", "IDEA"]
+    assert positions["weight_pct"].sum() == pytest.approx(100.0)
+    assert positions.loc[positions.symbol == "IDEA", "pnl_pct"].item() == 0.0  # unknown cost
+
+    weights = np.array([15000, 10500, 1000]) / 26500
+    assert a["concentration"]["herfindahl"] == pytest.approx(np.square(weights).sum())
+    assert a["concentration"]["largest"] == "INFY"
+    assert list(a["top_gainers"]["symbol"])[0] == "INFY"
+    assert list(a["top_losers"]["symbol"])[0] == "TCS"
+
+
+def test_json_and_summary():
+    a = analyze(HOLDINGS)
+    payload = analysis_to_json(a)
+    assert payload["positions"][0]["symbol"] == "INFY"
+    assert payload["top_losers"][0] == {"symbol": "TCS", "day_change": -150.0, "day_change_pct": pytest.approx(-1.4085, abs=1e-4)}
+    text = summarize(a)
+    assert "3 holdings worth ₹26,500.00" in text and "Largest position: INFY" in text
+    assert summarize(analyze([])) == "Your portfolio has no holdings."
+
+
+def test_thousands_of_positions_take_milliseconds():
+    rng = np.random.default_rng(0)
+    rows = [
+        {"tradingsymbol": f"S{i}", "exchange": "NSE", "quantity": int(q), "average_price": float(a),
+         "last_price": float(p), "close_price": float(c)}
+        for i, (q, a, p, c) in enumerate(zip(rng.integers(1, 100, 2000), *rng.uniform(10, 1000, (3, 2000))))
+    ]
+    analyze(rows)
+    start = time.perf_counter()
+    a = analyze(holdings_frame(rows))
+    assert time.perf_counter() - start < 0.05
+    assert a["totals"]["positions"] == 2000
+
+
+def test_portfolio_agent_uses_the_requesters_session(monkeypatch):
+    seen = []
+
+    async def source(session_id):
+        seen.append(session_id)
+        return HOLDINGS
+
+    monkeypatch.setattr(portfolio_agent, "_holdings_source", source)
+    agent = PortfolioAgent()
+    assert "Connect your Zerodha account" in agent.handle("how is my portfolio doing")
+
+    async def ask():
+        current_mcp_session.set("mcp-1")
+        return await agent.ahandle("how is my portfolio doing")
+
+    assert asyncio.run(ask()).startswith("Portfolio: 3 holdings")
+    assert seen == ["mcp-1"]
@@ -0,0 +1,147 @@
+import asyncio
+
+from agents.base import current_mcp_session
+from agents.market_data_agent import MarketDataAgent, extract_symbols
+from core.quote_service import QuoteService, normalize_symbol
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class Upstream:
+    def __init__(self):
+        self.batches = []
+        self.sessions = []
+
+    async def __call__(self, symbols, session_id=None):
+        self.batches.append(sorted(symbols))
+        self.sessions.append(session_id)
+        await asyncio.sleep(0.01)
+        return {s: {"last_price": 100.0, "ohlc": {"close": 99.0}, "volume": 1000} for s in symbols if s != "NSE:NOPE"}
+
+
+def test_concurrent_requests_are_batched_and_deduplicated():
+    upstream = Upstream()
+    service = QuoteService(upstream, window=0.01, ttl=1.0)
+
+    async def scenario():
+        return await asyncio.gather(
+            service.get_quotes(["INFY", "TCS"]),
+            service.get_quotes(["nse:infy", "RELIANCE"]),
+            service.get_quote("NOPE"),
+        )
+
+    a, b, missing = asyncio.run(scenario())
+    assert upstream.batches == [["NSE:INFY", "NSE:NOPE", "NSE:RELIANCE", "NSE:TCS"]]
+    assert list(a) == ["NSE:INFY", "NSE:TCS"] and a["NSE:INFY"]["last_price"] == 100.0
+    assert list(b) == ["NSE:INFY", "NSE:RELIANCE"]
+    assert missing is None
+    stats = service.stats()
+    assert stats["batches"] == 1 and stats["deduplicated"] == 1 and stats["upstream_symbols"] == 4
+
+
+def test_quotes_are_cached_for_ttl():
+    clock = FakeClock()
+    upstream = Upstream()
+    service = QuoteService(upstream, window=0, ttl=1.0, clock=clock)
+
+    async def scenario():
+        await service.get_quote("INFY")
+        clock.now = 0.5
+        await service.get_quote("INFY")
+        clock.now = 1.5
+        await service.get_quote("INFY")
+
+    asyncio.run(scenario())
+    assert len(upstream.batches) == 2
+    assert service.stats()["cache_hits"] == 1
+
+
+def test_batch_is_split_at_max_size():
+    upstream = Upstream()
+    service = QuoteService(upstream, window=10, max_batch=2)
+    result = asyncio.run(service.get_quotes(["A1", "B1", "C1"]))
+    assert len(result) == 3
+    assert sorted(len(b) for b in upstream.batches) == [1, 2]
+
+
+def test_upstream_failure_reaches_every_waiter():
+    async def failing(symbols, session_id):
+        raise LookupError("no active Kite MCP session")
+
+    service = QuoteService(failing, window=0)
+
+    async def scenario():
+        return await asyncio.gather(service.get_quote("INFY"), service.get_quote("INFY"), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(r, LookupError) for r in results)
+
+
+def test_symbol_extraction_and_normalization():
+    assert normalize_symbol(" bse:tcs ") == "BSE:TCS"
+    assert extract_symbols("What is the price of INFY and nse:reliance today?") == ["NSE:RELIANCE", "INFY"]
+    assert extract_symbols("how is the market doing") == []
+    assert extract_symbols("INFY price after Q2 FY24 and H1 FY2025 results") == ["INFY"]
+
+
+def test_batches_are_per_session():
+    upstream = Upstream()
+    service = QuoteService(upstream, window=0.01, ttl=0)
+
+    async def scenario():
+        return await asyncio.gather(
+            service.get_quotes(["INFY"], "alice"),
+            service.get_quotes(["INFY", "TCS"], "bob"),
+        )
+
+    asyncio.run(scenario())
+    # Each user's symbols are fetched with their own session, even when they overlap.
+    assert sorted(zip(upstream.sessions, upstream.batches)) == [
+        ("alice", ["NSE:INFY"]), ("bob", ["NSE:INFY", "NSE:TCS"]),
+    ]
+
+
+def ask(agent, query, session_id):
+    async def scenario():
+        current_mcp_session.set(session_id)
+        return await agent.ahandle(query)
+
+    return asyncio.run(scenario())
+
+
+def test_market_data_agent_formats_quotes():
+    upstream = Upstream()
+    agent = MarketDataAgent(QuoteService(upstream, window=0))
+    response = ask(agent, "quote for INFY", "mcp-1")
+    assert "NSE:INFY: ₹100.00 (+1.00, +1.01%), volume 1,000" in response
+    assert upstream.sessions == ["mcp-1"]
+    assert "symbol" in ask(agent, "what is the market doing", "mcp-1")
+
+
+def test_market_data_agent_without_session():
+    upstream = Upstream()
+    agent = MarketDataAgent(QuoteService(upstream, window=0))
+    assert "Zerodha session" in agent.handle("price of INFY")
+    assert upstream.batches == []
+
+    async def expired(symbols, session_id):
+        raise LookupError("no active Kite MCP session")
+
+    agent = MarketDataAgent(QuoteService(expired, window=0))
+    assert "Zerodha session" in ask(agent, "price of INFY", "gone")
+
+
+def test_quotes_endpoint_requires_the_callers_session():
+    from fastapi.testclient import TestClient
+
+    import main
+
+    client = TestClient(main.app)
+    assert client.get("/quotes", params={"symbols": "INFY"}).json()["error"].startswith("no_session")
+    assert client.get("/quotes", params={"symbols": "INFY", "session_id": "unknown"}).json()["error"].startswith("no_session")
@@ -1,17 +1,21 @@
+import asyncio
 import json
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 import pytest
 
 from agents.registry import registry
 import llm_router
+from routing_cache import routing_cache
 
 
 @pytest.fixture(autouse=True)
 def clear_registry():
     # Ensure registry is empty for tests
     registry._agents.clear()
+    routing_cache.clear()
     yield
     registry._agents.clear()
+    routing_cache.clear()
 
 
 def load_examples(path="./tests/data/routing_examples.jsonl"):
@@ -56,8 +60,8 @@ def test_choose_agent_via_llm_parses_json():
     mock_resp.choices = [MagicMock(message=MagicMock(content=json.dumps(example)))]
 
     with patch.object(llm_router, "openai_client", new=MagicMock()) as mock_client:
-        mock_client.chat.completions.create.return_value = mock_resp
-        parsed = llm_router.choose_agent_via_llm("Summarize the latest Q2 conference call for TCS")
+        mock_client.chat.completions.create = AsyncMock(return_value=mock_resp)
+        parsed = asyncio.run(llm_router.choose_agent_via_llm("Summarize the latest Q2 conference call for TCS"))
         assert parsed["agent"] == "conference_call"
         assert parsed["params"]["company"] == "TCS"
 
@@ -77,3 +81,71 @@ def test_examples_file_matches_registry():
         # it's fine if some agents aren't registered in this test, just ensure schema
         assert "query" in ex
         assert "expected_agent" in ex
+
+
+def _mock_selection_client(agent_name):
+    mock_resp = MagicMock()
+    mock_resp.choices = [MagicMock(message=MagicMock(content=json.dumps({"agent": agent_name, "reason": "r"})))]
+    client = MagicMock()
+    client.chat.completions.create = AsyncMock(return_value=mock_resp)
+    return client
+
+
+def test_routing_cache_hit_skips_llm_for_near_repeat_query():
+    from agents.conference_call_agent import ConferenceCallAgent
+    registry.register("conference_call", ConferenceCallAgent())
+
+    with patch.object(llm_router, "openai_client", new=_mock_selection_client("conference_call")) as client:
+        first = asyncio.run(llm_router.choose_agent_via_llm("Latest TCS concall summary?"))
+        second = asyncio.run(llm_router.choose_agent_via_llm("latest  tcs concall summary"))
+
+    assert first == second == {"agent": "conference_call", "reason": "r"}
+    assert client.chat.completions.create.await_count == 1
+
+
+def test_routing_cache_invalidated_when_registry_changes():
+    from agents.conference_call_agent import ConferenceCallAgent
+    from agents.news_agent import NewsAgent
+    registry.register("conference_call", ConferenceCallAgent())
+
+    with patch.object(llm_router, "openai_client", new=_mock_selection_client("conference_call")) as client:
+        asyncio.run(llm_router.choose_agent_via_llm("TCS concall"))
+        registry.register("news", NewsAgent())
+        asyncio.run(llm_router.choose_agent_via_llm("TCS concall"))
+
+    assert client.chat.completions.create.await_count == 2
+
+
+def test_keyword_matcher_finds_overlapping_keywords_in_one_pass():
+    from agents.keyword_matcher import KeywordMatcher
+
+    matcher = KeywordMatcher({"disc": ["disclosure", "company disclosure"], "kb": ["company profile", "pan"]})
+    found = matcher.find("Company Disclosure and company profile; expand")
+    assert ("disc", "company disclosure") in found
+    assert ("disc", "disclosure") in found
+    assert ("kb", "company profile") in found
+    assert ("kb", "pan") in found  # substring semantics, like the old `k in q` checks
+    assert matcher.scores("nothing relevant") == {}
+
+
+def test_match_agents_scores_all_agents_and_route_picks_best():
+    from agents.market_data_agent import MarketDataAgent
+    from agents.news_agent import NewsAgent
+    from agents.base import current_mcp_session
+    from core.quote_service import QuoteService
+
+    async def fetch_quotes(symbols, session_id):
+        assert session_id == "mcp-1"
+        return {s: {"last_price": 1500.0} for s in symbols}
+
+    registry.register("news", NewsAgent())
+    registry.register("market_data", MarketDataAgent(QuoteService(fetch_quotes, window=0)))
+
+    matches = registry.match_agents("market price and traded volume after the news")
+    assert matches == [("market_data", 3), ("news", 1)]
+    token = current_mcp_session.set("mcp-1")
+    try:
+        assert registry.route_query("INFY quote and price") == "Latest quotes:\n- NSE:INFY: ₹1,500.00"
+    finally:
+        current_mcp_session.reset(token)
+    assert registry.route_query("weather today") == "No suitable agent found."
@@ -0,0 +1,35 @@
+import os
+from unittest.mock import patch
+
+from routing_prompt import RoutingPrompt
+
+
+AGENTS = {"news": "NewsAgent", "market_data": "MarketDataAgent"}
+
+
+def test_prefix_is_built_once_and_reused(tmp_path):
+    kb = tmp_path / "kb.md"
+    kb.write_text("routing rules", encoding="utf-8")
+    prompt = RoutingPrompt(kb_path=str(kb))
+
+    with patch("builtins.open", wraps=open) as opened:
+        first = prompt.system_prompt(AGENTS)
+        second = prompt.system_prompt(dict(AGENTS))
+    assert first is second
+    assert opened.call_count == 1
+    assert "routing rules" in first and "- market_data: MarketDataAgent" in first
+
+
+def test_prefix_rebuilt_when_kb_or_agents_change(tmp_path):
+    kb = tmp_path / "kb.md"
+    kb.write_text("v1", encoding="utf-8")
+    prompt = RoutingPrompt(kb_path=str(kb))
+    assert "v1" in prompt.system_prompt(AGENTS)
+
+    kb.write_text("v2", encoding="utf-8")
+    st = os.stat(kb)
+    os.utime(kb, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    assert "v2" in prompt.system_prompt(AGENTS)
+
+    assert "- company_kb" in prompt.system_prompt({**AGENTS, "company_kb": "CompanyKBAgent"})
+    assert prompt.prefix_tokens(AGENTS) > 0
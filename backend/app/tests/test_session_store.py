@@ -0,0 +1,139 @@
+import asyncio
+import multiprocessing
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from session_store import InMemorySessionStore, SQLiteSessionStore
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_store(request, tmp_path):
+    def factory(**kwargs):
+        if request.param == "sqlite":
+            return SQLiteSessionStore(str(tmp_path / "sessions.db"), **kwargs)
+        return InMemorySessionStore(**kwargs)
+    return factory
+
+
+def test_append_trims_to_history_limit(make_store):
+    store = make_store(history_limit=3)
+    for i in range(5):
+        store.append("s", {"role": "user", "content": f"m{i}"})
+    assert [m["content"] for m in store.get("s")] == ["m2", "m3", "m4"]
+    assert store.get("other") == []
+
+
+def test_clear_and_ttl_expiry(make_store):
+    clock = FakeClock()
+    store = make_store(ttl=60, clock=clock)
+    store.append("a", {"role": "user", "content": "hi"})
+    store.append("b", {"role": "user", "content": "hey"})
+    assert store.clear("a") is True
+    assert store.clear("a") is False
+
+    clock.now += 61
+    store.append("c", {"role": "user", "content": "new"})
+    assert store.purge_expired() == 1
+    assert store.get("b") == []
+    assert store.get("c") == [{"role": "user", "content": "new"}]
+
+
+def _append_from_worker(path, content):
+    SQLiteSessionStore(path).append("shared", {"role": "user", "content": content})
+
+
+def test_sqlite_store_is_shared_between_processes(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    store = SQLiteSessionStore(path)
+    store.append("shared", {"role": "user", "content": "from parent"})
+    worker = multiprocessing.get_context("spawn").Process(
+        target=_append_from_worker, args=(path, "from worker")
+    )
+    worker.start()
+    worker.join(30)
+    assert [m["content"] for m in store.get("shared")] == ["from parent", "from worker"]
+    assert SQLiteSessionStore(path).clear("shared") is True
+    assert store.get("shared") == []
+
+
+def test_memory_store_evicts_least_recently_used_sessions_and_tracks_bytes():
+    store = InMemorySessionStore(history_limit=2, max_sessions=2)
+    store.append("a", {"role": "user", "content": "x" * 100})
+    store.append("b", {"role": "user", "content": "y"})
+    store.append("a", {"role": "assistant", "content": "z"})  # a is now most recently used
+    store.append("c", {"role": "user", "content": "w"})
+    assert store.get("b") == []
+    assert [m["content"] for m in store.get("a")] == ["x" * 100, "z"]
+
+    before = store.stats()
+    assert (before["sessions"], before["messages"], before["evicted"]) == (2, 3, 1)
+    store.append("a", {"role": "user", "content": "v"})  # ring buffer drops the large message
+    assert store.stats()["bytes"] < before["bytes"] - 90
+    store.clear("a")
+    store.clear("c")
+    assert store.stats()["bytes"] == 0
+
+
+def test_sweeper_purges_idle_sessions():
+    clock = FakeClock()
+    store = InMemorySessionStore(ttl=10, clock=clock)
+    store.append("idle", {"role": "user", "content": "hi"})
+    clock.now += 11
+    store.start_sweeper(interval=0.01)
+    try:
+        for _ in range(200):
+            if store.stats()["sessions"] == 0:
+                break
+            time.sleep(0.01)
+        assert store.stats()["sessions"] == 0
+    finally:
+        store.stop_sweeper()
+
+
+def test_async_api_matches_sync_api(make_store):
+    store = make_store()
+
+    async def scenario():
+        await store.aappend("s", {"role": "user", "content": "hi"})
+        history = await store.aget("s")
+        return history, await store.aclear("s"), await store.aget("s")
+
+    assert asyncio.run(scenario()) == ([{"role": "user", "content": "hi"}], True, [])
+
+
+def test_sqlite_waits_for_a_busy_database_off_the_event_loop(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    store = SQLiteSessionStore(path)
+    # Another worker holds the write lock for a while.
+    other = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+    other.execute("BEGIN IMMEDIATE")
+    threading.Timer(0.3, lambda: other.execute("COMMIT")).start()
+
+    async def scenario():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticker = asyncio.ensure_future(tick())
+        await store.aappend("s", {"role": "user", "content": "hi"})
+        ticker.cancel()
+        return ticks
+
+    assert asyncio.run(scenario()) >= 10
+    assert store.get("s") == [{"role": "user", "content": "hi"}]
+    other.close()
@@ -0,0 +1,116 @@
+import asyncio
+import os
+import re
+from unittest.mock import patch
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from agents.registry import registry
+from core.data_client import DataClient
+import llm_router
+from routing_cache import routing_cache
+from session_store import InMemorySessionStore
+from telemetry import Telemetry, current_request_id, telemetry
+
+
+@pytest.fixture(autouse=True)
+def clean(monkeypatch):
+    telemetry.reset()
+    registry._agents.clear()
+    routing_cache.clear()
+    monkeypatch.setattr(llm_router, "session_store", InMemorySessionStore())
+    yield
+    registry._agents.clear()
+
+
+W = f'worker="{os.getpid()}",'
+
+
+def test_histograms_errors_and_in_flight_render_as_prometheus_text():
+    t = Telemetry(buckets=(0.1, 1.0))
+    t.observe("agent", "news", 0.05)
+    t.observe("agent", "news", 0.5)
+    with pytest.raises(ValueError):
+        with t.span("upstream_http", "company_data"):
+            raise ValueError("boom")
+    with t.span("mcp_tool", "get_holdings"):
+        inside = t.render()
+
+    text = t.render()
+    assert f'saras_stage_duration_seconds_bucket{{{W}stage="agent",target="news",le="0.1"}} 1' in text
+    assert f'saras_stage_duration_seconds_bucket{{{W}stage="agent",target="news",le="1"}} 2' in text
+    assert f'saras_stage_duration_seconds_bucket{{{W}stage="agent",target="news",le="+Inf"}} 2' in text
+    assert f'saras_stage_duration_seconds_count{{{W}stage="agent",target="news"}} 2' in text
+    assert f'saras_stage_errors_total{{{W}stage="upstream_http",target="company_data"}} 1' in text
+    assert f'saras_stage_in_flight{{{W}stage="mcp_tool",target="get_holdings"}} 1' in inside
+    assert f'saras_stage_in_flight{{{W}stage="mcp_tool",target="get_holdings"}} 0' in text
+
+
+def test_upstream_calls_are_linked_to_the_request_id():
+    client = DataClient(base_url="https://upstream.test/",
+                        transport=httpx.MockTransport(lambda r: httpx.Response(200, json={"ok": True})))
+
+    async def call():
+        current_request_id.set("req-1")
+        return await client.get("company_data", "/companies/1")
+
+    try:
+        assert asyncio.run(call()) == {"ok": True}
+    finally:
+        client.close()
+    spans = telemetry.spans_for("req-1")
+    assert [(s["stage"], s["target"]) for s in spans] == [("upstream_http", "company_data")]
+
+
+def test_sync_upstream_calls_are_timed_too():
+    client = DataClient(base_url="https://upstream.test/",
+                        transport=httpx.MockTransport(lambda r: httpx.Response(200, json={"ok": True})))
+    token = current_request_id.set("req-2")
+    try:
+        # The sync facade used by agents in worker threads.
+        assert client.run_sync(client.get("company_data", "/companies/2")) == {"ok": True}
+    finally:
+        current_request_id.reset(token)
+        client.close()
+    spans = telemetry.spans_for("req-2")
+    assert [(s["stage"], s["target"]) for s in spans] == [("upstream_http", "company_data")]
+
+
+def test_request_label_is_the_route_template():
+    import main
+
+    client = TestClient(main.app)
+    client.get("/traces/a")
+    client.get("/chat/agents/stats")
+    client.get("/no/such/path")
+    targets = {s["target"] for s in telemetry._recent if s["stage"] == "request"}
+    assert targets == {"GET /traces/{request_id}", "GET /chat/agents/stats", "GET unmatched"}
+
+
+class EchoAgent:
+    def handle(self, query):
+        return f"echo: {query}"
+
+
+async def select(q, s):
+    return {"agent": "echo", "reason": "r"}
+
+
+def test_chat_request_spans_and_metrics_endpoint():
+    import main
+
+    registry.register("echo", EchoAgent())
+    client = TestClient(main.app)
+    with patch.object(llm_router, "select_agent", new=select):
+        res = client.post("/chat/", json={"query": "hi", "session_id": "t1"}, headers={"X-Request-ID": "abc123"})
+    assert res.json() == {"response": "echo: hi"}
+    assert res.headers["X-Request-ID"] == "abc123"
+
+    stages = {(s["stage"], s["target"]) for s in client.get("/traces/abc123").json()["spans"]}
+    assert {("routing", "select"), ("agent", "echo"), ("history", "append"), ("request", "POST /chat/")} <= stages
+
+    metrics = client.get("/metrics")
+    assert metrics.headers["content-type"].startswith("text/plain")
+    assert re.search(r'saras_stage_duration_seconds_count\{worker="\d+",stage="agent",target="echo"\} 1', metrics.text)
@@ -0,0 +1,134 @@
+import asyncio
+import multiprocessing
+import os
+
+import httpx
+import pytest
+
+from core import financial_data
+from core.data_client import DataClient
+from core.transcript_index import Segment, TranscriptIndex, chunk_text, extract_transcripts, period_key
+
+TRANSCRIPT = (
+    "Good evening everyone and welcome to the earnings call. "
+    "Our EBITDA margin expanded by 120 basis points this quarter due to lower input costs. "
+    + "General remarks about the business environment and hiring. " * 60
+    + "On the capex front we plan to spend 2,000 crore next year on the new plant in Gujarat. "
+    + "Closing remarks and thanks to all participants. " * 30
+)
+PAYLOAD = {
+    "company_name": "Tata Consultancy Services",
+    "conference_calls": [
+        {"fiscal_year": 2025, "fiscal_quarter": 2, "transcript": TRANSCRIPT},
+        {"time_period": "Q1 FY2025", "sections": [{"text": "Revenue grew 8 percent with strong deal wins."}]},
+    ],
+}
+
+
+def test_chunking_and_payload_extraction():
+    chunks = chunk_text(" ".join(str(i) for i in range(400)), size=180, overlap=40)
+    assert [len(c.split()) for c in chunks] == [180, 180, 120]
+    assert chunks[1].split()[0] == "140"
+
+    periods = extract_transcripts(PAYLOAD)
+    assert set(periods) == {"FY2025Q2", "FY2025Q1"}
+    assert period_key(time_period="FY 2025 Q2") == period_key(2025, 2) == "FY2025Q2"
+
+
+def test_bm25_ranks_relevant_chunk_first(tmp_path):
+    index = TranscriptIndex(str(tmp_path))
+    index.ingest(7, PAYLOAD)
+
+    hits = index.search(7, "FY2025Q2", "capex plans for the new plant", k=2)
+    assert len(hits) == 1 and "capex" in hits[0]["text"]  # chunks without query terms are not returned
+    assert "margin" in index.search(7, "FY2025Q2", "EBITDA margin", k=1)[0]["text"]
+    assert index.search(7, "FY2024Q4", "capex") is None  # not indexed locally
+    assert index.resolve("tata consultancy services ") == "7"
+
+    # Reloaded from disk by a fresh process-level index
+    reloaded = TranscriptIndex(str(tmp_path))
+    assert reloaded.search(7, "FY2025Q2", "capex plans for the new plant", k=2) == hits
+    assert reloaded.search(7, "FY2025Q1", "deal wins", k=1)[0]["text"].startswith("Revenue grew")
+
+
+def test_segment_arrays_are_csr_posting_lists():
+    seg = Segment.build(["margin margin capex", "capex"])
+    t = seg.vocab["capex"]
+    assert list(seg.doc_ids[seg.indptr[t]:seg.indptr[t + 1]]) == [0, 1]
+    t = seg.vocab["margin"]
+    assert list(seg.tfs[seg.indptr[t]:seg.indptr[t + 1]]) == [2.0]
+
+
+def _add_aliases(root, worker):
+    index = TranscriptIndex(root)
+    index.resolve("warm the cached copy")
+    for i in range(40):
+        index.add_alias(f"company {worker}-{i}", f"{worker}{i}")
+        index.add(f"{worker}", "FY2025Q1", [f"worker {worker} transcript"])
+
+
+def test_workers_sharing_the_index_keep_each_others_aliases(tmp_path):
+    ctx = multiprocessing.get_context("fork")
+    workers = [ctx.Process(target=_add_aliases, args=(str(tmp_path), w)) for w in range(3)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    assert all(w.exitcode == 0 for w in workers)
+    index = TranscriptIndex(str(tmp_path))
+    assert all(index.resolve(f"company {w}-{i}") == f"{w}{i}" for w in range(3) for i in range(40))
+    assert all(index.has(w, "FY2025Q1") for w in range(3))
+    leftovers = [f for _, _, files in os.walk(tmp_path) for f in files if f.endswith(".tmp")]
+    assert leftovers == []
+
+
+def test_aliases_added_by_another_worker_are_seen(tmp_path):
+    a, b = TranscriptIndex(str(tmp_path)), TranscriptIndex(str(tmp_path))
+    a.add_alias("Infosys", 1)
+    assert b.resolve("infosys") == "1"
+    b.add_alias("Wipro", 2)
+    assert a.resolve("wipro") == "2" and a.resolve("infosys") == "1"
+
+
+@pytest.fixture
+def upstream(monkeypatch, tmp_path):
+    state = {"qa_up": True, "calls": []}
+
+    async def handler(request: httpx.Request):
+        state["calls"].append(request.url.path)
+        if request.url.path.endswith("/qa/"):
+            if not state["qa_up"]:
+                return httpx.Response(503)
+            return httpx.Response(200, json={"answer": "remote"})
+        if request.url.path == "/companies/7/conferencecall/":
+            return httpx.Response(200, json=PAYLOAD)
+        return httpx.Response(404)
+
+    client = DataClient(base_url="https://upstream.test/", transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(financial_data, "data_client", client)
+    monkeypatch.setattr(financial_data, "transcript_index", TranscriptIndex(str(tmp_path)))
+    monkeypatch.setattr(financial_data, "_index_attempts", {})
+    yield state
+    client.close()
+
+
+def test_qa_indexes_in_background_then_answers_locally(upstream):
+    async def scenario():
+        first = await financial_data.conference_call_qa_async(7, 2025, 2, "capex plans", k=1)
+        await asyncio.gather(*financial_data._index_tasks)
+        second = await financial_data.conference_call_qa_async(7, 2025, 2, "capex plans", k=1)
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first == {"answer": "remote"}
+    assert second["source"] == "local" and "capex" in second["chunks"][0]["text"]
+    assert upstream["calls"].count("/companies/7/conference-calls/2025/2/qa/") == 1
+
+
+def test_qa_falls_back_to_local_index_when_remote_is_down(upstream):
+    upstream["qa_up"] = False
+    result = asyncio.run(financial_data.conference_call_qa_async(7, 2025, 2, "EBITDA margin", k=1))
+    assert result["source"] == "local" and "margin" in result["chunks"][0]["text"]
+
+    local = asyncio.run(financial_data.search_chunks_async("deal wins", 1, "Tata Consultancy Services", "conference_call", "Q1 FY2025"))
+    assert local["source"] == "local" and local["chunks"][0]["text"].startswith("Revenue grew")
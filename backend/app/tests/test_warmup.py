@@ -0,0 +1,108 @@
+import asyncio
+import time
+
+from core.warmup import RateLimiter, WarmupPipeline, company_ids, conference_periods
+
+
+def test_payload_parsing():
+    listing = {"companies": [{"company_id": 7, "latest": {"time_period": "Q2 FY2025"}}, {"id": 9}, 11]}
+    assert [cid for cid, _ in company_ids(listing)] == [7, 9, 11]
+    details = [{"fiscal_year": 2024, "fiscal_quarter": 4}, {"calls": [{"year": 2025, "quarter": 1}]}]
+    assert conference_periods(details) == [(2025, 1), (2024, 4)]
+
+
+class FakeUpstream:
+    def __init__(self):
+        self.periods = {1: [(2025, 1)], 2: [(2025, 1)], 3: [(2024, 4)], 4: [(2025, 1)]}
+        self.calls = []
+        self.active = self.max_active = 0
+        self.indexed = set()
+
+    async def list_companies(self):
+        return [{"company_id": cid} for cid in self.periods]
+
+    async def details(self, cid):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        await asyncio.sleep(0.01)
+        self.active -= 1
+        self.calls.append(("details", cid))
+        return [{"fiscal_year": y, "fiscal_quarter": q} for y, q in self.periods[cid]]
+
+    async def summary(self, cid, year, quarter):
+        self.calls.append(("summary", cid, year, quarter))
+        if cid == 3:
+            raise RuntimeError("upstream 502")
+        return {"summary": "..."}
+
+    async def index(self, cid):
+        self.calls.append(("index", cid))
+        keys = [f"FY{y}Q{q}" for y, q in self.periods[cid]]
+        self.indexed.update((cid, k) for k in keys)
+        return keys
+
+    def pipeline(self):
+        return WarmupPipeline(
+            interval=60, concurrency=2, rate=0, list_companies=self.list_companies,
+            fetch_details=self.details, fetch_summary=self.summary, index_transcripts=self.index,
+            is_indexed=lambda cid, key: (cid, key) in self.indexed,
+        )
+
+
+def test_warms_new_periods_once_with_bounded_concurrency():
+    upstream = FakeUpstream()
+    pipeline = upstream.pipeline()
+
+    asyncio.run(pipeline.run_once())
+    status = pipeline.status()
+    assert upstream.max_active == 2
+    assert status["companies_done"] == 4 and status["periods_warmed"] == 3
+    assert status["errors"] == 1 and "summary 3" in status["last_error"]
+    assert sorted(c[1] for c in upstream.calls if c[0] == "summary") == [1, 2, 3, 4]
+
+    # Nothing new except the failed period, which is retried; a newly reported quarter is warmed.
+    upstream.calls.clear()
+    upstream.periods[2] = [(2025, 2), (2025, 1)]
+    asyncio.run(pipeline.run_once())
+    summaries = [c[1:] for c in upstream.calls if c[0] == "summary"]
+    assert sorted(summaries) == [(2, 2025, 2), (3, 2024, 4)]
+    assert ("index", 2) in upstream.calls and ("index", 1) not in upstream.calls
+    assert pipeline.status()["cycles"] == 2 and pipeline.status()["warmed_periods_total"] == 4
+
+
+def test_rate_limiter_spaces_out_calls():
+    async def scenario():
+        limiter = RateLimiter(rate=40, burst=1)
+        started = time.monotonic()
+        for _ in range(5):
+            await limiter.acquire()
+        return time.monotonic() - started
+
+    assert asyncio.run(scenario()) >= 4 / 40 * 0.9
+
+
+def test_every_worker_warms_but_only_one_indexes(tmp_path):
+    lock = str(tmp_path / "warmup.lock")
+    first, second = FakeUpstream(), FakeUpstream()
+    second.indexed = first.indexed  # the index directory is shared
+    pipelines = [upstream.pipeline() for upstream in (first, second)]
+    for pipeline in pipelines:
+        pipeline.lock_file = lock
+
+    async def scenario():
+        for pipeline in pipelines:
+            await pipeline.run_once()
+
+    asyncio.run(scenario())
+    # Both workers fetched the summaries into their own caches...
+    assert {c for c in first.calls if c[0] == "summary"} == {c for c in second.calls if c[0] == "summary"}
+    # ...but only the lock holder indexed transcripts.
+    assert any(c[0] == "index" for c in first.calls)
+    assert not any(c[0] == "index" for c in second.calls)
+    assert [p.status()["indexer"] for p in pipelines] == [True, False]
+
+    # When the indexing worker goes away, another takes over on its next cycle.
+    first.indexed.clear()
+    asyncio.run(pipelines[0].stop())
+    asyncio.run(pipelines[1].run_once())
+    assert pipelines[1].status()["indexer"] and any(c[0] == "index" for c in second.calls)
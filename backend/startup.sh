@@ -6,5 +6,8 @@ cd /home/site/wwwroot
 # Install dependencies
 pip install -r requirements.txt
 
+# Share chat session histories between the gunicorn workers (local SQLite file in WAL mode)
+export CHAT_SESSION_BACKEND="${CHAT_SESSION_BACKEND:-sqlite}"
+
 # Start the app (adjust path/module if needed)
 gunicorn -w 4 -k uvicorn.workers.UvicornWorker app.main:app --forwarded-allow-ips="*"
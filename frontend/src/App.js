@@ -14,6 +14,7 @@ const App = () => {
   const [mcpSessionId, setMcpSessionId] = useState(null);
   const [holdings, setHoldings] = useState(null);
   const [holdingsLoading, setHoldingsLoading] = useState(false);
+  const [holdingsAsOf, setHoldingsAsOf] = useState(null); // epoch seconds of the server snapshot
   const [mcpError, setMcpError] = useState("");
 
   // Mirror backend history limit for UI note
@@ -36,13 +37,50 @@ const App = () => {
     const activeSession = sessionId;
 
     try {
-      const res = await axios.post(`${process.env.REACT_APP_API_BASE_URL}/chat`, {
-        query: input,
-        session_id: activeSession,
+      // Stream the answer over Server-Sent Events so text appears as soon as it is produced
+      const res = await fetch(`${process.env.REACT_APP_API_BASE_URL}/chat/stream`, {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ query: input, session_id: activeSession, mcp_session_id: mcpSessionId || undefined }),
       });
-      // Ignore late responses from a previous session
-      if (activeSession !== sessionId) return;
-      setMessages([...newMessages, { role: "assistant", content: res.data.response }]);
+      if (!res.ok || !res.body) throw new Error(`stream failed: ${res.status}`);
+
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+      let answer = "";
+      const showAnswer = (content) => {
+        // Ignore late responses from a previous session
+        if (activeSession !== sessionId) return;
+        setMessages([...newMessages, { role: "assistant", content }]);
+      };
+
+      for (;;) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        let sep;
+        while ((sep = buffer.indexOf("\n\n")) !== -1) {
+          const block = buffer.slice(0, sep);
+          buffer = buffer.slice(sep + 2);
+          let event = "message";
+          let data = "";
+          for (const line of block.split("\n")) {
+            if (line.startsWith("event: ")) event = line.slice(7);
+            else if (line.startsWith("data: ")) data += line.slice(6);
+          }
+          const payload = data ? JSON.parse(data) : {};
+          if (event === "chunk") {
+            answer += payload.text ?? "";
+            showAnswer(answer);
+          } else if (event === "done") {
+            answer = payload.response ?? answer;
+            showAnswer(answer);
+          } else if (event === "error") {
+            showAnswer(payload.error || "⚠️ Error fetching response.");
+          }
+        }
+      }
     } catch (error) {
       if (activeSession !== sessionId) return;
       setMessages([...newMessages, { role: "assistant", content: "⚠️ Error fetching response." }]);
@@ -147,13 +185,14 @@ const App = () => {
     setMcpError("");
     try {
       const apiBase = process.env.REACT_APP_API_BASE_URL;
-      const res = await axios.get(`${apiBase}/mcp/holdings`, { params: { session_id: mcpSessionId } });
+      const res = await axios.get(`${apiBase}/mcp/holdings`, { params: { session_id: mcpSessionId, format: "columnar" } });
       if (res.data?.error) {
         setMcpError(res.data.error);
         setHoldingsLoading(false);
         return;
       }
       setHoldings(res.data?.holdings ?? null);
+      setHoldingsAsOf(res.data?.as_of ?? null);
     } catch (e) {
       setMcpError("Failed to fetch holdings.");
     } finally {
@@ -166,52 +205,73 @@ const App = () => {
     setShowHoldingsPane(false);
     setTimeout(() => setPaneMounted(false), 320);
     setHoldings(null);
+    setHoldingsAsOf(null);
     setMcpError("");
   };
 
-  // Polling: auto-load holdings after login
-  const pollingRef = useRef({ attempts: 0, timer: null });
-
+  // Live holdings: the server pushes a snapshot, then only the rows that changed
   useEffect(() => {
-    // start polling when we have a session and the pane is visible
+    // subscribe while we have a session and the pane is visible
     if (!mcpSessionId || !showHoldingsPane) return;
 
-    pollingRef.current.attempts = 0;
-    const maxAttempts = 10;
-    const intervalMs = 3000;
+    const apiBase = process.env.REACT_APP_API_BASE_URL;
+    const source = new EventSource(`${apiBase}/mcp/holdings/stream?session_id=${encodeURIComponent(mcpSessionId)}`);
+    const table = { keys: null, rows: {} };
+    setHoldingsLoading(true);
 
-    const tick = async () => {
-      pollingRef.current.attempts += 1;
-      try {
-        await loadHoldings();
-        // if holdings loaded, stop polling
-        if (holdings && pollingRef.current.timer) {
-          clearInterval(pollingRef.current.timer);
-          pollingRef.current.timer = null;
-        }
-      } catch (e) {
-        // ignore - loadHoldings handles errors
+    source.addEventListener("snapshot", (ev) => {
+      const data = JSON.parse(ev.data);
+      if (Array.isArray(data.keys)) {
+        table.keys = data.keys;
+        table.rows = {};
+        data.keys.forEach((k, i) => { table.rows[k] = data.holdings[i]; });
+      } else {
+        table.keys = null;
+        table.rows = {};
       }
-      if (pollingRef.current.attempts >= maxAttempts && pollingRef.current.timer) {
-        clearInterval(pollingRef.current.timer);
-        pollingRef.current.timer = null;
-      }
-    };
+      setHoldings(data.holdings ?? null);
+      setHoldingsAsOf(data.as_of ?? null);
+      setHoldingsLoading(false);
+      setMcpError("");
+    });
 
-    // first immediate attempt
-    tick();
-  pollingRef.current.timer = window.setInterval(tick, intervalMs);
+    source.addEventListener("delta", (ev) => {
+      const data = JSON.parse(ev.data);
+      if (!table.keys) return;
+      Object.assign(table.rows, data.upserts || {});
+      (data.removed || []).forEach((k) => { delete table.rows[k]; });
+      if (Array.isArray(data.keys)) table.keys = data.keys;
+      setHoldings(table.keys.map((k) => table.rows[k]));
+      setHoldingsAsOf(data.as_of ?? null);
+    });
 
-    return () => {
-      if (pollingRef.current.timer) {
-        clearInterval(pollingRef.current.timer);
-        pollingRef.current.timer = null;
-      }
-    };
+    // Named "error" events from the server carry data; connection errors do not.
+    source.addEventListener("error", (ev) => {
+      if (!ev.data) return; // EventSource reconnects on its own
+      const data = JSON.parse(ev.data);
+      setMcpError(data.error);
+      setHoldingsLoading(false);
+      if (data.fatal) source.close();
+    });
+
+    return () => source.close();
   }, [mcpSessionId, showHoldingsPane]);
 
+  // Columnar payloads ({columns, values}) carry each key once; expand them to rows for rendering
+  const columnarToRows = (data) => {
+    const n = data.values.length ? data.values[0].length : 0;
+    const rows = new Array(n);
+    for (let i = 0; i < n; i++) {
+      const row = {};
+      data.columns.forEach((c, j) => { row[c] = data.values[j][i]; });
+      rows[i] = row;
+    }
+    return rows;
+  };
+
   const renderHoldingsTable = (data) => {
     if (!data) return null;
+    if (Array.isArray(data.columns) && Array.isArray(data.values)) data = columnarToRows(data);
     // If it's an array of objects, render a table; otherwise show JSON
     if (Array.isArray(data) && data.length && data.every((x) => x && typeof x === "object" && !Array.isArray(x))) {
       const cols = Array.from(
@@ -356,7 +416,7 @@ const App = () => {
             </div>
             <div style={{ padding: 12, display: "flex", flexDirection: "column", gap: 12, minHeight: 0, flex: 1, overflow: 'auto' }}>
               <div style={{ color: "var(--muted)", fontSize: 13 }}>
-                1) Sign in to Zerodha in the opened tab. 2) Then click "Load Holdings".
+                1) Sign in to Zerodha in the opened tab. 2) Holdings load and update automatically.
               </div>
               {mcpError && (
                 <div className="card" style={{ padding: 10, color: '#fca5a5', borderColor: '#7f1d1d' }}>Error: {mcpError}</div>
@@ -366,6 +426,11 @@ const App = () => {
                   {holdingsLoading ? "Loading..." : "Load Holdings"}
                 </button>
               </div>
+              {holdingsAsOf && (
+                <div style={{ color: "var(--muted)", fontSize: 12 }}>
+                  Updated {new Date(holdingsAsOf * 1000).toLocaleTimeString()}
+                </div>
+              )}
               <div style={{ flex: 1, minHeight: 0, overflow: 'auto' }}>
                 {holdingsLoading && (
                   <div style={{ display: 'flex', alignItems: 'center', gap: 8 }}>